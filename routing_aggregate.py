@@ -0,0 +1,181 @@
+"""
+ Aggregation of the rules installed by routing_controller.py for the flows entering at the dynamic edges.
+
+ The path of a flow does not depend on its whole header: intent traffic is placed by its intent and its
+ destination switch, best-effort traffic by the key hashed by the balancer. So the rule of a flow can match all
+ the traffic that would get the same decision, at one of these levels (finest first):
+    - "flow": the exact match of the packet (ofp_match.from_packet); the balancer hashes the 5-tuple,
+    - "pair": the source and destination addresses; the balancer hashes the pair,
+    - "prefix": the widest destination prefix (not wider than /min_prefix) whose known hosts are all behind the
+      destination switch of the flow; the balancer hashes the prefix.
+ Intent traffic gets the intersection of the level with its intent (prefixes, protocol, single ports; a port
+ range is matched with the port of the packet). An aggregate overlapping another intent would capture the
+ traffic of that intent before the controller has seen it, so such aggregates are refined to the next finer
+ level, down to the exact match. Finer levels get higher rule priorities, so the rules installed before a
+ change of level keep their traffic until they expire.
+
+ The rule count of every switch is checked against a table budget: from `high` (a fraction of the budget) on,
+ the decisions at the switch are made one level coarser (new flows are merged into fewer rules), and at the
+ budget the controller evicts the coldest rules of the switch.
+
+ The module does not depend on POX.
+"""
+
+import bisect
+import struct
+
+LEVELS = ("flow", "pair", "prefix")
+
+
+def _mask(length):
+    return (0xffffffff << (32 - length)) & 0xffffffff
+
+
+def _prefixes_overlap(a, a_len, b, b_len):
+    mask = _mask(min(a_len, b_len))
+    return (a & mask) == (b & mask)
+
+
+def _narrower(a, a_len, b, b_len):
+    # intersection of two overlapping prefixes: the longer one
+    return (a, a_len) if a_len >= b_len else (b, b_len)
+
+
+class Scope(object):
+    """ Match of an aggregate: addresses as ints with their prefix lengths (0 = any), protocol and ports. """
+    __slots__ = ("level", "src", "src_len", "dst", "dst_len", "proto", "sport", "dport")
+
+    def __init__(self, level, src, src_len, dst, dst_len, proto=None, sport=None, dport=None):
+        self.level = level
+        self.src = src & _mask(src_len)
+        self.src_len = src_len
+        self.dst = dst & _mask(dst_len)
+        self.dst_len = dst_len
+        self.proto = proto
+        self.sport = sport
+        self.dport = dport
+
+    def key(self):
+        """ Bytes identifying the aggregate, hashed by the balancer. """
+        return struct.pack("!BIBIBBii", self.level, self.src, self.src_len, self.dst, self.dst_len,
+                           self.proto or 0, -1 if self.sport is None else self.sport,
+                           -1 if self.dport is None else self.dport)
+
+    def overlaps(self, intent):
+        if not _prefixes_overlap(self.src, self.src_len, intent.src, intent.src_len):
+            return False
+        if not _prefixes_overlap(self.dst, self.dst_len, intent.dst, intent.dst_len):
+            return False
+        if self.proto is not None and intent.proto is not None and self.proto != intent.proto:
+            return False
+        for port, wanted in ((self.sport, intent.sport), (self.dport, intent.dport)):
+            if port is not None and wanted is not None and not wanted[0] <= port <= wanted[1]:
+                return False
+        return True
+
+    def __repr__(self):
+        return "Scope(%s, %08x/%d > %08x/%d, %s, %s, %s)" % (LEVELS[self.level], self.src, self.src_len, self.dst,
+                                                            self.dst_len, self.proto, self.sport, self.dport)
+
+
+class Aggregator(object):
+
+    def __init__(self, level="pair", budget=None, high=0.8, min_prefix=24):
+        if level not in LEVELS:
+            raise ValueError("unknown aggregation level %r (one of %s)" % (level, ", ".join(LEVELS)))
+        self.level = LEVELS.index(level)
+        self.budget = budget  # rules per switch, None = no budget
+        self.high = high
+        self.min_prefix = min_prefix
+        self.prefixes = {}  # host address (int) -> (prefix, length) of its destination aggregate
+        self.intents = ()
+        self._refine = {}  # (Scope.key(), intent) -> True if the scope overlaps an intent it does not belong to
+        self.decisions = [0] * len(LEVELS)  # decisions taken per level
+        self.coarsened = 0  # decisions made coarser because their switch was near the budget
+        self.refined = 0  # aggregates refined because they overlapped an intent
+        self.evicted = 0
+
+    def compile(self, hosts, reserved=(), intents=()):
+        """
+        hosts: {address as int: destination switch} of the known hosts; reserved: addresses no aggregate may
+        cover (e.g. the address of the delay probes); intents: the intents of the controller.
+        """
+        self.intents = tuple(intents)
+        self._refine = {}
+        # sorted addresses with the switch they belong to, and the runs of consecutive addresses of one switch:
+        # a prefix holds only hosts of one switch if its first and last addresses fall in the same run
+        points = sorted(list(hosts.items()) + [(address, None) for address in reserved])
+        addresses = [address for address, switch in points]
+        runs = []
+        run = 0
+        for i, (address, switch) in enumerate(points):
+            if i and switch != points[i - 1][1]:
+                run += 1
+            runs.append(run)
+        self.prefixes = {}
+        for address, switch in hosts.items():
+            prefix, length = address, 32
+            for candidate in range(self.min_prefix, 32):
+                mask = _mask(candidate)
+                first = bisect.bisect_left(addresses, address & mask)
+                last = bisect.bisect_right(addresses, address | (~mask & 0xffffffff)) - 1
+                if runs[first] == runs[last] and points[first][1] == switch:
+                    prefix, length = address & mask, candidate
+                    break
+            self.prefixes[address] = (prefix, length)
+
+    def near_budget(self, occupancy):
+        return bool(self.budget) and occupancy >= self.high * self.budget
+
+    def level_at(self, occupancy):
+        """ Level of the decisions at a switch holding `occupancy` rules. """
+        if self.near_budget(occupancy) and self.level < len(LEVELS) - 1:
+            self.coarsened += 1
+            return self.level + 1
+        return self.level
+
+    def over_budget(self, occupancy):
+        return bool(self.budget) and occupancy >= self.budget
+
+    def _scope(self, level, src, dst, proto, sport, dport, intent):
+        if level == 1:
+            scope = Scope(level, src, 32, dst, 32)
+        else:
+            prefix, length = self.prefixes.get(dst, (dst, 32))
+            scope = Scope(level, 0, 0, prefix, length)
+        if intent is None:
+            return scope
+        scope.src, scope.src_len = _narrower(scope.src, scope.src_len, intent.src, intent.src_len)
+        scope.dst, scope.dst_len = _narrower(scope.dst, scope.dst_len, intent.dst, intent.dst_len)
+        if intent.proto is not None or intent.sport is not None or intent.dport is not None:
+            scope.proto = proto  # OpenFlow matches ports only with the protocol
+        if intent.sport is not None:
+            scope.sport = intent.sport[0] if intent.sport[0] == intent.sport[1] else sport
+        if intent.dport is not None:
+            scope.dport = intent.dport[0] if intent.dport[0] == intent.dport[1] else dport
+        return scope
+
+    def scope(self, level, src, dst, proto, sport, dport, intent=None):
+        """
+        Scope of the rule for a flow (addresses as ints) of the intent (None: best effort) at `level`, or None
+        for the exact match of the packet.
+        """
+        while level > 0:
+            scope = self._scope(level, src, dst, proto, sport, dport, intent)
+            key = (scope.key(), intent)
+            refine = self._refine.get(key)
+            if refine is None:
+                refine = self._refine[key] = any(other is not intent and scope.overlaps(other)
+                                                 for other in self.intents)
+            if not refine:
+                self.decisions[level] += 1
+                return scope
+            self.refined += 1
+            level -= 1
+        self.decisions[0] += 1
+        return None
+
+    def counters(self):
+        counters = dict(("decisions_" + name, n) for name, n in zip(LEVELS, self.decisions))
+        counters.update(coarsened=self.coarsened, refined=self.refined, evicted=self.evicted)
+        return counters
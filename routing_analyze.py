@@ -0,0 +1,307 @@
+"""
+ Analysis of the captures written by the tests of routing_net.py.
+
+ Every test captures the traffic of every path on the link of its middle switch towards the right edge
+ (tcpdump -e -nn text in sX-eth2-dump-test_N.txt, or a pcap file written with tcpdump -w). The files are read
+ as a stream, line by line (text) or through a memory map (pcap), into columns of per-packet records:
+ time, path, source and destination address, protocol, ports (ICMP: id), sequence number (ICMP seq, TCP seq)
+ and length. The aggregation is done on the NumPy columns:
+    - per path: packets, bytes, share of the test and mean rate,
+    - per flow (addresses, protocol, ports): packets per path, number of path changes and reordered packets
+      (sequence number below the highest one seen before in the flow, all paths merged in time order),
+    - rate timeline of every path in bins of `bin` seconds.
+ The result is a compact summary per test, printed as text or written as JSON:
+
+    python routing_analyze.py s*-eth2-dump-test_*.txt --bin 1 --json summary.json
+
+ The module does not depend on POX.
+"""
+
+import argparse
+import array
+import collections
+import json
+import mmap
+import os
+import re
+import socket
+import struct
+import sys
+
+import numpy as np
+
+_FILE_NAME = re.compile(r"(?P<path>[^/\\]+?)-(?:eth\d+-)?dump-test_(?P<test>\w+?)\.(?:txt|pcap)$")
+_LINE = re.compile(r"^(\d+):(\d+):(\d+\.\d+) \S+ > \S+, ethertype IPv4 \(0x0800\), length (\d+): "
+                   r"(\d+\.\d+\.\d+\.\d+)(?:\.(\d+))? > (\d+\.\d+\.\d+\.\d+)(?:\.(\d+))?: (\w+)(.*)$")
+_ICMP = re.compile(r"id (\d+), seq (\d+)")
+_TCP_SEQ = re.compile(r"seq (\d+)")
+
+IP_ICMP, IP_TCP, IP_UDP = 1, 6, 17
+COLUMNS = (("time", "d"), ("src", "I"), ("dst", "I"), ("proto", "B"), ("sport", "H"), ("dport", "H"),
+           ("seq", "q"), ("length", "I"))
+
+
+class Capture(object):
+    """ Columns of the packets of one capture file (one path of one test). """
+
+    def __init__(self, path, test, columns):
+        self.path = path
+        self.test = test
+        self.columns = columns  # name -> NumPy array
+
+    def __len__(self):
+        return len(self.columns["time"])
+
+
+def _address(text, cache={}):
+    value = cache.get(text)
+    if value is None:
+        value = cache[text] = struct.unpack("!I", socket.inet_aton(text))[0]
+    return value
+
+
+def read_text(filename):
+    """ Columns of a tcpdump -e -nn text dump, read line by line; lines other than IPv4 packets are skipped. """
+    columns = dict((name, array.array(code)) for name, code in COLUMNS)
+    time, src, dst, proto, sport, dport, seq, length = [columns[name] for name, code in COLUMNS]
+    day = 0.0
+    last = None
+    with open(filename, errors="replace") as f:
+        for line in f:
+            m = _LINE.match(line)
+            if m is None:
+                continue
+            t = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + float(m.group(3)) + day
+            if last is not None and t < last - 43200:  # the capture went past midnight
+                day += 86400.0
+                t += 86400.0
+            last = t
+            kind, rest = m.group(9), m.group(10)
+            ports = (int(m.group(6) or 0), int(m.group(8) or 0))
+            number = -1
+            if kind == "ICMP":
+                p = IP_ICMP
+                icmp = _ICMP.search(rest)
+                if icmp is not None:
+                    ports = (int(icmp.group(1)), 0)
+                    number = int(icmp.group(2))
+            elif kind == "UDP":
+                p = IP_UDP
+            elif kind == "Flags":
+                p = IP_TCP
+                tcp = _TCP_SEQ.search(rest)
+                if tcp is not None:
+                    number = int(tcp.group(1))
+            else:
+                p = 0
+            time.append(t)
+            src.append(_address(m.group(5)))
+            dst.append(_address(m.group(7)))
+            proto.append(p)
+            sport.append(ports[0])
+            dport.append(ports[1])
+            seq.append(number)
+            length.append(int(m.group(4)))
+    return dict((name, np.frombuffer(columns[name], dtype=columns[name].typecode) if len(columns[name]) else
+                 np.zeros(0, dtype=columns[name].typecode)) for name, code in COLUMNS)
+
+
+def read_pcap(filename):
+    """ Columns of the IPv4 packets of a pcap file (Ethernet), read through a memory map. """
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size < 24:
+            return read_empty()
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return _pcap_columns(data, filename)
+    finally:
+        data.close()
+
+
+def _pcap_columns(data, filename):
+    magic = data[:4]
+    if magic in (b"\xd4\xc3\xb2\xa1", b"\x4d\x3c\xb2\xa1"):
+        endian = "<"
+    elif magic in (b"\xa1\xb2\xc3\xd4", b"\xa1\xb2\x3c\x4d"):
+        endian = ">"
+    else:
+        raise ValueError("%s is not a pcap file" % filename)
+    scale = 1e-9 if magic in (b"\x4d\x3c\xb2\xa1", b"\xa1\xb2\x3c\x4d") else 1e-6
+    record = struct.Struct(endian + "IIII")
+    # only the record headers are walked in Python; the fields are gathered from the map with NumPy
+    offsets, times, lengths = array.array("q"), array.array("d"), array.array("I")
+    offset, size = 24, len(data)
+    while offset + 16 <= size:
+        sec, frac, captured, original = record.unpack_from(data, offset)
+        if captured >= 34 and offset + 16 + captured <= size:
+            offsets.append(offset + 16)
+            times.append(sec + frac * scale)
+            lengths.append(original)
+        offset += 16 + captured
+    if not offsets:
+        return read_empty()
+    raw = np.frombuffer(data, dtype=np.uint8)
+    at = np.frombuffer(offsets, dtype=np.int64)
+    ipv4 = (raw[at + 12] == 0x08) & (raw[at + 13] == 0x00)
+    at = at[ipv4]
+
+    def u16(position):
+        return raw[position].astype(np.uint16) << 8 | raw[position + 1]
+
+    def u32(position):
+        return (u16(position).astype(np.uint32) << 16) | u16(position + 2)
+
+    proto = raw[at + 23]
+    l4 = at + 14 + (raw[at + 14] & 0x0f).astype(np.int64) * 4
+    l4 = np.minimum(l4, len(raw) - 8)  # truncated packets read garbage ports, not past the map
+    icmp, tcp = proto == IP_ICMP, proto == IP_TCP
+    columns = {
+        "time": np.frombuffer(times, dtype=np.float64)[ipv4],
+        "src": u32(at + 26), "dst": u32(at + 30), "proto": proto,
+        # ICMP: the echo id in place of the source port and the echo sequence number
+        "sport": np.where(icmp, u16(l4 + 4), u16(l4)).astype(np.uint16),
+        "dport": np.where(icmp, 0, u16(l4 + 2)).astype(np.uint16),
+        "seq": np.where(icmp, u16(l4 + 6).astype(np.int64), np.where(tcp, u32(l4 + 4).astype(np.int64), -1)),
+        "length": np.frombuffer(lengths, dtype=np.uint32)[ipv4],
+    }
+    return columns
+
+
+def read_empty():
+    return dict((name, np.zeros(0, dtype=code)) for name, code in COLUMNS)
+
+
+def read_capture(filename):
+    """ Capture of a file named like s2-eth2-dump-test_1.txt (or .pcap): the path is s2, the test 1. """
+    m = _FILE_NAME.search(os.path.basename(filename))
+    path, test = (m.group("path"), m.group("test")) if m else (os.path.basename(filename), "")
+    if filename.endswith(".pcap"):
+        columns = read_pcap(filename)
+    else:
+        columns = read_text(filename)
+    return Capture(path, test, columns)
+
+
+def _ip(value):
+    return socket.inet_ntoa(struct.pack("!I", int(value)))
+
+
+def _flow_name(src, dst, proto, sport, dport):
+    if proto == IP_ICMP:
+        return "%s>%s icmp id %d" % (_ip(src), _ip(dst), sport)
+    name = {IP_TCP: "tcp", IP_UDP: "udp"}.get(int(proto), "ip%d" % proto)
+    return "%s:%d>%s:%d %s" % (_ip(src), sport, _ip(dst), dport, name)
+
+
+def summarize(captures, bin_size=1.0):
+    """ Summary of the captures of one test (one capture per path). """
+    captures = [capture for capture in captures if len(capture)]
+    if not captures:
+        return {"packets": 0, "paths": {}, "flows": []}
+    names = sorted(set(capture.path for capture in captures))
+    path_index = dict((name, i) for i, name in enumerate(names))
+    col = dict((name, np.concatenate([capture.columns[name] for capture in captures])) for name, code in COLUMNS)
+    paths = np.concatenate([np.full(len(capture), path_index[capture.path], dtype=np.int32) for capture in captures])
+    order = np.argsort(col["time"], kind="stable")
+    col = dict((name, values[order]) for name, values in col.items())
+    paths = paths[order]
+    time, length = col["time"], col["length"].astype(np.int64)
+    start, end = float(time[0]), float(time[-1])
+    duration = max(end - start, 1e-9)
+    total_bytes = int(length.sum())
+
+    # ---- paths and their rate timeline
+    bins = np.floor((time - start) / bin_size).astype(np.int64)
+    n_bins = int(bins[-1]) + 1 if len(bins) else 0
+    path_summary = {}
+    for name, i in path_index.items():
+        mine = paths == i
+        packets, size = int(mine.sum()), int(length[mine].sum())
+        timeline = np.bincount(bins[mine], weights=length[mine] * 8.0 / bin_size, minlength=n_bins)
+        path_summary[name] = {"packets": packets, "bytes": size, "share": round(size / float(total_bytes), 4),
+                              "mean_bps": round(size * 8.0 / duration), "peak_bps": round(float(timeline.max())),
+                              "timeline_bps": [round(float(rate)) for rate in timeline]}
+
+    # ---- flows: group the packets by (src, dst, proto, sport, dport), in time order within every group
+    keys = np.empty(len(time), dtype=[("src", "u4"), ("dst", "u4"), ("proto", "u1"), ("sport", "u2"),
+                                      ("dport", "u2")])
+    for name in keys.dtype.names:
+        keys[name] = col[name]
+    flow_keys, flow_ids = np.unique(keys, return_inverse=True)
+    flow_ids = flow_ids.ravel()
+    by_flow = np.lexsort((time, flow_ids))
+    ids, seq, path_of = flow_ids[by_flow], col["seq"][by_flow], paths[by_flow]
+    same = ids[1:] == ids[:-1]
+    # a packet is reordered when its sequence number is below the highest one seen before in its flow; the
+    # flow id in the high bits keeps the running maximum from leaking from one flow into the next
+    numbered = seq >= 0
+    tagged = np.where(numbered, ids.astype(np.int64) * (1 << 33) + seq, -1)
+    highest = np.maximum.accumulate(tagged)
+    reordered = np.zeros(len(ids), dtype=bool)
+    reordered[1:] = same & numbered[1:] & (tagged[1:] < highest[:-1])
+    changes = np.zeros(len(ids), dtype=bool)
+    changes[1:] = same & (path_of[1:] != path_of[:-1])
+    flow_count = len(flow_keys)
+    per_path = np.zeros((flow_count, len(names)), dtype=np.int64)
+    np.add.at(per_path, (flow_ids, paths), 1)
+    flow_bytes = np.bincount(flow_ids, weights=length, minlength=flow_count)
+    flow_reordered = np.bincount(ids, weights=reordered, minlength=flow_count)
+    flow_changes = np.bincount(ids, weights=changes, minlength=flow_count)
+    flows = []
+    for i in np.argsort(-flow_bytes, kind="stable"):
+        key = flow_keys[i]
+        flows.append({"flow": _flow_name(key["src"], key["dst"], key["proto"], key["sport"], key["dport"]),
+                      "packets": int(per_path[i].sum()), "bytes": int(flow_bytes[i]),
+                      "paths": dict((name, int(per_path[i][j])) for j, name in enumerate(names) if per_path[i][j]),
+                      "path_changes": int(flow_changes[i]), "reordered": int(flow_reordered[i])})
+    return {"packets": int(len(time)), "bytes": total_bytes, "duration_s": round(duration, 3), "bin_s": bin_size,
+            "paths": path_summary, "flows": flows,
+            "reordered": int(reordered.sum()), "path_changes": int(changes.sum())}
+
+
+def analyze(filenames, bin_size=1.0):
+    """ {test: summary} of the capture files, grouped by test. """
+    tests = collections.OrderedDict()
+    for filename in sorted(filenames):
+        capture = read_capture(filename)
+        tests.setdefault(capture.test, []).append(capture)
+    return collections.OrderedDict((test, summarize(captures, bin_size)) for test, captures in tests.items())
+
+
+def format_summary(results, max_flows=20):
+    lines = []
+    for test, summary in results.items():
+        lines.append("=== test %s: %d packets, %d bytes in %.1f s, %d reordered, %d path changes" % (
+            test, summary["packets"], summary.get("bytes", 0), summary.get("duration_s", 0.0),
+            summary.get("reordered", 0), summary.get("path_changes", 0)))
+        for name, path in sorted(summary["paths"].items()):
+            lines.append("  %-6s %8d pkts %11d B  %5.1f%%  mean %9d bit/s  peak %9d bit/s" % (
+                name, path["packets"], path["bytes"], 100 * path["share"], path["mean_bps"], path["peak_bps"]))
+        for flow in summary["flows"][:max_flows]:
+            split = " ".join("%s:%d" % item for item in sorted(flow["paths"].items()))
+            lines.append("  %-44s %7d pkts  %-24s changes %d  reordered %d" % (
+                flow["flow"], flow["packets"], split, flow["path_changes"], flow["reordered"]))
+        if len(summary["flows"]) > max_flows:
+            lines.append("  ... %d more flows" % (len(summary["flows"]) - max_flows))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summary of the sX-eth2-dump-test_N captures of routing_net.py")
+    parser.add_argument("files", nargs="*", help="capture files (default: *-dump-test_* in the current directory)")
+    parser.add_argument("--bin", type=float, default=1.0, help="width of the rate timeline bins in seconds")
+    parser.add_argument("--json", help="write the summary to this file")
+    parser.add_argument("--flows", type=int, default=20, help="flows listed per test")
+    args = parser.parse_args(argv)
+    files = args.files or [name for name in os.listdir(".") if _FILE_NAME.search(name)]
+    if not files:
+        parser.error("no capture files")
+    results = analyze(files, args.bin)
+    print(format_summary(results, args.flows))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
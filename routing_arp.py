@@ -0,0 +1,78 @@
+"""
+ Proxy-ARP responder used by routing_controller.py.
+
+ The controller learns where every host is (IP -> MAC, switch and port) from the ARP packets and the first IP
+ packets of the hosts it sees, and answers the ARP requests for known hosts itself: the reply is built from the
+ learned MAC address and sent back through the port the request came in, so a request costs one packet_in and
+ one packet_out and never crosses the inter-switch links. Requests for hosts that are not known yet are flooded
+ to the edge ports of all switches, at most once every `flood_holdoff` seconds per target address, so a host
+ that does not answer (or many hosts asking for it at once) cannot multiply the control traffic.
+
+ Optionally (arp_rules) the controller also installs ARP rules at the switches, matching the target address
+ (and, at the edge switches, the input port of a learned host or of a link), so the ARP packets of known hosts
+ are forwarded by the switches along the default paths and the controller sees only the first ARP packet of
+ every host.
+
+ The frames are parsed and built as raw bytes. The module does not depend on POX.
+"""
+
+import struct
+
+ARP_REQUEST = 1
+ARP_REPLY = 2
+
+_ARP = struct.Struct("!HHBBH6s4s6s4s")  # Ethernet/IPv4 ARP, 28 bytes after the Ethernet header
+
+
+def parse_arp(data):
+    """ (opcode, sender MAC, sender IP, target MAC, target IP) of an Ethernet/IPv4 ARP frame, or None. """
+    if len(data) < 14 + _ARP.size:
+        return None
+    hwtype, prototype, hwlen, protolen, opcode, sha, spa, tha, tpa = _ARP.unpack_from(data, 14)
+    if hwtype != 1 or prototype != 0x0800 or hwlen != 6 or protolen != 4:
+        return None
+    return opcode, sha, spa, tha, tpa
+
+
+def arp_request(mac, ip, target_ip):
+    """ Ethernet frame of the broadcast ARP request "who has target_ip, tell ip at mac" (addresses as bytes). """
+    return (b"\xff" * 6 + mac + b"\x08\x06" +
+            _ARP.pack(1, 0x0800, 6, 4, ARP_REQUEST, mac, ip, b"\x00" * 6, target_ip))
+
+
+def arp_reply(mac, ip, requester_mac, requester_ip):
+    """ Ethernet frame of the ARP reply "ip is at mac" to a requester (all addresses as bytes). """
+    return (requester_mac + mac + b"\x08\x06" +
+            _ARP.pack(1, 0x0800, 6, 4, ARP_REPLY, mac, ip, requester_mac, requester_ip))
+
+
+class ArpResponder(object):
+
+    def __init__(self, flood_holdoff=1.0):
+        self.flood_holdoff = flood_holdoff
+        self._flooded = {}  # target ip (4 bytes) -> time of the last flood
+        self.answered = 0  # requests answered by the controller
+        self.relayed = 0  # replies (and requests) delivered to a known host
+        self.flooded = 0
+        self.suppressed = 0  # floods skipped because the target was flooded for recently
+
+    def may_flood(self, target, now):
+        """ True if a request for the unknown address `target` may be flooded now. """
+        last = self._flooded.get(target)
+        if last is not None and now - last < self.flood_holdoff:
+            self.suppressed += 1
+            return False
+        if len(self._flooded) > 4096:
+            # addresses that never answer must not grow the table without bound
+            self._flooded = dict((ip, t) for ip, t in self._flooded.items() if now - t < self.flood_holdoff)
+        self._flooded[target] = now
+        self.flooded += 1
+        return True
+
+    def resolved(self, target):
+        # the target is known now, the next request for it is answered
+        self._flooded.pop(target, None)
+
+    def counters(self):
+        return {"answered": self.answered, "relayed": self.relayed, "flooded": self.flooded,
+                "suppressed": self.suppressed}
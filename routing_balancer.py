@@ -0,0 +1,148 @@
+"""
+ Multipath load balancer used by routing_controller.py.
+
+ Best-effort flows are spread over the candidate paths with a weighted consistent hash of their 5-tuple
+ (weighted rendezvous hashing): every path gets the score -ln(u) / weight, where u in (0, 1) is a hash of the
+ flow and the path, and the flow goes to the path with the lowest score. A flow lands on a path with a
+ probability proportional to the weight of the path, the same flow always gets the same path for the same
+ weights, and when a weight changes only the flows that have to move (to or from that path) move.
+
+ On top of the hash the balancer remembers the path of every flow for `hold` seconds after it was last
+ seen, so a flow does not change path when the weights change while it is active:
+    - without flowlets (flowlet_gap=None) a flow keeps its path for `pin_ttl` seconds after its last
+      packet_in,
+    - with flowlet switching a flow may only move when it comes back after being idle for `flowlet_gap`
+      seconds, i.e. at the start of a new burst, when reordering its packets is not possible anymore.
+
+ The path of a flow that does not keep its path can also be chosen by the caller (e.g. by the placement engine
+ of routing_placement.py) instead of the hash; the balancer then only remembers it.
+
+ Everything is deterministic (no random numbers, no per-process hash seeds), so assignments can be
+ reproduced offline. The module does not depend on POX.
+"""
+
+import math
+import zlib
+from collections import OrderedDict
+
+_MASK64 = (1 << 64) - 1
+
+
+def _mix(x):
+    # splitmix64 finalizer: spreads the bits of x over a 64-bit value
+    x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9 & _MASK64
+    x = (x ^ (x >> 27)) * 0x94d049bb133111eb & _MASK64
+    return x ^ (x >> 31)
+
+
+def flow_hash(flow):
+    """ 64-bit hash of a flow given as bytes (e.g. the addresses, protocol and ports read from a packet). """
+    return _mix(zlib.crc32(flow) | (zlib.adler32(flow) << 32))
+
+
+def path_seed(path_id):
+    return _mix(zlib.crc32(repr(path_id).encode()))
+
+
+def rendezvous(h, seeds, weights):
+    """ Index of the path with the lowest score -ln(u) / weight (paths with no weight are never chosen). """
+    best, best_score = None, None
+    for i, (seed, weight) in enumerate(zip(seeds, weights)):
+        if weight <= 0:
+            continue
+        u = (_mix(h ^ seed) + 0.5) / 18446744073709551616.0
+        score = -math.log(u) / weight
+        if best_score is None or score < best_score:
+            best, best_score = i, score
+    return best
+
+
+class FlowBalancer(object):
+
+    def __init__(self, flowlet_gap=None, pin_ttl=60.0, capacity=65536):
+        self.flowlet_gap = flowlet_gap
+        self.hold = flowlet_gap if flowlet_gap is not None else pin_ttl
+        self.capacity = capacity
+        self.flows = OrderedDict()  # flow hash -> [path id, last seen], least recently seen first
+        self.seeds = {}  # path id -> seed
+        self.kept = 0  # decisions that kept the path the flow had
+        self.moved = 0  # flows that came back and were hashed to another path
+        self.new = 0  # flows seen for the first time (or forgotten)
+        self.assigned = {}  # tuple of path ids -> {path id: number of decisions}
+        self.weights = {}  # tuple of path ids -> last weights used for them
+
+    def _seed(self, path_id):
+        seed = self.seeds.get(path_id)
+        if seed is None:
+            seed = self.seeds[path_id] = path_seed(path_id)
+        return seed
+
+    def pick(self, flow, path_ids, weights, now, choose=None):
+        """
+        Index of the path for the flow among the candidate paths (identified by hashable ids, e.g. their
+        links) with the given weights (e.g. residual capacities). flow: bytes identifying the flow.
+        choose(): index of the path for a flow that does not keep its path, instead of the weighted hash.
+        """
+        h = flow_hash(flow)
+        state = self.flows.get(h)
+        previous = None
+        if state is not None:
+            previous = state[0]
+            if now - state[1] < self.hold and previous in path_ids:
+                state[1] = now
+                self.flows.move_to_end(h)
+                self.kept += 1
+                return path_ids.index(previous)
+
+        if choose is not None:
+            index = choose()
+        else:
+            if not any(weight > 0 for weight in weights):
+                weights = [1.0] * len(path_ids)  # every path is full: spread evenly
+            index = rendezvous(h, [self._seed(path_id) for path_id in path_ids], weights)
+        chosen = path_ids[index]
+        if previous is None:
+            self.new += 1
+        elif previous == chosen:
+            self.kept += 1
+        else:
+            self.moved += 1
+        self.flows[h] = [chosen, now]
+        self.flows.move_to_end(h)
+        if len(self.flows) > self.capacity:
+            self.flows.popitem(last=False)
+
+        group = tuple(path_ids)
+        counts = self.assigned.setdefault(group, {})
+        counts[chosen] = counts.get(chosen, 0) + 1
+        self.weights[group] = weights
+        return index
+
+    def assign(self, flow, path_id, now):
+        # the flow has been moved to another path by the controller
+        h = flow_hash(flow)
+        self.flows[h] = [path_id, now]
+        self.flows.move_to_end(h)
+
+    def counters(self):
+        decisions = self.kept + self.moved + self.new
+        return {"flows": len(self.flows), "kept": self.kept, "moved": self.moved, "new": self.new,
+                "stickiness": float(self.kept) / (self.kept + self.moved) if self.kept + self.moved else 1.0,
+                "decisions": decisions}
+
+    def distribution(self):
+        """
+        For every set of candidate paths: share of the hashed decisions per path, share wanted by the last
+        weights, and the largest absolute difference between the two.
+        """
+        result = {}
+        for group, counts in self.assigned.items():
+            total = float(sum(counts.values()))
+            shares = dict((path_id, counts.get(path_id, 0) / total) for path_id in group)
+            weights = [max(weight, 0.0) for weight in self.weights[group]]
+            if not any(weights):
+                weights = [1.0] * len(group)
+            targets = dict((path_id, weight / sum(weights)) for path_id, weight in zip(group, weights))
+            error = max(abs(shares[path_id] - targets.get(path_id, 0.0)) for path_id in group)
+            result[group] = {"shares": shares, "targets": targets, "max_error": error}
+        return result
@@ -0,0 +1,59 @@
+"""
+ Decision cache used by routing_controller.py.
+
+ A bounded LRU map with a time to live: the controller keeps there the routing decision taken for a flow
+ (keyed by the header fields of its packets), so when the rules of the flow expire in the switches and the
+ flow raises packet_in again, the decision (and the flow_mods implementing it) is reused instead of being
+ taken from scratch. Entries older than `ttl` seconds are dropped, so decisions follow the changing load
+ of the paths; the whole cache is cleared when the topology changes.
+
+ The module does not depend on POX.
+"""
+
+from collections import OrderedDict
+
+
+class DecisionCache(object):
+
+    def __init__(self, capacity=4096, ttl=5.0):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (time stored, value), least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if now - entry[0] > self.ttl:
+            del self.entries[key]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value, now):
+        self.entries[key] = (now, value)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evicted += 1
+
+    def discard(self, key):
+        self.entries.pop(key, None)
+
+    def clear(self):
+        self.entries.clear()
+
+    def counters(self):
+        return {"size": len(self.entries), "hits": self.hits, "misses": self.misses, "expired": self.expired,
+                "evicted": self.evicted}
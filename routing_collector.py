@@ -0,0 +1,153 @@
+"""
+ Port statistics collector used by routing_controller.py.
+
+ Instead of sending a burst of stats requests to a fixed set of switches every second, the collector is
+ ticked often (e.g. every 100 ms) and polls every connected switch on its own schedule:
+    - the phases of the switches are staggered, and at most a fair share of requests is sent per tick,
+      so the requests are spread over the polling interval,
+    - a switch has at most `max_in_flight` outstanding requests; a request not answered within `timeout`
+      counts as missed,
+    - the polling interval of a switch adapts to the utilization of its links: switches with links close
+      to the congestion thresholds are polled every `min_interval`, idle ones every `max_interval`; the total
+      request rate never exceeds that of polling every switch each `base_interval` (the old fixed period),
+      so the faster polling of the hot switches is paid for by the idle ones (which may then be polled even
+      less often than every `max_interval`).
+
+ The collector does not depend on POX: requests are sent with the `send(dpid)` callback, which returns the
+ xid of the request (or None if it could not be sent).
+"""
+
+import math
+
+
+class _SwitchPoll(object):
+    __slots__ = ("dpid", "interval", "next_due", "in_flight", "load", "requests", "replies", "missed",
+                 "latency", "max_latency")
+
+    def __init__(self, dpid, interval, next_due):
+        self.dpid = dpid
+        self.interval = interval
+        self.next_due = next_due
+        self.in_flight = {}  # xid -> send time
+        self.load = 0.0
+        self.requests = 0
+        self.replies = 0
+        self.missed = 0
+        self.latency = None  # EWMA of the reply latency in seconds
+        self.max_latency = 0.0
+
+
+class StatsCollector(object):
+
+    def __init__(self, send, base_interval=1.0, min_interval=0.25, max_interval=2.0, hot=0.6,
+                 max_in_flight=1, timeout=2.0, tick=0.1):
+        self.send = send
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.hot = hot  # utilization from which a switch is polled every min_interval
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.tick_length = tick
+        self.switches = {}  # dpid -> _SwitchPoll
+        self.late_replies = 0
+        self._slot = 0
+
+    def add_switch(self, dpid, now):
+        # the first polls of the switches are staggered over the interval (golden ratio sequence)
+        self._slot += 1
+        offset = (self._slot * 0.6180339887) % 1.0
+        self.switches[dpid] = _SwitchPoll(dpid, self.base_interval, now + offset * self.base_interval)
+        self._adapt()
+
+    def remove_switch(self, dpid):
+        self.switches.pop(dpid, None)
+        self._adapt()
+
+    def set_load(self, dpid, load):
+        """ Highest utilization of the links of the switch, as measured from its last reply. """
+        poll = self.switches.get(dpid)
+        if poll is not None:
+            poll.load = load
+            self._adapt()
+
+    def _adapt(self):
+        # interval wanted by every switch: min_interval when hot, growing linearly to max_interval when idle
+        polls = list(self.switches.values())
+        if not polls:
+            return
+        wanted = {}
+        for poll in polls:
+            share = min(poll.load / self.hot, 1.0) if self.hot > 0 else 1.0
+            wanted[poll.dpid] = self.max_interval - (self.max_interval - self.min_interval) * share
+        budget = len(polls) / self.base_interval  # requests per second of the old fixed polling
+        rate = sum(1.0 / interval for interval in wanted.values())
+        if rate > budget:
+            # the hot switches keep their interval, the others share what is left of the budget
+            hot = [dpid for dpid, interval in wanted.items() if interval <= self.min_interval]
+            hot_rate = sum(1.0 / wanted[dpid] for dpid in hot)
+            cold = len(wanted) - len(hot)
+            if hot_rate >= budget or cold == 0:
+                scale = rate / budget
+                wanted = dict((dpid, interval * scale) for dpid, interval in wanted.items())
+            else:
+                cold_interval = cold / (budget - hot_rate)
+                for dpid, interval in wanted.items():
+                    if interval > self.min_interval:
+                        wanted[dpid] = max(interval, cold_interval)
+        for poll in polls:
+            new = wanted[poll.dpid]
+            if new < poll.interval:
+                # poll sooner if the switch became hot
+                poll.next_due -= poll.interval - new
+            poll.interval = new
+
+    def tick(self, now):
+        """ Expire unanswered requests and send the requests that are due (at most a fair share per tick). """
+        for poll in self.switches.values():
+            for xid, sent in list(poll.in_flight.items()):
+                if now - sent > self.timeout:
+                    del poll.in_flight[xid]
+                    poll.missed += 1
+
+        rate = sum(1.0 / poll.interval for poll in self.switches.values())
+        quota = max(1, int(math.ceil(rate * self.tick_length)))
+        due = sorted((poll.next_due, poll.dpid) for poll in self.switches.values() if poll.next_due <= now)
+        sent = 0
+        for next_due, dpid in due:
+            if sent >= quota:
+                break
+            poll = self.switches[dpid]
+            if len(poll.in_flight) >= self.max_in_flight:
+                continue
+            xid = self.send(dpid)
+            # the schedule advances from the due time, not from now, so the phases do not drift
+            poll.next_due = max(next_due + poll.interval, now)
+            if xid is None:
+                continue
+            poll.in_flight[xid] = now
+            poll.requests += 1
+            sent += 1
+        return sent
+
+    def reply(self, dpid, xid, now):
+        """ Account for a reply; returns the send time of its request, or None for unknown/late replies. """
+        poll = self.switches.get(dpid)
+        sent = poll.in_flight.pop(xid, None) if poll is not None else None
+        if sent is None:
+            self.late_replies += 1
+            return None
+        latency = now - sent
+        poll.replies += 1
+        poll.latency = latency if poll.latency is None else poll.latency + 0.2 * (latency - poll.latency)
+        poll.max_latency = max(poll.max_latency, latency)
+        return sent
+
+    def counters(self):
+        """ Per-switch polling counters: dpid -> dict. """
+        result = {}
+        for dpid, poll in self.switches.items():
+            result[dpid] = {"interval": poll.interval, "load": poll.load, "in_flight": len(poll.in_flight),
+                            "requests": poll.requests, "replies": poll.replies, "missed": poll.missed,
+                            "latency": poll.latency, "max_latency": poll.max_latency}
+        return result
@@ -1,15 +1,70 @@
 """
- The script implements a simple controller for a network with 6 hosts and 5 switches.
- The switches are connected in a diamond topology (without vertical links):
-    - 3 hosts are connected to the left (s1) and 3 to the right (s5) edge of the diamond.
+ The script implements a simple controller for a network of edge switches (with hosts) interconnected by
+ parallel paths, e.g. the diamond built by MyTopo in routing_net.py: 6 hosts and 5 switches, 3 hosts on the
+ left (s1) and 3 on the right (s5) edge of the diamond, connected through s2, s3 and s4.
 
  The overall operation of the controller is as follows:
-    - wait for connection establishment from all switches in function _handle_ConnectionUp; therein, among others,
-      start _timer_func() to cyclically chenge routing (see also below)
-    - default routing is set in all switches on the reception of packet_in messages form the switch,
-    - then the routing for (h1-h4) pair in switch s1 is changed every one second in a round-robin manner to
-      load balance the traffic through switches s3, s4, s2. This is done in function _timer_func() that is
-      triggered every second by a timer started in _handle_ConnectionUp, lines (around) 203-204
+    - switches are registered in the topology model (routing_topology.py) in _handle_ConnectionUp, links between
+      them are found by openflow.discovery (LLDP) and updated on PortStatus events; hosts are learned from their
+      ARP packets and first IP packets,
+    - ARP is answered by the controller from the learned hosts (proxy-ARP, routing_arp.py), requests for unknown
+      hosts are flooded to the edge ports at most once per ARP_FLOOD_HOLDOFF; with --arp_rules the switches also
+      get ARP rules, so the ARP packets of known hosts do not reach the controller at all,
+    - for every pair of edge switches the k shortest paths are precomputed, so routing decisions are table lookups,
+    - default (static) routing is pushed to each switch proactively as one batch of flow_mods ended by a barrier,
+      and resynchronised (only the differences) whenever the topology or the set of known hosts changes,
+    - packet_in messages are dispatched on (switch, ethertype) read from the raw frame through a table compiled
+      (with the routes of the dynamic edges) whenever the topology changes,
+    - new flows entering the network at the DYNAMIC_EDGES switches (s1, and s5 for the return traffic) raise
+      packet_in and are placed on one of the candidate paths (decisions are kept for a while in a bounded LRU cache keyed by the flow, routing_cache.py,
+      so a flow coming back after its rules expired reuses them): flows matching an intent (intents.json, indexed
+      by routing_intents.py) get the least loaded path meeting their latency budget and bandwidth (an intent covers
+      both directions: the two directions of a pair share its round-trip budget and the return direction keeps
+      the mirror of the path of the forward one when it fits), the rest of
+      the traffic is placed by balance_pick() on the path whose busiest link stays the least utilized once
+      charged with the estimated demand of the flow (routing_placement.py; or, with --placement=hash, spread
+      with a weighted consistent hash, routing_balancer.py, optionally with flowlet switching); both use the
+      port statistics of every port of every switch, kept in the
+      store of routing_stats.py (requires NumPy) and polled by the adaptive collector of routing_collector.py,
+      which is ticked by _timer_func() every STATS_TICK seconds; the demand of a new flow is estimated per class
+      of flows from the flow statistics, and the headroom reserved by the intents with min_bw is kept free of
+      best-effort traffic,
+    - link rates, routing decisions and migrations are queued as records and written to rotating files by a
+      background thread (routing_telemetry.py), so the handlers do no console or file I/O,
+    - the placed flows are kept in a registry (routing_flows.py) with their rates measured from flow stats; flows
+      crossing an overloaded link are moved to other paths (fewest flows first, elephants first, with a budget
+      of migrations per interval) with batches of OFPFC_MODIFY messages,
+    - the rules of the placed flows match the coarsest aggregate that keeps their routing decision (by default
+      the pair of hosts, routing_aggregate.py) instead of the whole header of their first packet; the rules of
+      every switch are counted against TABLE_BUDGET, decisions near the budget are made coarser and the coldest
+      flows are evicted at the budget,
+    - the delays of the candidate paths are measured with probe packets sent every PROBE_INTERVAL seconds along
+      every path and sent back to the controller by the far edge switch (routing_probes.py); the smoothed delays
+      replace the configured ones in the routing decisions,
+    - the rules of the placed flows report their removal (OFPFF_SEND_FLOW_REM); their lifetimes are tracked
+      (routing_lifecycle.py) and the idle/hard timeouts of the next installs adapted: longer for flows that keep
+      coming back after an idle expiry, shorter for one-shot flows, within the table budget,
+    - the messages to the switches are queued per switch and written with one send per switch at the end of the
+      tick of the event loop (routing_outbox.py); a new flow buffered by its switch is released by the flow_mod of
+      its first hop (buffer_id), so its packet crosses the control channel only once,
+    - the utilization of every link is forecast a few seconds ahead from its port stats (routing_forecast.py,
+      Holt's linear method by default); the routing decisions use the forecast when it is above the current load,
+      and the paths crossing a link in the congested band (entered at CONGESTION_ENTER, left below
+      CONGESTION_EXIT) are avoided, so new flows are steered away before the link saturates,
+    - every placed flow has a precomputed backup path, the candidate path sharing the fewest links with its own
+      (routing_failover.py); when links go down the flows crossing them are moved to their backups at once, in
+      one batch of flow_mods per switch, and moved back once the links have been up again for RESTORE_HOLD,
+    - the links between switches have a best-effort and an intent queue (HTB classes set up by routing_net.py,
+      routing_queues.py): the rules enqueue the intent flows, marked with DSCP EF at their edge, in the intent
+      queue and the rest of the IP traffic in the best-effort one, so a best-effort flood does not delay the
+      intents; the queue statistics are polled with the port statistics,
+    - the handlers are timed and the messages, decisions and queue depths are counted (routing_metrics.py); the
+      metrics are served in the Prometheus text format by an HTTP server on its own thread (METRICS_PORT),
+    - the hosts, links, placed flows (with their paths and intents) and the demands and loads of the placement are
+      snapshot every STATE_INTERVAL seconds to a local file, appending only what changed (routing_state.py); the
+      flow table of every switch that connects is read with a flow stats request and reconciled with what the
+      controller wants instead of being provisioned blindly, so after a restart the rules in place are kept, the
+      placed flows are taken over with their paths and only the differences are sent.
 """
 
 """
@@ -19,7 +74,7 @@
     -> s1 - s3 (50ms)
     -> s1 - s4 (10ms)
 
-2 INTENCJE:
+2 INTENCJE (intents.json):
     1) h1-h4: maksymalne opoźnienie = 60ms
     2) h2-h5: maksymalne opoźnienie = 15ms
     3) reszta ruchu w sieci
@@ -29,134 +84,379 @@
 from pox.core import core
 import pox.openflow.libopenflow_01 as of
 from pox.lib.util import dpidToStr
-from pox.lib.addresses import IPAddr, EthAddr
-from pox.lib.packet.arp import arp
-from pox.lib.packet.ethernet import ethernet, ETHER_BROADCAST
-from pox.lib.packet.packet_base import packet_base
 from pox.lib.packet.packet_utils import *
-import pox.lib.packet as pkt
 from pox.lib.recoco import Timer
 import time
-import random
+import socket
+import struct
+import os
+import json
+
+from routing_topology import Topology, load_manifest
+from routing_stats import PortStatsStore, port_counters, TX_PACKETS, RX_PACKETS
+from routing_collector import StatsCollector
+from routing_cache import DecisionCache
+from routing_intents import IntentTable, choose_path
+from routing_balancer import FlowBalancer
+from routing_flows import FlowRegistry
+from routing_telemetry import Telemetry
+from routing_metrics import Metrics
+from routing_probes import PathProber, PROBE_IP, PROBE_SRC_MAC, probe_frame, parse_probe
+from routing_arp import ArpResponder, ARP_REQUEST, arp_reply, arp_request, parse_arp
+from routing_aggregate import Aggregator, LEVELS
+from routing_outbox import Outbox
+from routing_lifecycle import FlowLifecycle
+from routing_forecast import LinkForecaster, MODELS as FORECAST_MODELS
+from routing_failover import Failover
+from routing_placement import PlacementEngine
+from routing_queues import QueueStats, BEST_EFFORT as BEST_EFFORT_QUEUE, INTENT as INTENT_QUEUE, INTENT_TOS
+from routing_state import StateJournal, SECTIONS as STATE_SECTIONS, link_key, parse_link_key
 
 log = core.getLogger()
 
 # initialize global variables
 # ================DEKLARACJA BANDWIDTH==================
-S1_S2_BW = 1_000_000  
-S1_S3_BW = 1_000_000  
-S1_S4_BW = 1_000_000  
+S1_S2_BW = 1_000_000
+S1_S3_BW = 1_000_000
+S1_S4_BW = 1_000_000
 # ================DEKLARACJA BANDWIDTH==================
 
-
-# ids of connections to switches
-s1_dpid = 0
-s2_dpid = 0
-s3_dpid = 0
-s4_dpid = 0
-s5_dpid = 0
-
-# port statistics (number of packets sent or received) received from the switches in current step
-s1_p1 = 0  # sent - Tx
-s1_p4 = 0  # sent
-s1_p5 = 0  # sent
-s1_p6 = 0  # sent
-s2_p1 = 0  # received - Rx
-s3_p1 = 0  # received
-s4_p1 = 0  # received
-
-# port statistics (number of packets sent or received) received from the switch in previous step
-pre_s1_p1 = 0  # sent
-pre_s1_p4 = 0  # sent
-pre_s1_p5 = 0  # sent
-pre_s1_p6 = 0  # sent
-pre_s2_p1 = 0  # received
-pre_s3_p1 = 0  # received
-pre_s4_p1 = 0  # received
-
-# =================zmienne do obliczania bitrate na łączach s1-s3 i s1-s4===================
-pre_s1_s3_bytes = 0
-s1_s3_bytes = 0
-pre_s1_s4_bytes = 0
-s1_s4_bytes = 0
-pre_s1_s2_bytes = 0
-s1_s2_bytes = 0
-bitrate_s1_s3 = 0
-bitrate_s1_s4 = 0
-bitrate_s1_s2 = 0
-# =================zmienne do obliczania bitrate na łączach s1-s3 i s1-s4===================
-
-
-# variable turn controls the round robin operation (takes value from the set 0,1,2)
-turn = 0
-
-# routing in the network changes every "routing_timer" seconds
+# capacities (bit/s) and delays (ms) of the links, by switch names as in MyTopo; links not listed get the defaults.
+# With --manifest=<file> (written by routing_net.py --manifest) they, DYNAMIC_EDGES and the number of candidate
+# paths are taken from the manifest of the network instead.
+LINK_BW = {("s1", "s2"): S1_S2_BW, ("s1", "s3"): S1_S3_BW, ("s1", "s4"): S1_S4_BW}
+DEFAULT_BW = 1_000_000
+LINK_DELAY_MS = {("s1", "s2"): 200, ("s1", "s3"): 50, ("s1", "s4"): 10}
+
+# edge switches that place every new flow on a path dynamically (on packet_in); other switches get static routes.
+# Both edges of the diamond place their flows, so the return traffic towards h1-h3 is balanced over the uplinks of
+# s5 and the replies of the intent flows are kept within the budgets of their intents.
+DYNAMIC_EDGES = ("s1", "s5")
+
+# intents (prefixes, protocol/ports, maximum delay in ms, minimum bandwidth in bit/s, see routing_intents.py),
+# loaded in launch() from INTENTS_FILE or from the file given with --intents=<file>
+INTENTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json")
+intent_table = IntentTable()
+
+# Best-effort load balancing: with FLOWLET_GAP set (whole seconds, used as the idle timeout of the flow rules, so
+# a packet_in of a known flow means it has been idle that long) a flow may move to another path at the start of
+# every burst; otherwise it keeps its path for FLOW_PIN_TTL seconds after its last packet_in.
+FLOWLET_GAP = None
+FLOW_PIN_TTL = 60.0
+FLOW_IDLE_TIMEOUT = 2
+balancer = FlowBalancer(FLOWLET_GAP, FLOW_PIN_TTL)
+
+# Lifecycle of the rules of the placed flows (routing_lifecycle.py), tracked from their FlowRemoved messages. Without
+# flowlets (the idle timeout is then the flowlet gap) the idle timeout of a rule installed again within RECUR_WINDOW
+# seconds of its idle expiry doubles, up to FLOW_MAX_IDLE, with the hard timeout FLOW_MAX_HARD; a rule whose last
+# lifetime carried a single packet gets FLOW_MIN_IDLE. Near the table budget no idle timeout is extended.
+# --adaptive_timeouts=False keeps FLOW_IDLE_TIMEOUT for every rule.
+ADAPTIVE_TIMEOUTS = True
+FLOW_MIN_IDLE = 1
+FLOW_MAX_IDLE = 16
+FLOW_MAX_HARD = 120
+RECUR_WINDOW = 10.0
+lifecycle = FlowLifecycle(FLOW_IDLE_TIMEOUT, FLOW_MIN_IDLE, FLOW_MAX_IDLE, FLOW_MAX_HARD, RECUR_WINDOW)
+
+# number of candidate paths kept for every pair of switches
+K_PATHS = 3
+
+topology = Topology(K_PATHS, LINK_DELAY_MS)
+
+# port statistics of all ports of all switches (ring buffers of timestamped counters, see routing_stats.py)
+stats = PortStatsStore()
+
+# routing in the network changes every "routing_timer" seconds: every switch is polled for port statistics
+# once per routing_timer on average; switches with loaded links more often, idle ones less often
 routing_timer = 1
+STATS_TICK = 0.1
+stats_timer = None
+
+# Predictive congestion avoidance (routing_forecast.py): the utilization of every link over each polling interval
+# feeds a forecast of its utilization FORECAST_HORIZON seconds ahead (FORECAST_MODEL "holt", "linear" or "ewma",
+# --forecast=<model> or off). A link enters the congested band when its forecast reaches CONGESTION_ENTER and leaves
+# it below CONGESTION_EXIT; the errors of the forecasts are written to the telemetry ("forecast" records).
+FORECAST_MODEL = "holt"
+FORECAST_HORIZON = 2.0
+CONGESTION_ENTER = 0.8
+CONGESTION_EXIT = 0.6
+forecaster = LinkForecaster(FORECAST_MODEL, FORECAST_HORIZON, enter=CONGESTION_ENTER, exit=CONGESTION_EXIT)
+
+# Placement of the best-effort flows (routing_placement.py): PLACEMENT "minmax" puts a new flow on the candidate
+# path whose busiest link ends up the least utilized with the demand of the flow, estimated per class of flows
+# (intent, protocol, destination port) from the flow statistics (DEFAULT_DEMAND bit/s before the first
+# measurement); "hash" spreads the flows with the weighted consistent hash of the balancer. Set with
+# --placement=minmax|hash. Intent flows with min_bw reserve it on their path.
+PLACEMENT = "minmax"
+DEFAULT_DEMAND = 50_000
+placer = PlacementEngine(lambda link: _link_bw(*link), DEFAULT_DEMAND)
+
+# Fast failover (routing_failover.py): every placed flow gets a backup path disjoint from its path as far as the
+# candidate paths allow; the flows crossing a link that goes down are moved to their backups right away and back to
+# their primary paths once the link has been up for RESTORE_HOLD seconds.
+RESTORE_HOLD = 5.0
+failover = Failover(RESTORE_HOLD)
+
+# Per-class queues (routing_queues.py) of the ports between switches: with QUEUES the intent flows are marked with
+# DSCP EF (INTENT_TOS) at their edge and enqueued in INTENT_QUEUE on every link, the other IP traffic in
+# BEST_EFFORT_QUEUE; the delay probes go in the intent queue, so they measure the delay the intents get. The queue
+# statistics (rates and drops per queue) are requested with the port statistics. --queues=False only outputs.
+QUEUES = True
+queue_stats = QueueStats()
+
+# Flows placed at the dynamic edges, with their paths and their rates measured from flow stats (polled together
+# with the port stats of the dynamic edges). Flows crossing a link loaded above MIGRATE_ABOVE are moved to other
+# paths until the link is back to MIGRATE_TARGET, at most MIGRATION_BUDGET flows per routing_timer.
+FLOW_PRIORITY = 100
+MIGRATE_ABOVE = 0.9
+MIGRATE_TARGET = 0.7
+MIGRATION_BUDGET = 8
+flows = FlowRegistry(budget=MIGRATION_BUDGET, interval=routing_timer)
+flow_stats_requests = {}  # dpid -> (xid, time sent) of the last flow stats request
+
+# The rules of the placed flows match the coarsest aggregate keeping their routing decision (routing_aggregate.py):
+# FLOW_AGGREGATION is "flow" (exact match), "pair" (source and destination hosts) or "prefix" (destination prefix),
+# set with --aggregation=<level>. Finer aggregates get higher priorities: FLOW_PRIORITY + 0..2, and for intents
+# INTENT_PRIORITY + 0..2. The rules of every switch are counted against TABLE_BUDGET (--table_budget=<rules>, 0 for
+# no budget): from TABLE_HIGH of the budget the decisions at the switch are one level coarser, at the budget up
+# to EVICT_BATCH of the coldest flows entering there are evicted.
+FLOW_AGGREGATION = "pair"
+INTENT_PRIORITY = 110
+TABLE_BUDGET = 1000
+TABLE_HIGH = 0.8
+EVICT_BATCH = 64
+aggregator = Aggregator(FLOW_AGGREGATION, TABLE_BUDGET, TABLE_HIGH)
+
+# link rates, routing decisions and migrations (and with "debug" all port counters) are written by a background
+# thread to rotating JSONL or CSV files (routing_telemetry.py); set with --telemetry_dir=<dir>
+# --verbosity=off|info|debug --telemetry_format=jsonl|csv
+TELEMETRY_DIR = "telemetry"
+TELEMETRY_LEVEL = "info"
+TELEMETRY_FORMAT = "jsonl"
+telemetry = Telemetry(TELEMETRY_DIR, "off")
+
+# handler latency histograms, message and decision counters and queue depths (routing_metrics.py), served in the
+# Prometheus text format on http://127.0.0.1:METRICS_PORT/metrics (--metrics_port=0 disables the endpoint)
+METRICS_PORT = 9180
+metrics = Metrics(switch_name=topology.name)
+
+# messages to the switches, sent with _send(): coalesced per switch and written once per tick of the event loop
+outbox = Outbox(lambda dpid: core.openflow.getConnection(dpid), core.callLater)
+
+# static rules already pushed to the switches (dpid -> set of rule tuples), and batches
+# still waiting for their barrier reply ((dpid, barrier xid) -> set of rule tuples)
+installed_rules = {}
+pending_rules = {}
+
+ETH_ARP = 0x0806
+ETH_IP = 0x0800
+IP_ICMP = 1
+IP_TCP = 6
+IP_UDP = 17
+PROBE_ADDRESS = socket.inet_aton(PROBE_IP)  # destination of the delay probes
+
+# packet_in dispatch table: (dpid, ethertype) -> handler(event, data); rebuilt with the routes when the topology
+# changes, packets of other types (e.g. LLDP, handled by openflow.discovery) are ignored
+packet_in_dispatch = {}
+
+# (dynamic edge dpid, destination ip as 4 bytes) -> (destination Host, candidate paths)
+routes = {}
+
+# decisions taken for the flows entering at the dynamic edges: flow key -> (path, ((dpid, packed flow_mods), ...),
+# match at the edge, its _match_key, intent, key hashed by the balancer, rule priority, switches with a rule), reused when the rules of the flow expire and it
+# raises packet_in again (see routing_cache.py)
+DECISION_CACHE_SIZE = 4096
+DECISION_TTL = 5.0
+decisions = DecisionCache(DECISION_CACHE_SIZE, DECISION_TTL)
+
+# active delay measurement of the paths leaving the dynamic edges (routing_probes.py): every path is probed every
+# PROBE_INTERVAL seconds, at most PROBE_RATE probes per second in total; the measured delays replace the
+# configured LINK_DELAY_MS ones in the routing decisions once a path has a few samples
+PROBE_INTERVAL = 0.5
+PROBE_RATE = 20.0
+PROBE_PRIORITY = 200
+probes = PathProber(PROBE_INTERVAL, PROBE_RATE)
+
+# proxy-ARP (routing_arp.py): requests for known hosts are answered by the controller, requests for unknown ones
+# are flooded at most once every ARP_FLOOD_HOLDOFF seconds per address. With ARP_RULES (--arp_rules=True) the
+# switches get ARP rules towards every known host, matched at the edge switches on the ports of the learned hosts
+# and of the links, so only the first ARP packet of a host reaches the controller.
+ARP_FLOOD_HOLDOFF = 1.0
+ARP_RULES = False
+ARP_PRIORITY = 100
+arp_responder = ArpResponder(ARP_FLOOD_HOLDOFF)
+
+# Hosts are learned from their ARP packets at once, and from their IP packets only HOST_LEARN_HOLD seconds after
+# the last switch connected. Until openflow.discovery has probed every port, an IP packet forwarded by the rules
+# left in the switches (by a controller that restarted) can come in on a link port not discovered yet; a host
+# learned there would be routed to around a loop.
+HOST_LEARN_HOLD = 6.0
+host_learn_from = 0.0  # time from which hosts are learned from IP packets
+hosts_held = 0  # IP packets of unknown hosts not learned from during the hold
+
+# Warm restart (routing_state.py): every STATE_INTERVAL seconds the hosts, the links, the placed flows (with their
+# paths and intents) and the demands and loads of the placement are snapshot to the file given with --state=<file>,
+# appending only what changed; nothing is kept without it (a file left by another run or topology would be restored).
+# On start the demands and loads are restored; the hosts and links of a switch are taken over when it connects (a link
+# once both of its ends are connected). The flow table of every switch that connects is read first (a flow stats
+# request, RECONCILE_TIMEOUT seconds at most) and reconciled with the rules the controller wants: those already there
+# are kept, the missing ones sent and the rules of the placed flows of the snapshot taken over with their paths and
+# counters. Static rules the controller does not want (yet) are left in place for STATE_HOLD seconds: they lead to
+# hosts it has not learned again, and deleting them at once would cut traffic it has not seen. They are replaced when
+# it installs a rule with the same match, deleted as soon as they lead to a host it has learned (the rules it wants
+# towards the host are others) and at the latest after STATE_HOLD; once hosts are learned again (HOST_LEARN_HOLD), the
+# controller asks with ARP for the hosts they lead to, so the ones that answer get their rules before that. Links of
+# the snapshot not found again by openflow.discovery within STATE_HOLD seconds are removed, and the rest of the
+# snapshot is given up after STATE_HOLD.
+STATE_FILE = None
+STATE_INTERVAL = 2.0
+STATE_HOLD = 15.0
+RECONCILE_TIMEOUT = 2.0
+journal = None
+restored = {}  # section -> {key: value} of the snapshot not taken over (nor given up) yet
+restored_since = None
+reconciling = {}  # dpid -> (xid, time sent) of the flow stats request reading its table
+foreign_rules = {}  # dpid -> static rules found in the switch that are not wanted (yet)
+foreign_since = {}  # dpid -> time its foreign rules were found
+foreign_resolved = set()  # switches whose foreign rules had their hosts asked for with ARP
+unconfirmed_links = {}  # link of the snapshot -> time it was taken over, until openflow.discovery finds it
+adopting = {}  # state key of a flow -> (its rule read at the edge: match, priority, bytes, install time,
+               # output port; its snapshot), until its path exists again
+reconciled = {"tables": 0, "kept": 0, "sent": 0, "deleted": 0, "timeouts": 0, "adopted": 0, "gone": 0,
+              "dropped": 0, "unknown": 0}
 
 #======================================================================================
-def roulette_pick():
-    global bitrate_s1_s3, bitrate_s1_s4
-    options = [4, 5, 6]
-    weights = [200, 50, 10]
-    if bitrate_s1_s3 > 0.7*S1_S3_BW:
-        options = [4,6]
-        weights = [200,10]
-    if bitrate_s1_s4 > 0.7*S1_S4_BW:
-        options = [4,5]
-        weights = [200,50]
-    if (bitrate_s1_s4 > 0.7*S1_S4_BW) and (bitrate_s1_s3 > 0.7*S1_S3_BW):
-        options = [4]
-        weights = [200]
-    	
-    return random.choices(options, weights=weights, k=1)[0]
-    
-    
-def is_priority_flow(ip_src, ip_dst):
-    global bitrate_s1_s3, bitrate_s1_s4
-    if ip_src == "10.0.0.1" and ip_dst == "10.0.0.4":
-        if (bitrate_s1_s3 > 0.9*S1_S3_BW) && (bitrate_s1_s4 < 0.9*S1_S4_BW):
-             return "s1s4"
-        return "s1s3"  
-    if ip_src == "10.0.0.2" and ip_dst == "10.0.0.5":
-        return "s1s4"
-    return None
+def _send(dpid, data, kind, n=1, last=False):
+    # packed message(s) to the switch, written together with the others of this tick (routing_outbox.py); the
+    # switches sent to with last=True are written after the others
+    outbox.send(dpid, data, last)
+    metrics.sent(dpid, kind, n)
+
+
+def _link_bw(dpid, port):
+    peer = topology.links.get((dpid, port))
+    if peer is None:
+        return DEFAULT_BW
+    a, b = topology.name(dpid), topology.name(peer[0])
+    return LINK_BW.get((a, b), LINK_BW.get((b, a), DEFAULT_BW))
+
+
+def _path_state(paths, demand=0.0):
+    # Utilization of the busiest link of every path once charged with `demand` (bit/s) and residual capacity of
+    # its bottleneck link, from the loads kept by the placement engine: measured (or forecast, if higher),
+    # placed since the last statistics and reserved by the intents. The paths crossing a link in the congested
+    # band of the forecast have no headroom and rank after all the others (unless all the paths cross one).
+    return placer.state([path.links for path in paths], flows.reserved, time.time(), demand)
+
+
+def _demand_class(match, intent):
+    # flows whose demands are estimated together: the intent, the protocol and the destination port of the rule
+    return intent, match.nw_proto, match.tp_dst
+
+
+def path_delay(path):
+    # measured one-way delay of the path (ms), the configured one until the probes have measured it
+    return probes.delay(path.links, path.delay)
+
+
+def _pair_budget(intent, opposite):
+    # Latency budget (ms) of one direction of an intent pair: its max_delay, within what the round-trip budget
+    # leaves after the path of the opposite direction (half of it while that one is not placed).
+    budget = intent.max_delay
+    rtt = intent.rtt_budget()
+    if rtt is not None:
+        rest = rtt - path_delay(opposite.path) if opposite is not None else rtt / 2.0
+        budget = rest if budget is None else min(budget, rest)
+    return budget
+
+
+def intent_path(intent, paths, demand=0.0, opposite=None):
+    # The least loaded path (once charged with the demand of the flow) meeting the latency budget of the intent
+    # and with min_bw of headroom left, e.g. h1-h4 (60 ms) gets s1s3 or s1s4, whichever is less loaded, and h2-h5
+    # (15 ms) gets s1s4. When the flow of the opposite direction is placed (opposite: its record) the flow takes
+    # the mirror of its path if that meets the budget, so the two directions cross the same switches.
+    loads, headroom = _path_state(paths, demand)
+    delays = [path_delay(path) for path in paths]
+    budget = _pair_budget(intent, opposite)
+    if opposite is not None:
+        nodes = opposite.path.nodes()[::-1]
+        for i, path in enumerate(paths):
+            if path.nodes() == nodes and (budget is None or delays[i] <= budget) and \
+                    (not intent.min_bw or headroom[i] >= intent.min_bw):
+                return path
+    return paths[choose_path(intent, paths, delays, loads, headroom, budget)]
+
+
+def balance_pick(flow, paths, now, demand=0.0):
+    # A flow keeps its path while the balancer remembers it, so its packets are not reordered when the loads
+    # change (routing_balancer.py). Otherwise it goes to the path whose busiest link stays the least utilized
+    # with its demand (min-max) or, with PLACEMENT "hash", it is spread by the consistent hash of its 5-tuple,
+    # weighted by the residual capacity of the bottleneck link of every path.
+    loads, headroom = _path_state(paths, demand)
+    choose = None
+    if PLACEMENT != "hash":
+        choose = lambda: loads.index(min(loads))
+    return paths[balancer.pick(flow, [path.links for path in paths], headroom, now, choose)]
 #======================================================================================
-    
-def getTheTime():  # function to create a timestamp
-    flock = time.localtime()
-    then = "[%s-%s-%s" % (str(flock.tm_year), str(flock.tm_mon), str(flock.tm_mday))
-
-    if int(flock.tm_hour) < 10:
-        hrs = "0%s" % (str(flock.tm_hour))
-    else:
-        hrs = str(flock.tm_hour)
-    if int(flock.tm_min) < 10:
-        mins = "0%s" % (str(flock.tm_min))
-    else:
-        mins = str(flock.tm_min)
-
-    if int(flock.tm_sec) < 10:
-        secs = "0%s" % (str(flock.tm_sec))
-    else:
-        secs = str(flock.tm_sec)
 
-    then += "]%s.%s.%s" % (hrs, mins, secs)
-    return then
+def _send_stats_request(dpid):
+    connection = core.openflow.getConnection(dpid)
+    if connection is None:
+        # the switch is disconnecting (e.g. on stopping the network)
+        return None
+    request = of.ofp_stats_request(body=of.ofp_port_stats_request())
+    data = request.pack()
+    if topology.name(dpid) in DYNAMIC_EDGES:
+        # the rates of the flows placed by the switch are measured with the same period
+        flow_request = of.ofp_stats_request(body=of.ofp_flow_stats_request())
+        flow_stats_requests[dpid] = (flow_request.xid, time.time())
+        data += flow_request.pack()
+        metrics.sent(dpid, "flow_stats_request")
+    if QUEUES and any(topology.is_link_port(dpid, port) for port in topology.ports.get(dpid, ())):
+        data += of.ofp_stats_request(body=of.ofp_queue_stats_request(port_no=of.OFPP_ALL,
+                                                                     queue_id=of.OFPQ_ALL)).pack()
+        metrics.sent(dpid, "queue_stats_request")
+    _send(dpid, data, "port_stats_request")
+    return request.xid
+
+
+collector = StatsCollector(_send_stats_request, base_interval=routing_timer, tick=STATS_TICK)
+
+
+def _send_probes(now):
+    # the probes that are due leave their source switch on the first link of their path, one send per switch
+    batches = {}
+    for estimate, probe_id, seq in probes.tick(now):
+        msg = of.ofp_packet_out(data=probe_frame(probe_id, seq, now))
+        queue = _queue(estimate.src, estimate.first_port, True)
+        _output(msg.actions, estimate.first_port, queue, INTENT_TOS if queue is not None else None)
+        batches.setdefault(estimate.src, []).append((estimate, seq, msg.pack()))
+    for dpid, batch in batches.items():
+        connection = core.openflow.getConnection(dpid)
+        if connection is None:
+            for estimate, seq, data in batch:
+                probes.cancel(estimate, seq)
+            continue
+        _send(dpid, b"".join(data for estimate, seq, data in batch), "probe", len(batch))
+
+
+def _channel_latency(dpid):
+    # one-way latency of the control channel of the switch: half the round trip of its stats requests
+    poll = collector.switches.get(dpid)
+    if poll is None or poll.latency is None:
+        return 0.0
+    return poll.latency / 2.0
 
 
 def _timer_func():
-    # this function is called on 1-sec timer expiration and changes the routing
-    global s1_dpid, s2_dpid, s3_dpid, s4_dpid, s5_dpid, turn
-
-    if (core.openflow.getConnection(s1_dpid) is None):
-        # this return avoids error notifications on stopping the network
-        # (when connections disappear and getConnection() objects become Null)
-        return
-
-    core.openflow.getConnection(s1_dpid).send(of.ofp_stats_request(body=of.ofp_port_stats_request()))
-    core.openflow.getConnection(s2_dpid).send(of.ofp_stats_request(body=of.ofp_port_stats_request()))
-    core.openflow.getConnection(s3_dpid).send(of.ofp_stats_request(body=of.ofp_port_stats_request()))
-    core.openflow.getConnection(s4_dpid).send(of.ofp_stats_request(body=of.ofp_port_stats_request()))
+    # this function is called every STATS_TICK seconds and sends the port stats requests and probes that are due
+    now = time.time()
+    collector.tick(now)
+    _send_probes(now)
+    if failover.primaries:
+        _restore(now)
+    if journal is not None or reconciling or foreign_since or unconfirmed_links or restored_since is not None:
+        _state_tick(now)
     return
 
 
@@ -164,439 +464,1270 @@ def _handle_portstats_received(event):
     # Handling of port statistics retrieved from switches.
     # Observe the use of port statistics here
     # Note: based on https://github.com/tsartsaris/pythess-SDN/blob/master/pythess.py
+    dpid = event.connection.dpid
+    metrics.received(dpid, "port_stats_reply")
+
+    # The counters were read by the switch somewhere between sending the request and receiving the reply,
+    # so the sample is timestamped with the middle of that interval; replies that arrive out of order then
+    # carry older timestamps and are ignored by the store.
+    received = time.time()
+    sent = collector.reply(dpid, event.ofp[0].xid, received)
+    if sent is None:
+        sent = received
+    sampled = (sent + received) / 2
+    entries = [(f.port_no, port_counters(f)) for f in event.stats if int(f.port_no) < 65534]
+    stats.update(dpid, sampled, entries)
+    if telemetry.debug:
+        telemetry.emit("ports", sampled, dpid, entries)
+
+    # the polling rate of the switch follows the utilization of its busiest link
+    links = [(dpid, f.port_no) for f in event.stats if topology.is_link_port(dpid, f.port_no)]
+    if not links:
+        return
+    bitrates = stats.bitrates(links)
+    capacities = [_link_bw(*link) for link in links]
+    collector.set_load(dpid, float((bitrates / capacities).max()))
+    if forecaster is not None:
+        # the forecast follows the utilization over the last polling interval, not its EWMA, which lags behind
+        for link, load in zip(links, (stats.bitrates(links, "last") / capacities).tolist()):
+            for predicted, actual in forecaster.update(link, sampled, load):
+                if telemetry.info:
+                    telemetry.emit("forecast", sampled, dpid, link[1], predicted, actual, actual - predicted)
+    # loads of the links for the placement: the measured one, or the forecast if it is higher
+    for link, bitrate, capacity in zip(links, bitrates.tolist(), capacities):
+        congested = False
+        if forecaster is not None:
+            bitrate = max(bitrate, forecaster.forecast(link) * capacity)
+            congested = forecaster.congested(link)
+        placer.measure(link, bitrate, flows.reserved_rate(link) if link in flows.reserved else 0.0, congested)
+    _rebalance(dpid, received)
+
+    if telemetry.info:
+        # rate of every link of the switch, and the packets it sent into it compared with the packets received
+        # at the other end
+        for key, bitrate in zip(links, bitrates.tolist()):
+            peer = topology.links[key]
+            telemetry.emit("link", sampled, topology.name(dpid), key[1], topology.name(peer[0]), peer[1], bitrate,
+                           stats.last_delta(dpid, key[1], TX_PACKETS), stats.last_delta(peer[0], peer[1], RX_PACKETS))
+
+
+def _match_key(match):
+    # identity of an exact-match rule, the same for the match built from a packet and the one in a flow stats reply
+    return (match.in_port, str(match.dl_src), str(match.dl_dst), match.nw_tos, match.nw_proto, str(match.nw_src),
+            str(match.nw_dst), match.tp_src, match.tp_dst)
+
+
+def _handle_FlowRemoved(event):
+    # a rule of a placed flow expired or was deleted at its edge: its lifetime is recorded and the flow leaves the
+    # registry without waiting for the next flow stats reply
+    metrics.received(event.dpid, "flow_removed")
+    ofp = event.ofp
+    if not FLOW_PRIORITY <= ofp.priority < PROBE_PRIORITY:
+        return
+    key = _match_key(ofp.match)
+    reason = "idle" if event.idleTimeout else "hard" if event.hardTimeout else "delete"
+    now = time.time()
+    lifecycle.removed_rule((event.dpid, key), reason, ofp.duration_sec + ofp.duration_nsec / 1e9,
+                           ofp.packet_count, ofp.byte_count, now)
+    record = flows.flows.get(key)
+    if record is not None and record.dpid == event.dpid and record.priority == ofp.priority:
+        flows.remove(key)
+        flows.expired += 1
+    if telemetry.debug:
+        telemetry.emit("flow_removed", now, event.dpid, reason, ofp.priority, ofp.duration_sec, ofp.packet_count,
+                       ofp.byte_count)
+
+
+def _handle_queuestats_received(event):
+    # rates and drops of the queues of the switch (requested with its port stats); the drops of the best-effort
+    # queues under a flood next to none in the intent queues show the classes at work
+    dpid = event.connection.dpid
+    metrics.received(dpid, "queue_stats_reply")
+    now = time.time()
+    samples = queue_stats.update(dpid, now, [(q.port_no, q.queue_id, q.tx_bytes, q.tx_packets, q.tx_errors)
+                                             for q in event.stats])
+    if telemetry.info:
+        for port, queue_id, bitrate, dropped in samples:
+            telemetry.emit("queue", now, dpid, port, queue_id, bitrate, dropped)
+
+
+def _handle_flowstats_received(event):
+    # rates of the flows placed by the switch; flows installed before the request and missing from the reply
+    # have expired
+    metrics.received(event.dpid, "flow_stats_reply")
+    reading = reconciling.get(event.dpid)
+    if reading is not None and event.ofp[0].xid == reading[0]:
+        del reconciling[event.dpid]
+        _reconcile(event.connection, event.stats, time.time())
+        return
+    xid, sent = flow_stats_requests.get(event.dpid, (None, None))
+    if event.ofp[0].xid != xid:
+        sent = float("-inf")  # a late reply: only the rates are updated
+    flows.update(event.dpid, sent, time.time(),
+                 [(_match_key(f.match), f.byte_count) for f in event.stats
+                  if FLOW_PRIORITY <= f.priority < PROBE_PRIORITY])
+    # the measured rates teach the placement the demands of the classes of flows
+    for record in list(flows.flows.values()):
+        if record.dpid == event.dpid and record.rate > 0:
+            placer.learn(_demand_class(record.match, record.intent), record.rate, record.flow)
+
+
+def _flow_budget(record):
+    # latency budget (ms) of a placed flow: none for best effort, the budget of its direction for an intent flow
+    if record.intent is None:
+        return None
+    opposite = flows.opposite(record.intent, *record.ends) if record.ends is not None else None
+    return _pair_budget(record.intent, opposite)
+
+
+def _migration_path(record, extra):
+    # the other candidate path with the most headroom left (after the moves already planned, extra) that can
+    # take the flow and meets the latency budget of its intent
+    budget = _flow_budget(record)
+    paths = [path for path in topology.paths.get(record.path.src, record.path.dst)
+             if path.links != record.path.links and (budget is None or path_delay(path) <= budget)]
+    if not paths:
+        return None
+    best = None
+    for path, room in zip(paths, _path_state(paths)[1]):
+        room -= max(extra.get(link, 0.0) for link in path.links)
+        if room >= record.rate and (best is None or room > best[0]):
+            best = (room, path)
+    return best[1] if best is not None else None
+
+
+def _rebalance(dpid, now):
+    # flows crossing the links of the switch loaded above MIGRATE_ABOVE are moved to other paths
+    links = [link for link in flows.by_link if link[0] == dpid]
+    if not links:
+        return
+    capacities = [_link_bw(*link) for link in links]
+    for link, load, capacity in zip(links, stats.utilization(links, capacities), capacities):
+        if load > MIGRATE_ABOVE:
+            moves = flows.plan(link, (load - MIGRATE_TARGET) * capacity, _migration_path, now)
+            if moves:
+                _migrate(moves, now)
+                if telemetry.info:
+                    telemetry.emit("migration", now, link[0], link[1], float(load), len(moves),
+                                   sum(record.rate for record, path in moves))
+
+
+def _migrate(moves, now, kind="migration"):
+    # Rules of the moved flows are added along their new paths, then their rules at the edge are modified to
+    # point to the new paths; all the messages for a switch are sent as one batch, the edges last. The moved
+    # flows get the backups of their new paths.
+    batches = {}
+    edges = {}
+    for record, path in moves:
+        switches = [record.dpid]
+        for dpid, in_port, out_port in reversed(path.hops[1:]):
+            if not topology.is_transit_pair(dpid):
+                batches.setdefault(dpid, []).append(
+                    _flow_mod(record.match, in_port, out_port, priority=record.priority,
+                              queue=_queue(dpid, out_port, record.intent is not None)).pack())
+                switches.append(dpid)
+        # strict: a non-strict modify of an aggregate would also move the finer rules it covers
+        queue = _queue(record.dpid, path.first_port, record.intent is not None)
+        edges.setdefault(record.dpid, []).append(
+            _flow_mod(record.match, record.match.in_port, path.first_port, of.OFPFC_MODIFY_STRICT,
+                      record.priority, of.OFPFF_SEND_FLOW_REM, queue, _mark(record.intent, queue)).pack())
+        flows.move(record, path, now, tuple(switches))
+        record.backup = failover.backup(path, topology.paths.get(path.src, path.dst), _flow_budget(record),
+                                        path_delay)
+        metrics.decision(record.dpid, path.first_port, kind)
+        decisions.discard(record.decision_key)
+        if record.intent is None:
+            balancer.assign(record.flow, path.links, now)
+    for batch, last in ((batches, False), (edges, True)):
+        for dpid, messages in batch.items():
+            _send(dpid, b"".join(messages), "flow_mod", len(messages), last)
+
+
+def _fail_over(links, now):
+    # The links went down: the flows crossing them are moved to their backup paths, or to the best backup among
+    # the candidate paths left if theirs crosses a failed link too, in one batch of flow_mods per switch.
+    start = time.perf_counter()
+    failed = set(links)
+    failover.events += 1
+    failover.clear()  # the cached backups may cross the failed links
+    records = {}
+    for link in links:
+        failover.link_down(link)
+        for record in flows.on_link(link):
+            records[record.key] = record
+    moves = []
+    for record in records.values():
+        backup = record.backup
+        if backup is None or any(link not in topology.links for link in backup.links):
+            paths = topology.paths.get(record.path.src, record.path.dst)
+            backup = failover.backup(record.path, paths, _flow_budget(record), path_delay) if paths else None
+        if backup is None:
+            failover.unprotected += 1
+            continue
+        failover.failed(record.key, record.path.links, failed.intersection(record.path.links))
+        moves.append((record, backup))
+    if moves:
+        _migrate(moves, now, "failover")
+    failover.last_ms = (time.perf_counter() - start) * 1000.0
+    if records:
+        log.info("Failover: %d flows moved in %.2f ms (%d without a backup)", len(moves), failover.last_ms,
+                 len(records) - len(moves))
+    if telemetry.info:
+        for dpid, port in sorted(failed):
+            telemetry.emit("failover", now, dpid, port, "down", len(moves), failover.last_ms)
+
+
+def _restore(now):
+    # flows moved away by a failure go back to their primary paths once the failed links have been up for
+    # RESTORE_HOLD seconds, unless the primary path is gone or congested
+    failover.prune(flows.flows)
+    moves = []
+    for key, primary in failover.due(now):
+        record = flows.flows[key]
+        path = None
+        if record.path.links != primary:
+            for candidate in topology.paths.get(record.path.src, record.path.dst):
+                if candidate.links == primary:
+                    path = candidate
+                    break
+            if path is not None and forecaster is not None and any(forecaster.congested(link) for link in primary):
+                continue
+        failover.forget(key)
+        if path is not None:
+            moves.append((record, path))
+    if moves:
+        failover.restores += len(moves)
+        _migrate(moves, now, "restore")
+        log.info("Restored %d flows to their primary paths", len(moves))
+        if telemetry.info:
+            telemetry.emit("failover", now, None, None, "restore", len(moves), None)
+
+
+def _table_occupancy(dpid):
+    # static rules and rules of the registered flows in the switch
+    return len(installed_rules.get(dpid, ())) + flows.rules.get(dpid, 0)
+
+
+def _evict(dpid, now):
+    # the table of the switch is at the budget: the coldest flows entering there are deleted along their paths
+    batches = {}
+    for record in flows.coldest(dpid, EVICT_BATCH):
+        for switch, data in _path_flow_mods(dpid, record.match, record.path, record.priority, record.intent,
+                                            of.OFPFC_DELETE_STRICT):
+            batches.setdefault(switch, []).append(data)
+        flows.remove(record.key)
+        decisions.discard(record.decision_key)
+        aggregator.evicted += 1
+    for switch, messages in batches.items():
+        _send(switch, b"".join(messages), "flow_mod", len(messages))
+
+
+def _default_path(dpid, host):
+    # static route from switch dpid towards a remote host: the hosts of an edge switch are spread
+    # over the candidate paths by their port numbers
+    paths = topology.paths.get(dpid, host.dpid)
+    if not paths:
+        return None
+    return paths[host.port % len(paths)]
+
+
+def _static_rules(dpid):
+    # Static (proactive) rule set of a switch as a list of tuples
+    # (priority, in_port, dl_type, nw_dst, out_port), with (nw_tos, queue) appended for the IP rules enqueuing
+    # on the ports between switches (_class_rules); None means "wildcard".
+    # The rules depend only on the topology and the known hosts, so they are pushed on ConnectionUp
+    # and resynchronised on topology changes instead of on every packet_in.
+    if topology.is_transit_pair(dpid):
+        # transit switches with just two links (s2, s3, s4 of the diamond) simply cross-connect them
+        a, b = sorted(topology.ports[dpid])
+        rules = _class_rules(dpid, 10, a, None, b) + _class_rules(dpid, 10, b, None, a)
+        if ARP_RULES:
+            rules += [(10, a, ETH_ARP, None, b), (10, b, ETH_ARP, None, a)]
+        return rules
+    dynamic = topology.name(dpid) in DYNAMIC_EDGES
+    rules = []
+    for ip, host in sorted(topology.hosts.items()):
+        if host.dpid == dpid:
+            rules.append((100, None, ETH_IP, ip, host.port))
+        elif not dynamic:
+            path = _default_path(dpid, host)
+            if path is not None:
+                rules += _class_rules(dpid, 100, None, ip, path.first_port)
+    if any(host.dpid == dpid for host in topology.hosts.values()):
+        # delay probes end at the edge switches and go back to the controller
+        rules.append((PROBE_PRIORITY, None, ETH_IP, PROBE_IP, of.OFPP_CONTROLLER))
+    if ARP_RULES:
+        rules += _arp_rules(dpid)
+    return rules
+
+
+def _class_rules(dpid, priority, in_port, nw_dst, out_port):
+    # IP rule towards out_port; on a port between switches (with QUEUES) one rule per class: the packets marked EF
+    # by their edge go to the intent queue (one priority higher), the rest to the best-effort queue
+    if not QUEUES or not topology.is_link_port(dpid, out_port):
+        return [(priority, in_port, ETH_IP, nw_dst, out_port)]
+    return [(priority + 1, in_port, ETH_IP, nw_dst, out_port, INTENT_TOS, INTENT_QUEUE),
+            (priority, in_port, ETH_IP, nw_dst, out_port, None, BEST_EFFORT_QUEUE)]
+
+
+def _arp_rules(dpid):
+    # ARP towards every known host along a cheapest path (hop by hop, so the switches forward it without loops).
+    # At a switch with edge ports the rules match the input port too (the port of a learned host or a link), so
+    # ARP from a host that is not known yet still reaches the controller, which learns the host from it.
+    if topology.edge_ports(dpid):
+        in_ports = sorted(set(host.port for host in topology.hosts.values() if host.dpid == dpid) |
+                          set(port for port in topology.ports.get(dpid, ()) if topology.is_link_port(dpid, port)))
+    else:
+        in_ports = [None]
+    next_hops = {}
+    rules = []
+    for ip, host in sorted(topology.hosts.items()):
+        if host.dpid == dpid:
+            out_port = host.port
+        else:
+            if host.dpid not in next_hops:
+                next_hops[host.dpid] = topology.next_hops(host.dpid)
+            out_port = next_hops[host.dpid].get(dpid)
+            if out_port is None:
+                continue
+        rules += [(ARP_PRIORITY, in_port, ETH_ARP, ip, out_port) for in_port in in_ports if in_port != out_port]
+    return rules
+
+
+def _rule_match(rule):
+    # priority and match of a rule tuple: a rule added with the same ones replaces it in the switch
+    return rule[:4] + rule[5:6]
+
+
+def _rule_flow_mod(rule, command=of.OFPFC_ADD):
+    priority, in_port, dl_type, nw_dst, out_port = rule[:5]
+    nw_tos, queue = rule[5:] or (None, None)
+    msg = of.ofp_flow_mod(command=command)
+    msg.priority = priority
+    msg.idle_timeout = 0
+    msg.hard_timeout = 0
+    if in_port is not None:
+        msg.match.in_port = in_port
+    if dl_type is not None:
+        msg.match.dl_type = dl_type
+    if nw_dst is not None:
+        msg.match.nw_dst = nw_dst
+    if nw_tos is not None:
+        msg.match.nw_tos = nw_tos
+    if command != of.OFPFC_DELETE_STRICT:
+        _output(msg.actions, out_port, queue)
+    return msg
+
+
+def _provision_switch(connection):
+    # Bring the static rules of the switch in line with _static_rules(): rules that are not installed (or in
+    # flight) yet and the deletions of stale ones are sent as a single batch of flow_mods terminated by a barrier;
+    # the rules count as installed once the barrier is answered.
+    dpid = connection.dpid
+    if dpid in reconciling:
+        return 0  # provisioned once its flow table has been read
+    in_flight = set()
+    for (pdpid, xid), rules in pending_rules.items():
+        if pdpid == dpid:
+            in_flight |= rules
+    wanted = _static_rules(dpid)
+    installed = installed_rules.setdefault(dpid, set())
+    foreign = foreign_rules.get(dpid)
+    if foreign:
+        # rules found in the switch that are wanted now (e.g. towards a host known again) stay as they are
+        kept = foreign.intersection(wanted)
+        installed |= kept
+        foreign -= kept
+        reconciled["kept"] += len(kept)
+    missing = []
+    for rule in wanted:
+        if rule not in missing and rule not in in_flight and rule not in installed:
+            missing.append(rule)
+    if foreign and missing:
+        # the rules sent replace the ones with the same match
+        replaced = set(_rule_match(rule) for rule in missing)
+        foreign.difference_update([rule for rule in foreign if _rule_match(rule) in replaced])
+    stale = installed - set(wanted)
+    if foreign:
+        # rules towards a known host lead where the controller does not send it if the switch has other rules for
+        # the host, or if the switch is a dynamic edge (the controller places the flows towards the host); after
+        # STATE_HOLD all of them go
+        if time.time() - foreign_since.get(dpid, 0.0) >= STATE_HOLD:
+            deleted = set(foreign)
+        else:
+            dynamic = topology.name(dpid) in DYNAMIC_EDGES
+            routed = set(rule[2:4] for rule in wanted if rule[3] in topology.hosts)
+            deleted = set(rule for rule in foreign if rule[3] in topology.hosts and (dynamic or rule[2:4] in routed))
+        foreign -= deleted
+        stale |= deleted
+        reconciled["deleted"] += len(deleted)
+    if not foreign:
+        foreign_rules.pop(dpid, None)
+        foreign_since.pop(dpid, None)
+        foreign_resolved.discard(dpid)
+    if not missing and not stale:
+        return 0
+
+    barrier = of.ofp_barrier_request()
+    batch = [_rule_flow_mod(rule, of.OFPFC_DELETE_STRICT) for rule in sorted(stale, key=str)]
+    batch += [_rule_flow_mod(rule) for rule in missing] + [barrier]
+    _send(dpid, b"".join(msg.pack() for msg in batch), "flow_mod", len(batch) - 1)
+    metrics.sent(dpid, "barrier_request")
+    installed -= stale
+    pending_rules[(dpid, barrier.xid)] = set(missing)
+    return len(batch) - 1
+
+
+def _is_provisioned(dpid):
+    # later changes of the static rules are pushed by _topology_changed(), so it is enough to know that
+    # the switch has been provisioned (or its table is being read) since it connected
+    return dpid in installed_rules or dpid in reconciling
+
+
+def _topology_changed(affected_only=False):
+    # precompute the path table for the edge switches (with affected_only, only the entries dropped by the change
+    # are recomputed) and resynchronise the static rules of all switches
+    if affected_only:
+        topology.paths.refresh(topology.edge_switches())
+    else:
+        topology.paths.precompute(topology.edge_switches())
+    failover.clear()
+    placer.clear_capacities()
+    _compile_routes()
+    for dpid in list(topology.switches):
+        connection = core.openflow.getConnection(dpid)
+        if connection is not None:
+            _provision_switch(connection)
+    if adopting:
+        _adopt_flows(time.time())
+
+
+def _handle_BarrierIn(event):
+    metrics.received(event.dpid, "barrier_reply")
+    rules = pending_rules.pop((event.dpid, event.xid), None)
+    if rules is not None:
+        installed_rules.setdefault(event.dpid, set()).update(rules)
+        log.debug("Static rules installed in %s (%d rules)", topology.name(event.dpid), len(rules))
+
+
+def _forget_switch_rules(dpid):
+    # the flow table of a reconnecting switch cannot be trusted, so forget what was installed there (it is read
+    # again when the switch connects)
+    installed_rules.pop(dpid, None)
+    reconciling.pop(dpid, None)
+    foreign_rules.pop(dpid, None)
+    foreign_since.pop(dpid, None)
+    foreign_resolved.discard(dpid)
+    for key in [key for key in pending_rules if key[0] == dpid]:
+        del pending_rules[key]
+
+
+def _read_table(connection):
+    # the flow table of a switch that connects is read before it is provisioned (see _reconcile())
+    request = of.ofp_stats_request(body=of.ofp_flow_stats_request())
+    reconciling[connection.dpid] = (request.xid, time.time())
+    _send(connection.dpid, request.pack(), "flow_stats_request")
+
+
+def _stats_rule(entry):
+    # rule tuple of a static rule read from a switch (as built by _static_rules()), None if it has other actions
+    if len(entry.actions) != 1 or not isinstance(entry.actions[0], (of.ofp_action_output, of.ofp_action_enqueue)):
+        return None
+    match = entry.match
+    action = entry.actions[0]
+    rule = (entry.priority, match.in_port, match.dl_type, str(match.nw_dst) if match.nw_dst is not None else None,
+            action.port)
+    queue = action.queue_id if isinstance(action, of.ofp_action_enqueue) else None
+    if queue is not None or match.nw_tos is not None:
+        rule += (match.nw_tos, queue)
+    return rule
+
+
+def _out_port(actions):
+    for action in reversed(actions):
+        if isinstance(action, (of.ofp_action_output, of.ofp_action_enqueue)):
+            return action.port
+    return None
+
+
+def _reconcile(connection, entries, now):
+    # Diff of the flow table of a switch that connected against what the controller wants: the static rules it
+    # wants are counted as installed and the others left in place until the hosts and links are known again (for
+    # STATE_HOLD seconds at most, see _provision_switch()); the rules
+    # of the placed flows of the snapshot are taken over with their counters (other flow rules are left to
+    # expire). Then only the missing static rules are sent.
+    dpid = connection.dpid
+    wanted = set(_static_rules(dpid))
+    found = set()
+    snapshot = restored.get("flows", {})
+    for entry in entries:
+        if entry.idle_timeout or entry.hard_timeout:
+            # rules of the placed flows expire, static rules do not
+            if FLOW_PRIORITY <= entry.priority < PROBE_PRIORITY:
+                key = _state_key(_match_key(entry.match))
+                value = snapshot.get(key)
+                if value is not None and value["dpid"] == dpid:
+                    del snapshot[key]
+                    adopting[key] = (entry.match, entry.priority, entry.byte_count, now - entry.duration_sec,
+                                     _out_port(entry.actions), value)
+                elif topology.name(dpid) in DYNAMIC_EDGES:
+                    reconciled["unknown"] += 1  # not in the snapshot: left to expire
+            continue
+        rule = _stats_rule(entry)
+        if rule is not None:
+            found.add(rule)
+    # flows of the snapshot whose rules expired in the meantime
+    for key in [key for key, value in snapshot.items() if value["dpid"] == dpid]:
+        del snapshot[key]
+        reconciled["gone"] += 1
+    installed = installed_rules.setdefault(dpid, set())
+    installed |= found & wanted
+    if found - wanted:
+        foreign_rules[dpid] = found - wanted
+        foreign_since[dpid] = now
+    reconciled["tables"] += 1
+    reconciled["kept"] += len(found & wanted)
+    reconciled["sent"] += _provision_switch(connection)
+    if adopting:
+        _adopt_flows(now)
+
+
+def _adopt_flows(now):
+    # the flows of the snapshot found at their edges enter the registry once their paths exist again; the rule
+    # in the switch decides the path if it differs from the snapshot
+    for key, (match, priority, byte_count, installed, out_port, value) in list(adopting.items()):
+        links = tuple(tuple(link) for link in value["links"])
+        if any(link not in topology.links for link in links):
+            continue
+        del adopting[key]
+        dpid = value["dpid"]
+        paths = topology.paths.get(dpid, topology.links[links[-1]][0])
+        path = None
+        for candidate in paths:
+            if candidate.first_port == out_port and (path is None or candidate.links == links):
+                path = candidate
+        intent = _find_intent(value["intent"])
+        if path is None or (value["intent"] is not None and intent is None):
+            reconciled["dropped"] += 1
+            continue
+        record = flows.add(tuple(json.loads(key)), dpid, path, match, intent, bytes.fromhex(value["flow"]), None,
+                           installed, priority, tuple(value["switches"]), value["reserve"],
+                           tuple(value["ends"]) if value["ends"] else None)
+        record.rate = float(value["rate"])
+        record.bytes = byte_count  # the baseline of its next rate
+        record.last_time = now
+        record.backup = failover.backup(path, paths, _flow_budget(record), path_delay)
+        if intent is None:
+            balancer.assign(record.flow, path.links, now)
+        reconciled["adopted"] += 1
+
+
+def _restore_switch(dpid, now):
+    # The links of the snapshot between the switch and the switches already connected, then its hosts, are taken
+    # over; the links until openflow.discovery finds them again. True if anything was.
+    links = restored.get("links", {})
+    changed = False
+    for key, (peer, peer_port) in list(links.items()):
+        src, port = parse_link_key(key)
+        if dpid not in (src, peer) or src not in topology.switches or peer not in topology.switches:
+            continue
+        del links[key]
+        if port in topology.ports.get(src, ()) and peer_port in topology.ports.get(peer, ()) and \
+                topology.add_link(src, port, peer, peer_port):
+            unconfirmed_links[(src, port)] = now
+            changed = True
+    hosts = restored.get("hosts", {})
+    for ip, (mac, host_dpid, port) in list(hosts.items()):
+        if host_dpid == dpid:
+            del hosts[ip]
+            if port in topology.ports.get(dpid, ()) and topology.learn_host(ip, bytes.fromhex(mac), dpid, port):
+                changed = True
+    return changed
+
+
+def _restore_baselines():
+    # demands of the classes of flows, rates of the flows and loads of the links: the placement starts from them
+    for key, rate in restored.pop("demands", {}).items():
+        intent_id, proto, dport = json.loads(key)
+        intent = _find_intent(intent_id)
+        if intent_id is None or intent is not None:
+            placer.demands[(intent, proto, dport)] = float(rate)
+    for flow, rate in restored.pop("rates", {}).items():
+        placer.rates[bytes.fromhex(flow)] = float(rate)
+    for key, bitrate in restored.pop("loads", {}).items():
+        placer.measure(parse_link_key(key), float(bitrate))
+
+
+def _intent_id(intent):
+    return [intent.name, intent.reverse] if intent is not None else None
+
+
+def _find_intent(intent_id):
+    # the intent (or mirror) of the snapshot among the intents loaded now
+    if intent_id is None:
+        return None
+    for intent in intent_table.directions():
+        if _intent_id(intent) == intent_id:
+            return intent
+    return None
 
-    global s1_dpid, s2_dpid, s3_dpid, s4_dpid, s5_dpid
-    global s1_p1, s1_p4, s1_p5, s1_p6, s2_p1, s3_p1, s4_p1
-    global pre_s1_p1, pre_s1_p4, pre_s1_p5, pre_s1_p6, pre_s2_p1, pre_s3_p1, pre_s4_p1
-
-    global pre_s1_s3_bytes, s1_s3_bytes, pre_s1_s4_bytes, s1_s4_bytes, bitrate_s1_s3, bitrate_s1_s4, s1_s2_bytes, bitrate_s1_s2, pre_s1_s2_bytes
-
-    print("===>Event.stats:")
-    print(event.stats)
-    print("<===")
-
-    if event.connection.dpid == s1_dpid:  # The DPID of one of the switches involved in the link
-        for f in event.stats:
-            if int(f.port_no) < 65534:
-                if f.port_no == 1:
-                    pre_s1_p1 = s1_p1
-                    s1_p1 = f.rx_packets
-                    # print( "s1_p1->", s1_p1, "TxDrop:", f.tx_dropped,"RxDrop:",f.rx_dropped,"TxErr:",f.tx_errors,"CRC:",f.rx_crc_err,"Coll:",f.collisions,"Tx:",f.tx_packets,"Rx:",f.rx_packets)
-                if f.port_no == 4:
-                    pre_s1_p4 = s1_p4
-                    s1_p4 = f.tx_packets
-                    pre_s1_s2_bytes = s1_s2_bytes  # ==============================  obliczanie bitrate
-                    s1_s2_bytes = f.tx_bytes       # ==============================  na łączu
-                    bitrate_s1_s2 = abs(pre_s1_s2_bytes - s1_s2_bytes) * 8  # ==============================  s1 - s3
-                    print(f"===================przepustowosc s1-s2: {bitrate_s1_s2}===================")
-                if f.port_no == 5:
-                    pre_s1_p5 = s1_p5
-                    s1_p5 = f.tx_packets
-                    pre_s1_s3_bytes = s1_s3_bytes  # ==============================  obliczanie bitrate
-                    s1_s3_bytes = f.tx_bytes       # ==============================  na łączu
-                    bitrate_s1_s3 = abs(pre_s1_s3_bytes - s1_s3_bytes) * 8  # ==============================  s1 - s3
-                    print(f"===================przepustowosc s1-s3: {bitrate_s1_s3}===================")
-                if f.port_no == 6:
-                    pre_s1_p6 = s1_p6
-                    s1_p6 = f.tx_packets
-                    pre_s1_s4_bytes = s1_s4_bytes  # ==============================  obliczanie bitrate
-                    s1_s4_bytes = f.tx_bytes       # ==============================  na łączu
-                    bitrate_s1_s4 = abs(pre_s1_s4_bytes - s1_s4_bytes) * 8  # ==============================  s1 - s4
-                    print(f"===================przepustowosc s1-s4: {bitrate_s1_s4}===================")
-
-    if event.connection.dpid == s2_dpid:
-        for f in event.stats:
-            if int(f.port_no) < 65534:
-                if f.port_no == 1:
-                    pre_s2_p1 = s2_p1
-                    s2_p1 = f.rx_packets
-                    # s2_p1=f.rx_bytes
-        print(getTheTime(), "s1_p4(Sent):", (s1_p4 - pre_s1_p4), "s2_p1(Received):", (s2_p1 - pre_s2_p1))
-
-    if event.connection.dpid == s3_dpid:
-        for f in event.stats:
-            if int(f.port_no) < 65534:
-                if f.port_no == 1:
-                    pre_s3_p1 = s3_p1
-                    s3_p1 = f.rx_packets
-        print(getTheTime(), "s1_p5(Sent):", (s1_p5 - pre_s1_p5), "s3_p1(Received):", (s3_p1 - pre_s3_p1))
-
-    if event.connection.dpid == s4_dpid:
-        for f in event.stats:
-            if int(f.port_no) < 65534:
-                if f.port_no == 1:
-                    pre_s4_p1 = s4_p1
-                    s4_p1 = f.rx_packets
-        print(getTheTime(), "s1_p6(Sent):", (s1_p6 - pre_s1_p6), "s4_p1(Received):", (s4_p1 - pre_s4_p1))
+
+def _state_key(key):
+    # flow key (_match_key) as a key of the snapshot
+    return json.dumps(key)
+
+
+def _snapshot():
+    # state kept by the journal: what the controller knows now, and what it restored and has not confirmed yet
+    state = dict((section, dict(restored.get(section, ()))) for section in STATE_SECTIONS)
+    for key, entry in adopting.items():
+        state["flows"][key] = entry[-1]
+    for ip, host in topology.hosts.items():
+        state["hosts"][ip] = [host.mac.hex(), host.dpid, host.port]
+    for (dpid, port), (peer, peer_port) in topology.links.items():
+        state["links"][link_key(dpid, port)] = [peer, peer_port]
+    for record in flows.flows.values():
+        state["flows"][_state_key(record.key)] = {
+            "dpid": record.dpid, "links": [list(link) for link in record.path.links],
+            "intent": _intent_id(record.intent), "flow": record.flow.hex(), "priority": record.priority,
+            "switches": list(record.switches), "reserve": record.reserve,
+            "ends": list(record.ends) if record.ends is not None else None, "rate": round(record.rate)}
+    for (intent, proto, dport), rate in placer.demands.items():
+        state["demands"][json.dumps([_intent_id(intent), proto, dport])] = round(rate)
+    for flow, rate in placer.rates.items():
+        state["rates"][flow.hex()] = round(rate)
+    for link, bitrate in placer.measured.items():
+        state["loads"][link_key(*link)] = round(bitrate)
+    return state
+
+
+def _state_tick(now):
+    # deadlines of the reconciliation, then the periodic snapshot
+    global restored_since
+    for dpid, (xid, sent) in list(reconciling.items()):
+        if now - sent >= RECONCILE_TIMEOUT:
+            # no answer: the switch gets its whole static rule set
+            del reconciling[dpid]
+            reconciled["timeouts"] += 1
+            connection = core.openflow.getConnection(dpid)
+            if connection is not None:
+                _provision_switch(connection)
+    for dpid in list(foreign_since):
+        if dpid not in foreign_resolved and now >= host_learn_from:
+            # the hosts the foreign rules lead to are asked for: the ones that answer are learned and routed
+            foreign_resolved.add(dpid)
+            _resolve_hosts(set(rule[3] for rule in foreign_rules[dpid]) - {None, PROBE_IP}, now)
+    for dpid in [dpid for dpid, since in foreign_since.items() if now - since >= STATE_HOLD]:
+        # the foreign rules left in the switch are deleted
+        connection = core.openflow.getConnection(dpid)
+        if connection is not None:
+            _provision_switch(connection)
+        else:
+            foreign_since.pop(dpid)
+    stale = [link for link, since in unconfirmed_links.items() if now - since >= STATE_HOLD]
+    if stale:
+        changed = []
+        for link in stale:
+            del unconfirmed_links[link]
+            changed += topology.remove_link(*link)
+        if changed:
+            _fail_over(changed, now)
+            _topology_changed()
+    if restored_since is not None and now - restored_since >= STATE_HOLD:
+        reconciled["gone"] += len(restored.get("flows", {})) + len(adopting)
+        restored.clear()
+        adopting.clear()
+        restored_since = None
+    if journal is not None and journal.due(now):
+        journal.save(_snapshot(), now)
+
+
+def _handle_ConnectionDown(event):
+    log.info("ConnectionDown: %s", topology.name(event.dpid))
+    _forget_switch_rules(event.dpid)
+    outbox.discard(event.dpid)
+    failed = topology.remove_switch(event.dpid)
+    if failed:
+        # flows crossing the switch fail over; flows entering or leaving there are forgotten below
+        _fail_over([link for link in failed if link[0] != event.dpid], time.time())
+    stats.forget_switch(event.dpid)
+    if forecaster is not None:
+        forecaster.forget(lambda link: link[0] == event.dpid)
+    placer.forget(lambda link: link[0] == event.dpid)
+    queue_stats.forget_switch(event.dpid)
+    collector.remove_switch(event.dpid)
+    flows.forget_switch(event.dpid)
+    flow_stats_requests.pop(event.dpid, None)
+    _topology_changed()
+
+
+def _switch_name(connection):
+    # Mininet names the local port of a switch after the switch ("s1") and the other ports "s1-eth1", ...
+    for m in connection.features.ports:
+        if m.port_no == of.OFPP_LOCAL:
+            return m.name
+    for m in connection.features.ports:
+        if "-eth" in m.name:
+            return m.name.split("-eth")[0]
+    return dpidToStr(connection.dpid)
 
 
 def _handle_ConnectionUp(event):
-    # waits for connections from the switches, and after connecting all of them it starts a round robin timer for triggering h1-h4 routing changes
-    global s1_dpid, s2_dpid, s3_dpid, s4_dpid, s5_dpid
-    print("ConnectionUp: ", dpidToStr(event.connection.dpid))
-
-    # remember the connection dpid for the switch
-    for m in event.connection.features.ports:
-        if m.name == "s1-eth1":
-            # s1_dpid: the DPID (datapath ID) of switch s1;
-            s1_dpid = event.connection.dpid
-            print("s1_dpid=", s1_dpid)
-        elif m.name == "s2-eth1":
-            s2_dpid = event.connection.dpid
-            print("s2_dpid=", s2_dpid)
-        elif m.name == "s3-eth1":
-            s3_dpid = event.connection.dpid
-            print("s3_dpid=", s3_dpid)
-        elif m.name == "s4-eth1":
-            s4_dpid = event.connection.dpid
-            print("s4_dpid=", s4_dpid)
-        elif m.name == "s5-eth1":
-            s5_dpid = event.connection.dpid
-            print("s5_dpid=", s5_dpid)
-
-    # if all switches are connected, start 1-second recurring loop timer for round-robin routing changes;
-    # _timer_func is to be called on timer expiration to change the flow entry in s1
-    if s1_dpid != 0 and s2_dpid != 0 and s3_dpid != 0 and s4_dpid != 0 and s5_dpid != 0:
-        Timer(routing_timer, _timer_func, recurring=True)
+    # registers the switch in the topology, pushes its static rules and starts the statistics timer
+    global stats_timer, host_learn_from
+    name = _switch_name(event.connection)
+    log.info("ConnectionUp: %s %s", dpidToStr(event.connection.dpid), name)
+
+    topology.add_switch(event.connection.dpid, name, [m.port_no for m in event.connection.features.ports])
+    collector.add_switch(event.connection.dpid, time.time())
+    host_learn_from = max(host_learn_from, time.time() + HOST_LEARN_HOLD)
+    restored_any = _restore_switch(event.connection.dpid, time.time())
+
+    # proactive provisioning: the switch gets its static rule set as soon as its flow table has been read
+    _forget_switch_rules(event.connection.dpid)
+    _read_table(event.connection)
+    if restored_any:
+        _topology_changed()
+    else:
+        _compile_routes()
 
+    # start the recurring timer polling the port statistics used by the routing decisions
+    if stats_timer is None:
+        stats_timer = Timer(STATS_TICK, metrics.timed("timer", _timer_func), recurring=True)
 
-def _handle_PacketIn(event):
-    global s1_dpid, s2_dpid, s3_dpid, s4_dpid, s5_dpid
-
-    packet = event.parsed
-    # print( "_handle_PacketIn is called, packet.type:", packet.type, " event.connection.dpid:", event.connection.dpid)
-
-    # Below, set the default/initial routing rules for all switches and ports.
-    # All rules are set up in a given switch on packet_in event received from the switch which means no flow entry has been found in the flow table.
-    # This setting up may happen either at the very first pactet being sent or after flow entry expirationn inn the switch
-
-    if event.connection.dpid == s1_dpid:
-        a = packet.find(
-            'arp')  # If packet object does not encapsulate a packet of the type indicated, find() returns None
-        if a and a.protodst == "10.0.0.4":
-            msg = of.ofp_packet_out(
-                data=event.ofp)  # Create packet_out message; use the incoming packet as the data for the packet out
-            msg.actions.append(of.ofp_action_output(port=4))  # Add an action to send to the specified port
-            event.connection.send(msg)  # Send message to switch
-
-        if a and a.protodst == "10.0.0.5":
-            msg = of.ofp_packet_out(data=event.ofp)
-            msg.actions.append(of.ofp_action_output(port=5))
-            event.connection.send(msg)
-
-        if a and a.protodst == "10.0.0.6":
-            msg = of.ofp_packet_out(data=event.ofp)
-            msg.actions.append(of.ofp_action_output(port=6))
-            event.connection.send(msg)
-
-        if a and a.protodst == "10.0.0.1":
-            msg = of.ofp_packet_out(data=event.ofp)
-            msg.actions.append(of.ofp_action_output(port=1))
-            event.connection.send(msg)
-
-        if a and a.protodst == "10.0.0.2":
-            msg = of.ofp_packet_out(data=event.ofp)
-            msg.actions.append(of.ofp_action_output(port=2))
-            event.connection.send(msg)
-
-        if a and a.protodst == "10.0.0.3":
-            msg = of.ofp_packet_out(data=event.ofp)
-            msg.actions.append(of.ofp_action_output(port=3))
-            event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 100
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.dl_type = 0x0800  # rule for IP packets (x0800)
-        msg.match.nw_dst = "10.0.0.1"
-        msg.actions.append(of.ofp_action_output(port=1))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 100
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.dl_type = 0x0800
-        msg.match.nw_dst = "10.0.0.2"
-        msg.actions.append(of.ofp_action_output(port=2))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 100
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.dl_type = 0x0800
-        msg.match.nw_dst = "10.0.0.3"
-        msg.actions.append(of.ofp_action_output(port=3))
-        event.connection.send(msg)
-        
-	#======================================================================================
-        ip = packet.find('ipv4')
-	
-        if not ip:
-             return
-	
-        ip_src = str(ip.srcip)
-        ip_dst = str(ip.dstip)
-	
-        priority_route = is_priority_flow(ip_src, ip_dst)
-
-        if priority_route == "s1s3":
-            out_port = 5  # port s1-s3
-        elif priority_route == "s1s4":
-             out_port = 6  # port s1-s4
+
+def _handle_LinkEvent(event):
+    # links found (or lost) by openflow.discovery
+    link = event.link
+    if event.added:
+        unconfirmed_links.pop((link.dpid1, link.port1), None)
+        changed = topology.add_link(link.dpid1, link.port1, link.dpid2, link.port2)
+        if changed:
+            failover.link_up((link.dpid1, link.port1), time.time())
+    else:
+        changed = topology.remove_link(link.dpid1, link.port1)
+        if changed:
+            _fail_over(changed, time.time())
+    if changed:
+        log.info("Link %s: %s", "up" if event.added else "down", topology.link_name(link.dpid1, link.port1))
+        _topology_changed()
+
+
+def _handle_PortStatus(event):
+    port = event.ofp.desc
+    down = (port.state & of.OFPPS_LINK_DOWN) or (port.config & of.OFPPC_PORT_DOWN)
+    changed = False
+    if event.added:
+        changed = topology.add_port(event.dpid, event.port)
+    if event.deleted or down:
+        had_hosts = bool(topology.host_ports.get((event.dpid, event.port)))
+        failed = topology.remove_port(event.dpid, event.port)
+        if failed:
+            # before the path table is rebuilt: the flows on the port are moved first
+            _fail_over(failed, time.time())
+        changed = had_hosts or bool(failed)
+        ports = topology.ports.get(event.dpid, set())
+        if event.deleted and event.port in ports:
+            ports.discard(event.port)
+            changed = True
+        if changed:
+            log.info("Port down: %s %s", topology.name(event.dpid), event.port)
+    if changed:
+        # the links of the port dropped only the path table entries going through them
+        _topology_changed(affected_only=True)
+
+
+def _send_to_host(host, data):
+    msg = of.ofp_packet_out(data=data)
+    msg.actions.append(of.ofp_action_output(port=host.port))
+    _send(host.dpid, msg.pack(), "packet_out")
+
+
+def _learn_host(ip, mac, event, arp=False):
+    global hosts_held
+    if not arp and time.time() < host_learn_from:
+        if ip not in topology.hosts:
+            hosts_held += 1  # the port may be a link not discovered yet
+        return
+    if topology.learn_host(ip, mac, event.dpid, event.port):
+        log.debug("Host %s at %s port %s", ip, topology.name(event.dpid), event.port)
+        arp_responder.resolved(socket.inet_aton(ip))
+        _topology_changed()
+
+
+def _handle_arp(event, a):
+    # Proxy-ARP: requests for known hosts are answered by the controller through the port they came in, replies
+    # are delivered straight to the edge port of their target and requests for unknown hosts are flooded to the
+    # edge ports (once per ARP_FLOOD_HOLDOFF per address), so ARP never crosses the inter-switch links
+    opcode, sha, spa, tha, tpa = a
+    if spa == PROBE_ADDRESS:
+        return  # a request of the controller (_resolve_hosts()) that came back
+    src = socket.inet_ntoa(spa)
+    _learn_host(src, sha, event, arp=True)
+    host = topology.hosts.get(src)
+    if host is None or (host.dpid, host.port) != (event.dpid, event.port):
+        return  # a copy of a packet the controller has already delivered
+    if tpa == spa:
+        return  # gratuitous ARP, the sender has been learned
+
+    target = topology.hosts.get(socket.inet_ntoa(tpa))
+    if target is not None:
+        if opcode == ARP_REQUEST:
+            _send_to_host(host, arp_reply(target.mac, tpa, sha, spa))
+            arp_responder.answered += 1
         else:
-             out_port = roulette_pick()
-	
-        msg = of.ofp_flow_mod()
-        msg.idle_timeout = 2 
-        msg.hard_timeout = 0
-        msg.match = of.ofp_match.from_packet(packet, event.port)
-        msg.actions.append(of.ofp_action_output(port=out_port))
-        msg.priority = 100  # możesz ustawić wyższy dla intencji, np. 200
-        core.openflow.getConnection(event.dpid).send(msg)
-
-    	# forward pakietu natychmiast
-        packet_out = of.ofp_packet_out()
-        packet_out.data = event.ofp
-        packet_out.actions.append(of.ofp_action_output(port=out_port))
-        packet_out.in_port = event.port
-        core.openflow.getConnection(event.dpid).send(packet_out)
-	#======================================================================================
-
-    elif event.connection.dpid == s2_dpid:
-        msg = of.ofp_flow_mod()
-        msg.priority = 10
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.in_port = 1
-        msg.match.dl_type = 0x0806  # rule for ARP packets (x0806)
-        msg.actions.append(of.ofp_action_output(port=2))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 10
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.in_port = 1
-        msg.match.dl_type = 0x0800
-        msg.actions.append(of.ofp_action_output(port=2))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 10
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.in_port = 2
-        msg.match.dl_type = 0x0806
-        msg.actions.append(of.ofp_action_output(port=1))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 10
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.in_port = 2
-        msg.match.dl_type = 0x0800
-        msg.actions.append(of.ofp_action_output(port=1))
-        event.connection.send(msg)
-
-    elif event.connection.dpid == s3_dpid:
-        msg = of.ofp_flow_mod()
-        msg.priority = 10
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.in_port = 1
-        msg.match.dl_type = 0x0806
-        msg.actions.append(of.ofp_action_output(port=2))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 10
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.in_port = 1
-        msg.match.dl_type = 0x0800
-        msg.actions.append(of.ofp_action_output(port=2))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 10
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.in_port = 2
-        msg.match.dl_type = 0x0806
-        msg.actions.append(of.ofp_action_output(port=1))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 10
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.in_port = 2
-        msg.match.dl_type = 0x0800
-        msg.actions.append(of.ofp_action_output(port=1))
-        event.connection.send(msg)
-
-    elif event.connection.dpid == s4_dpid:
-        msg = of.ofp_flow_mod()
-        msg.priority = 10
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.in_port = 1
-        msg.match.dl_type = 0x0806
-        msg.actions.append(of.ofp_action_output(port=2))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 10
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.in_port = 1
-        msg.match.dl_type = 0x0800
-        msg.actions.append(of.ofp_action_output(port=2))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 10
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.in_port = 2
-        msg.match.dl_type = 0x0806
-        msg.actions.append(of.ofp_action_output(port=1))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 10
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.in_port = 2
-        msg.match.dl_type = 0x0800
-        msg.actions.append(of.ofp_action_output(port=1))
-        event.connection.send(msg)
-
-    elif event.connection.dpid == s5_dpid:
-        a = packet.find('arp')
-        if a and a.protodst == "10.0.0.4":
-            msg = of.ofp_packet_out(data=event.ofp)
-            msg.actions.append(of.ofp_action_output(port=4))
-            event.connection.send(msg)
-
-        if a and a.protodst == "10.0.0.5":
-            msg = of.ofp_packet_out(data=event.ofp)
-            msg.actions.append(of.ofp_action_output(port=5))
-            event.connection.send(msg)
-
-        if a and a.protodst == "10.0.0.6":
-            msg = of.ofp_packet_out(data=event.ofp)
-            msg.actions.append(of.ofp_action_output(port=6))
-            event.connection.send(msg)
-
-        if a and a.protodst == "10.0.0.1":
-            msg = of.ofp_packet_out(data=event.ofp)
-            msg.actions.append(of.ofp_action_output(port=1))
-            event.connection.send(msg)
-
-        if a and a.protodst == "10.0.0.2":
-            msg = of.ofp_packet_out(data=event.ofp)
-            msg.actions.append(of.ofp_action_output(port=2))
-            event.connection.send(msg)
-
-        if a and a.protodst == "10.0.0.3":
-            msg = of.ofp_packet_out(data=event.ofp)
-            msg.actions.append(of.ofp_action_output(port=3))
-            event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 100
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.dl_type = 0x0800
-        msg.match.nw_dst = "10.0.0.1"
-        msg.actions.append(of.ofp_action_output(port=1))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 10
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.in_port = 6
-        msg.actions.append(of.ofp_action_output(port=3))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 100
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.dl_type = 0x0800
-        msg.match.nw_dst = "10.0.0.1"
-        msg.actions.append(of.ofp_action_output(port=1))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 100
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.dl_type = 0x0800
-        msg.match.nw_dst = "10.0.0.2"
-        msg.actions.append(of.ofp_action_output(port=2))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 100
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.dl_type = 0x0800
-        msg.match.nw_dst = "10.0.0.3"
-        msg.actions.append(of.ofp_action_output(port=3))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 100
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.dl_type = 0x0800
-        msg.match.nw_dst = "10.0.0.4"
-        msg.actions.append(of.ofp_action_output(port=4))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 100
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.dl_type = 0x0800
-        msg.match.nw_dst = "10.0.0.5"
-        msg.actions.append(of.ofp_action_output(port=5))
-        event.connection.send(msg)
-
-        msg = of.ofp_flow_mod()
-        msg.priority = 100
-        msg.idle_timeout = 0
-        msg.hard_timeout = 0
-        msg.match.dl_type = 0x0800
-        msg.match.nw_dst = "10.0.0.6"
-        msg.actions.append(of.ofp_action_output(port=6))
-        event.connection.send(msg)
-
-
-def launch():
+            _send_to_host(target, event.ofp.data)
+            arp_responder.relayed += 1
+        return
+    if tpa == PROBE_ADDRESS:
+        return  # the reply to a request of the controller (_resolve_hosts())
+    if not arp_responder.may_flood(tpa, time.time()):
+        return
+    _flood_edges(event.ofp.data, (event.dpid, event.port))
+
+
+def _flood_edges(data, in_port=None):
+    # the frame out of the edge ports of every switch but the port it came in
+    for dpid in list(topology.switches):
+        msg = of.ofp_packet_out(data=data)
+        for port in topology.edge_ports(dpid):
+            if (dpid, port) != in_port:
+                msg.actions.append(of.ofp_action_output(port=port))
+        if msg.actions:
+            _send(dpid, msg.pack(), "packet_out")
+
+
+def _resolve_hosts(ips, now):
+    # ARP requests of the controller (from the address of the delay probes) for the hosts it does not know; they are
+    # learned from their replies
+    for ip in sorted(ips):
+        target = socket.inet_aton(ip)
+        if ip not in topology.hosts and arp_responder.may_flood(target, now):
+            _flood_edges(arp_request(PROBE_SRC_MAC, PROBE_ADDRESS, target))
+
+
+def _queue(dpid, port, is_intent):
+    # queue of the class (intent or best effort) on the port, None on the ports towards the hosts or without QUEUES
+    if not QUEUES or not topology.is_link_port(dpid, port):
+        return None
+    return INTENT_QUEUE if is_intent else BEST_EFFORT_QUEUE
+
+
+def _mark(intent, queue):
+    # ToS set at the edge: intent flows entering an intent queue are marked EF for the switches further on
+    return INTENT_TOS if intent is not None and queue is not None else None
+
+
+def _output(actions, port, queue=None, nw_tos=None):
+    # output on the port, or enqueue in one of its queues; the ToS is rewritten first
+    if nw_tos is not None:
+        actions.append(of.ofp_action_nw_tos(nw_tos=nw_tos))
+    if queue is None:
+        actions.append(of.ofp_action_output(port=port))
+    else:
+        actions.append(of.ofp_action_enqueue(port=port, queue_id=queue))
+
+
+def _flow_mod(match, in_port, out_port, command=of.OFPFC_ADD, priority=FLOW_PRIORITY, flags=0, queue=None,
+              nw_tos=None):
+    msg = of.ofp_flow_mod()
+    msg.command = command
+    msg.idle_timeout = FLOWLET_GAP or FLOW_IDLE_TIMEOUT
+    msg.hard_timeout = 0
+    msg.flags = flags
+    if match.in_port != in_port:
+        match = match.clone()
+        match.in_port = in_port
+    msg.match = match
+    _output(msg.actions, out_port, queue, nw_tos)
+    msg.priority = priority  # wyższy dla intencji i dokładniejszych agregatów, patrz _rule_priority()
+    return msg
+
+
+def _rule_priority(level, intent):
+    # finer aggregates win over the coarser ones they overlap, intents over best-effort traffic
+    return (INTENT_PRIORITY if intent is not None else FLOW_PRIORITY) + len(LEVELS) - 1 - level
+
+
+def _scope_match(scope):
+    # match of an aggregate (routing_aggregate.Scope); at the edge it takes traffic from any port
+    match = of.ofp_match(dl_type=ETH_IP)
+    if scope.src_len:
+        match.nw_src = "%s/%d" % (socket.inet_ntoa(scope.src.to_bytes(4, "big")), scope.src_len)
+    if scope.dst_len:
+        match.nw_dst = "%s/%d" % (socket.inet_ntoa(scope.dst.to_bytes(4, "big")), scope.dst_len)
+    if scope.proto is not None:
+        match.nw_proto = scope.proto
+    if scope.sport is not None:
+        match.tp_src = scope.sport
+    if scope.dport is not None:
+        match.tp_dst = scope.dport
+    return match
+
+
+def _path_flow_mods(dpid, match, path, priority, intent=None, command=of.OFPFC_ADD):
+    # rules for the flow (or aggregate) along the path, packed per switch with the first hop (switch dpid) last;
+    # transit switches with only two links forward it with their static cross-connect rules and the last switch
+    # with its rule towards the host. Packed once, they are sent again as they are when the decision is reused
+    # (a replayed flow_mod keeps its xid, no reply is expected for it). The rule at the edge reports its removal
+    # and marks the packets of an intent flow, which every hop enqueues in the queue of its class.
+    flow_mods = []
+    for hop, in_port, out_port in reversed(path.hops[1:]):
+        if not topology.is_transit_pair(hop):
+            flow_mods.append((hop, _flow_mod(match, in_port, out_port, command, priority,
+                                             queue=_queue(hop, out_port, intent is not None)).pack()))
+    flags = of.OFPFF_SEND_FLOW_REM if command == of.OFPFC_ADD else 0
+    queue = _queue(dpid, path.first_port, intent is not None)
+    flow_mods.append((dpid, _flow_mod(match, match.in_port, path.first_port, command, priority, flags, queue,
+                                      _mark(intent, queue)).pack()))
+    return tuple(flow_mods)
+
+
+def _with_timeouts(data, idle, hard):
+    # packed ofp_flow_mod with other timeouts: they follow the header (8 bytes), the match (40), the cookie (8) and
+    # the command (2)
+    return data[:58] + struct.pack("!HH", idle, hard) + data[62:]
+
+
+def _with_buffer(data, buffer_id):
+    # packed ofp_flow_mod releasing a packet buffered by the switch: buffer_id follows the header (8 bytes), the
+    # match (40), the cookie (8), the command, the timeouts and the priority (8)
+    return data[:64] + struct.pack("!I", buffer_id) + data[68:]
+
+
+def _install_path(event, path, flow_mods, intent=None):
+    # The batch of the first hop is written after the batches of the other switches of the path (the outbox
+    # flushes it last). A packet buffered by the switch is released by the rule of the first hop (its flow_mod
+    # carries the buffer_id), so the packet crosses the control channel only in the packet_in; a packet that is
+    # not buffered is sent back with a packet_out.
+    buffer_id = event.ofp.buffer_id
+    buffered = buffer_id is not None and buffer_id != of.NO_BUFFER
+    for dpid, data in flow_mods:
+        ingress = dpid == event.dpid
+        if buffered and ingress:
+            data = _with_buffer(data, buffer_id)
+        _send(dpid, data, "flow_mod", last=ingress)
+    if buffered:
+        return
+
+    # forward pakietu natychmiast
+    packet_out = of.ofp_packet_out()
+    packet_out.data = event.ofp
+    queue = _queue(event.dpid, path.first_port, intent is not None)
+    _output(packet_out.actions, path.first_port, queue, _mark(intent, queue))
+    packet_out.in_port = event.port
+    _send(event.dpid, packet_out.pack(), "packet_out")
+
+
+def _compile_routes():
+    # packet_in dispatch table and routes of the dynamic edges, so that a packet_in is handled without parsing the
+    # packet or searching the topology; cached decisions may use paths that are gone, so they are dropped
+    packet_in_dispatch.clear()
+    routes.clear()
+    decisions.clear()
+    probed = []
+    for dpid, name in topology.switches.items():
+        packet_in_dispatch[(dpid, ETH_ARP)] = _handle_arp_packet
+        if name not in DYNAMIC_EDGES:
+            # the only IP packets sent to the controller by the other switches are the delay probes
+            packet_in_dispatch[(dpid, ETH_IP)] = _handle_probe_packet
+            continue
+        packet_in_dispatch[(dpid, ETH_IP)] = _handle_ip_packet
+        for host in topology.hosts.values():
+            if host.dpid != dpid:
+                paths = topology.paths.get(dpid, host.dpid)  # precomputed candidate paths
+                if paths:
+                    routes[(dpid, socket.inet_aton(host.ip))] = (host, paths)
+                    probed += paths
+    probes.set_paths(probed, time.time())
+    aggregator.compile(dict((int.from_bytes(socket.inet_aton(ip), "big"), host.dpid)
+                            for ip, host in topology.hosts.items()),
+                       (int.from_bytes(socket.inet_aton(PROBE_IP), "big"),), intent_table.directions())
+
+
+def _handle_arp_packet(event, data):
+    a = parse_arp(data)
+    if a is not None:
+        _handle_arp(event, a)
+
+
+def _handle_probe_packet(event, data):
+    # a delay probe back from the end of its path; other IP packets only teach the controller their sender
+    probe = parse_probe(data)
+    if probe is None:
+        if data[26:30] != data[30:34]:
+            _learn_host(socket.inet_ntoa(data[26:30]), data[6:12], event)
+        return
+    probe_id, seq, sent = probe
+    now = time.time()
+    estimate = probes.paths.get(probe_id)
+    if estimate is None:
+        return
+    estimate = probes.received(probe_id, seq, sent, event.dpid, now,
+                               _channel_latency(estimate.src) + _channel_latency(event.dpid))
+    if estimate is not None and telemetry.info:
+        telemetry.emit("probe", now, estimate.src, estimate.first_port, estimate.dst, estimate.last, estimate.delay,
+                       estimate.jitter, estimate.lost)
+
+
+def _handle_ip_packet(event, data):
+    # New flow entering the network at a dynamic edge. The flow key holds every header field matched by the
+    # exact-match rules (ofp_match.from_packet), read straight from the frame: in_port, MAC addresses, ToS,
+    # protocol, IP addresses and the ports (ICMP type and code).
+    if data[30:34] == PROBE_ADDRESS:
+        _handle_probe_packet(event, data)  # a probe back from the end of a path of the other edge
+        return
+    l4 = 14 + (data[14] & 0x0f) * 4
+    proto = data[23]
+    key = (event.dpid, event.port, data[0:12], data[15], proto, data[26:34],
+           data[l4:l4 + 2] if proto == IP_ICMP else data[l4:l4 + 4])
+    now = time.time()
+    decision = decisions.get(key, now)
+    if decision is None:
+        src = socket.inet_ntoa(data[26:30])
+        if src not in topology.hosts:
+            _learn_host(src, data[6:12], event)
+        route = routes.get((event.dpid, data[30:34]))
+        if route is None:
+            return
+        paths = route[1]
+        sport = dport = 0
+        ports = b""
+        if proto == IP_TCP or proto == IP_UDP:
+            ports = data[l4:l4 + 4]
+            sport, dport = (ports[0] << 8) | ports[1], (ports[2] << 8) | ports[3]
+        src_ip, dst_ip = int.from_bytes(data[26:30], "big"), int.from_bytes(data[30:34], "big")
+        intent = intent_table.match(src_ip, dst_ip, proto, sport, dport)
+        # the rule matches the coarsest aggregate of the flow keeping the decision; the balancer hashes its key
+        occupancy = _table_occupancy(event.dpid)
+        if aggregator.over_budget(occupancy):
+            _evict(event.dpid, now)
+        scope = aggregator.scope(aggregator.level_at(occupancy), src_ip, dst_ip, proto, sport, dport, intent)
+        if scope is None:
+            match = of.ofp_match.from_packet(event.parsed, event.port)
+            flow = data[26:34] + data[23:24] + ports
+            priority = _rule_priority(0, intent)
+        else:
+            match = _scope_match(scope)
+            flow = scope.key()
+            priority = _rule_priority(scope.level, intent)
+        demand = placer.demand(_demand_class(match, intent), (intent.min_bw or 0.0) if intent is not None else 0.0,
+                               flow)
+        ends = None
+        if intent is not None:
+            ends = (src_ip, dst_ip)
+            path = intent_path(intent, paths, demand, flows.opposite(intent, src_ip, dst_ip))
+        else:
+            path = balance_pick(flow, paths, now, demand)
+        metrics.decision(event.dpid, path.first_port, "balance" if intent is None else "intent")
+        if telemetry.info:
+            telemetry.emit("decision", now, event.dpid, data[26:30], data[30:34], proto, sport, dport,
+                           path.first_port, path_delay(path), intent.name if intent is not None else None)
+        flow_mods = _path_flow_mods(event.dpid, match, path, priority, intent)
+        decision = (path, flow_mods, match, _match_key(match), intent, flow, priority,
+                    tuple(dpid for dpid, data in flow_mods), ends)
+        # with flowlets every burst of a best-effort flow is placed again by the balancer
+        if intent is not None or FLOWLET_GAP is None:
+            decisions.put(key, decision, now)
+    path, flow_mods, match, match_key, intent, flow, priority, switches, ends = decision
+    record = flows.add(match_key, event.dpid, path, match, intent, flow, key, now, priority, switches,
+                       (intent.min_bw or 0.0) if intent is not None else 0.0, ends)
+    # until the next statistics the flow counts with its estimated demand on the links of its path
+    placer.placed(path.links, placer.demand(_demand_class(match, intent), flow=flow), now)
+    if record.backup is None:
+        route = routes.get((event.dpid, data[30:34]))
+        if route is not None:
+            record.backup = failover.backup(path, route[1], _flow_budget(record), path_delay)
+    # every install is tracked, the adapted timeouts are used only without flowlets
+    idle, hard = lifecycle.timeouts((event.dpid, match_key), now, aggregator.near_budget(_table_occupancy(event.dpid)))
+    if ADAPTIVE_TIMEOUTS and FLOWLET_GAP is None:
+        if idle != FLOW_IDLE_TIMEOUT or hard:
+            flow_mods = tuple((dpid, _with_timeouts(data, idle, hard)) for dpid, data in flow_mods)
+    _install_path(event, path, flow_mods, intent)
+
+
+def _handle_PacketIn(event):
+    # Dispatch on (switch, ethertype) read from the raw frame. Other packets (e.g. LLDP, handled by
+    # openflow.discovery) are ignored without being parsed.
+    metrics.received(event.dpid, "packet_in")
+    data = event.data
+    if len(data) < 34:
+        return
+    handler = packet_in_dispatch.get((event.dpid, (data[12] << 8) | data[13]))
+    if handler is None:
+        return
+
+    # Static rules are installed proactively in _handle_ConnectionUp, so here only the dynamic decisions are made.
+    # A switch whose static rules are missing is provisioned again.
+    if not _is_provisioned(event.dpid):
+        _provision_switch(event.connection)
+    handler(event, data)
+
+
+def _load_manifest(path):
+    global DYNAMIC_EDGES
+    net = load_manifest(path)
+    # the topology model holds LINK_DELAY_MS itself, so the dictionaries are updated in place
+    LINK_BW.clear()
+    LINK_BW.update(net["link_bw"])
+    LINK_DELAY_MS.clear()
+    LINK_DELAY_MS.update(net["link_delay"])
+    DYNAMIC_EDGES = net["dynamic_edges"] or DYNAMIC_EDGES
+    if net["k_paths"]:
+        topology.paths.k = max(K_PATHS, int(net["k_paths"]))
+    print("Manifest:", len(LINK_BW), "links, dynamic edges", ", ".join(DYNAMIC_EDGES), "from", path)
+
+
+def launch(intents=INTENTS_FILE, telemetry_dir=TELEMETRY_DIR, verbosity=TELEMETRY_LEVEL,
+           telemetry_format=TELEMETRY_FORMAT, metrics_port=METRICS_PORT, manifest=None, arp_rules=ARP_RULES,
+           aggregation=FLOW_AGGREGATION, table_budget=TABLE_BUDGET, adaptive_timeouts=ADAPTIVE_TIMEOUTS,
+           forecast=FORECAST_MODEL, placement=PLACEMENT, queues=QUEUES, state=STATE_FILE):
     """
     As usually, launch() is the function called by POX to initialize the
     component indicated by a parameter provided to pox.py (routing_controller.py in
     our case). For more info, see
     http://intronetworks.cs.luc.edu/auxiliary_files/mininet/poxwiki.pdf
+
+    The intents are read from the JSON file given with --intents=<file> (intents.json by default), telemetry
+    is written to the directory given with --telemetry_dir=<dir>, metrics are served on --metrics_port=<port>.
+    The links and edge switches are read from the manifest of the network given with --manifest=<file>.
+    With --arp_rules the switches get ARP rules towards the known hosts. The rules of the placed flows are
+    aggregated at the level given with --aggregation=flow|pair|prefix, within --table_budget=<rules> per switch.
+    --adaptive_timeouts=False installs every flow rule with the fixed FLOW_IDLE_TIMEOUT. The link utilization is
+    forecast with --forecast=holt|linear|ewma, or not at all with --forecast=off. Best-effort flows are placed
+    with --placement=minmax (by their estimated demands) or --placement=hash (weighted consistent hash).
+    --queues=False outputs every flow on the single queue of its port instead of the queue of its class.
+    The routing state is snapshot to the file given with --state=<file> and restored from it on start
+    (nothing is kept without it).
     """
 
-    global start_time
+    global intent_table, telemetry, ARP_RULES, ADAPTIVE_TIMEOUTS, aggregator, forecaster, PLACEMENT
+    global QUEUES, journal, restored, restored_since
+
+    ARP_RULES = str(arp_rules).lower() in ("1", "true", "yes")
+    QUEUES = str(queues).lower() in ("1", "true", "yes")
+    ADAPTIVE_TIMEOUTS = str(adaptive_timeouts).lower() in ("1", "true", "yes")
+    aggregator = Aggregator(aggregation, int(table_budget) or None, TABLE_HIGH)
+    if placement in ("minmax", "hash"):
+        PLACEMENT = placement
+    else:
+        log.error("Unknown placement %s (minmax or hash)", placement)
+    forecaster = None
+    if forecast in FORECAST_MODELS:
+        forecaster = LinkForecaster(forecast, FORECAST_HORIZON, enter=CONGESTION_ENTER, exit=CONGESTION_EXIT)
+    elif str(forecast).lower() not in ("off", "none", "false"):
+        log.error("Unknown forecast model %s (one of %s, or off)", forecast, ", ".join(FORECAST_MODELS))
+
+    telemetry = Telemetry(telemetry_dir, verbosity, telemetry_format)
+    telemetry.start()
+
+    try:
+        intent_table = IntentTable.load(intents)
+    except (IOError, ValueError, TypeError) as e:
+        log.error("Cannot load the intents from %s: %s", intents, e)
+    print("Intents:", len(intent_table), "loaded from", intents)
+
+    if manifest:
+        try:
+            _load_manifest(manifest)
+        except (IOError, ValueError, KeyError, TypeError) as e:
+            log.error("Cannot load the manifest %s: %s", manifest, e)
+
+    if state and str(state).lower() not in ("off", "none", "false", "true"):
+        journal = StateJournal(state, STATE_INTERVAL)
+        restored = journal.load()
+        if restored:
+            restored_since = time.time()
+            _restore_baselines()
+            print("State: %d hosts, %d links, %d flows restored from %s" % (
+                len(restored.get("hosts", {})), len(restored.get("links", {})), len(restored.get("flows", {})),
+                state))
+        try:
+            journal.start()
+        except (OSError, IOError) as e:
+            log.error("Cannot keep the state in %s: %s", state, e)
+            journal = None
 
     """core is an instance of class POXCore (EventMixin) and it can register objects.
        An object with name xxx can be registered to core instance which makes this
        object become a "component" available as pox.core.core.xxx. For examples, see,
        e.g., https://noxrepo.github.io/pox-doc/html/#the-openflow-nexus-core-openflow """
-    core.openflow.addListenerByName("PortStatsReceived",
-                                    _handle_portstats_received)  # listen for port stats , https://noxrepo.github.io/pox-doc/html/#statistics-events
-    core.openflow.addListenerByName("ConnectionUp",
-                                    _handle_ConnectionUp)  # listen for the establishment of a new control channel with a switch, https://noxrepo.github.io/pox-doc/html/#connectionup
-    core.openflow.addListenerByName("PacketIn",
-                                    _handle_PacketIn)  # listen for the reception of packet_in message from switch, https://noxrepo.github.io/pox-doc/html/#packetin
+    core.openflow.addListenerByName("PortStatsReceived", metrics.timed("port_stats",
+                                    _handle_portstats_received))  # listen for port stats , https://noxrepo.github.io/pox-doc/html/#statistics-events
+    core.openflow.addListenerByName("FlowStatsReceived", metrics.timed("flow_stats",
+                                    _handle_flowstats_received))  # rates of the flows placed at the dynamic edges
+    core.openflow.addListenerByName("QueueStatsReceived", metrics.timed("queue_stats",
+                                    _handle_queuestats_received))  # rates and drops of the per-class queues
+    core.openflow.addListenerByName("FlowRemoved", metrics.timed("flow_removed",
+                                    _handle_FlowRemoved))  # lifetimes of the rules of the placed flows
+    core.openflow.addListenerByName("ConnectionUp", metrics.timed("connection_up",
+                                    _handle_ConnectionUp))  # listen for the establishment of a new control channel with a switch, https://noxrepo.github.io/pox-doc/html/#connectionup
+    core.openflow.addListenerByName("PacketIn", metrics.timed("packet_in",
+                                    _handle_PacketIn))  # listen for the reception of packet_in message from switch, https://noxrepo.github.io/pox-doc/html/#packetin
+    core.openflow.addListenerByName("ConnectionDown", metrics.timed("connection_down",
+                                    _handle_ConnectionDown))  # forget the rules installed in a disconnected switch
+    core.openflow.addListenerByName("BarrierIn", metrics.timed("barrier",
+                                    _handle_BarrierIn))  # confirmation that a batch of static rules has been installed
+    core.openflow.addListenerByName("PortStatus", metrics.timed("port_status",
+                                    _handle_PortStatus))  # ports going up/down, https://noxrepo.github.io/pox-doc/html/#portstatus
+
+    # links between the switches are found with LLDP by the openflow.discovery component (started here if it was
+    # not given on the command line), https://noxrepo.github.io/pox-doc/html/#openflow-discovery-discovering-inter-switch-links
+    if not core.hasComponent("openflow_discovery"):
+        import pox.openflow.discovery
+        pox.openflow.discovery.launch()
+    core.call_when_ready(lambda: core.openflow_discovery.addListenerByName(
+        "LinkEvent", metrics.timed("link_event", _handle_LinkEvent)), "openflow_discovery")
+
+    # queue depths, read when the metrics are scraped
+    metrics.gauge("queue_depth", "telemetry", lambda: len(telemetry.buffer))
+    metrics.gauge("queue_depth", "pending_barriers", lambda: len(pending_rules))
+    metrics.gauge("queue_depth", "outbox", lambda: len(outbox))
+    metrics.gauge("total", "outbox_writes", lambda: outbox.writes)
+    metrics.gauge("queue_depth", "stats_in_flight",
+                  lambda: sum(len(poll.in_flight) for poll in list(collector.switches.values())))
+    metrics.gauge("entries", "decision_cache", lambda: len(decisions))
+    metrics.gauge("entries", "flow_registry", lambda: len(flows))
+    metrics.gauge("entries", "balancer_flows", lambda: len(balancer.flows))
+    metrics.gauge("entries", "flow_rules", lambda: sum(flows.rules.values()))
+    metrics.gauge("total", "telemetry_dropped", lambda: telemetry.dropped)
+    metrics.gauge("total", "decision_cache_hits", lambda: decisions.hits)
+    metrics.gauge("total", "decision_cache_misses", lambda: decisions.misses)
+    metrics.gauge("total", "migrations", lambda: flows.migrations)
+    if forecaster is not None:
+        metrics.gauge("entries", "congested_links",
+                      lambda: sum(state.congested for state in list(forecaster.links.values())))
+        metrics.gauge("total", "congestion_onsets", lambda: forecaster.onsets)
+        metrics.gauge("error", "forecast_mae",
+                      lambda: forecaster.abs_error / forecaster.errors if forecaster.errors else 0.0)
+        metrics.gauge("error", "forecast_bias",
+                      lambda: forecaster.bias / forecaster.errors if forecaster.errors else 0.0)
+    metrics.gauge("total", "placements", lambda: placer.placements)
+    metrics.gauge("entries", "demand_classes", lambda: len(placer.demands))
+    for name in queue_stats.names.values():
+        metrics.gauge("bitrate", "queue_" + name, lambda name=name: queue_stats.classes()[name]["bitrate"])
+        metrics.gauge("total", "queue_drops_" + name, lambda name=name: queue_stats.classes()[name]["drops"])
+    metrics.gauge("entries", "flows_on_backup", lambda: len(failover))
+    metrics.gauge("total", "failovers", lambda: failover.failovers)
+    metrics.gauge("total", "failover_restores", lambda: failover.restores)
+    metrics.gauge("total", "failover_unprotected", lambda: failover.unprotected)
+    metrics.gauge("seconds", "last_failover", lambda: failover.last_ms / 1000.0)
+    metrics.gauge("entries", "rule_histories", lambda: len(lifecycle))
+    for name in reconciled:
+        metrics.gauge("total", "reconciled_" + name, lambda name=name: reconciled[name])
+    metrics.gauge("total", "hosts_held", lambda: hosts_held)
+    if journal is not None:
+        metrics.gauge("total", "state_snapshots", lambda: journal.snapshots)
+        metrics.gauge("bytes", "state_file", lambda: journal.size)
+    metrics.gauge("total", "flow_installs", lambda: lifecycle.installs)
+    metrics.gauge("total", "flow_reinstalls", lambda: lifecycle.reinstalls)
+    metrics.gauge("rate", "flow_reinstalls_per_s", lambda: lifecycle.churn(time.time()))
+    for name in ("coarsened", "refined", "evicted"):
+        metrics.gauge("total", "aggregates_" + name, lambda name=name: aggregator.counters()[name])
+    for name in ("answered", "relayed", "flooded", "suppressed"):
+        metrics.gauge("total", "arp_" + name, lambda name=name: arp_responder.counters()[name])
+    if int(metrics_port):
+        try:
+            metrics.start_server(int(metrics_port))
+        except (OSError, IOError) as e:
+            log.error("Cannot serve the metrics on port %s: %s", metrics_port, e)
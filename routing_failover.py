@@ -0,0 +1,98 @@
+"""
+ Fast failover of the flows placed by routing_controller.py.
+
+ Every placed flow gets a backup path when it is placed (or moved): among the other candidate paths between its
+ switches meeting the latency budget of the flow (all of them if none does), the one sharing the fewest links
+ with its primary path, then the one with the lowest delay. The budget is given by the controller: for an intent flow it is
+ the max_delay of the intent within what the round-trip budget of the pair leaves. The backups are cached per
+ (primary path, budget), so the flows of one path and budget share theirs, and the cache is rebuilt whenever
+ the path table changes.
+
+ When links go down the controller moves all the flows crossing them to their backups at once (one batch of
+ flow_mods per switch, without waiting for the path table to be rebuilt), and remembers their primary paths and
+ the links that failed. A flow goes back to its primary path only once all those links have been up again for
+ `hold` seconds (a link that goes down again restarts its wait), so a flapping link does not move the flows back
+ and forth.
+
+ The module does not depend on POX.
+"""
+
+
+class Failover(object):
+
+    def __init__(self, hold=5.0):
+        self.hold = hold
+        self._backups = {}  # (links of the primary path, latency budget) -> backup Path or None
+        self.primaries = {}  # flow key -> (links of the primary path, links that failed)
+        self.up_since = {}  # link that failed -> time it came up again
+        self.events = 0  # link failures handled
+        self.failovers = 0  # flows moved to their backups
+        self.unprotected = 0  # flows crossing a failed link without a usable backup
+        self.restores = 0  # flows moved back to their primary paths
+        self.last_ms = None  # time spent moving the flows of the last failure
+
+    def __len__(self):
+        return len(self.primaries)
+
+    def clear(self):
+        self._backups.clear()
+
+    def backup(self, path, paths, budget=None, delay=None):
+        """
+        Backup of `path` among the candidate `paths` (the same switches) for a flow with the latency budget `budget`
+        in ms (None: no budget); delay(path) gives the delay of a path in ms (path.delay by default). None if there
+        is no other path.
+        """
+        key = (path.links, budget)
+        if key in self._backups:
+            return self._backups[key]
+        primary = set(path.links)
+        best, best_rank = None, None
+        for other in paths:
+            if other.links == path.links:
+                continue
+            ms = delay(other) if delay is not None else other.delay
+            late = budget is not None and ms > budget
+            rank = (late, len(primary.intersection(other.links)), ms)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = other, rank
+        self._backups[key] = best
+        return best
+
+    def failed(self, key, primary, links):
+        # the flow `key` leaves its primary path (links) because `links` went down; a flow that is already away
+        # from its primary path keeps the first one
+        if key in self.primaries:
+            self.primaries[key] = (self.primaries[key][0], self.primaries[key][1] | frozenset(links))
+        else:
+            self.primaries[key] = (primary, frozenset(links))
+        self.failovers += 1
+
+    def link_down(self, link):
+        self.up_since.pop(link, None)
+
+    def link_up(self, link, now):
+        self.up_since.setdefault(link, now)
+
+    def due(self, now):
+        """ Flows whose failed links have all been up for `hold` seconds: list of (key, links of the primary path). """
+        due = []
+        for key, (primary, links) in self.primaries.items():
+            if all(link in self.up_since and now - self.up_since[link] >= self.hold for link in links):
+                due.append((key, primary))
+        return due
+
+    def forget(self, key):
+        self.primaries.pop(key, None)
+
+    def prune(self, alive):
+        # flows that expired while away from their primary paths; links nobody waits for anymore
+        for key in [key for key in self.primaries if key not in alive]:
+            del self.primaries[key]
+        waited = set(link for primary, links in self.primaries.values() for link in links)
+        for link in [link for link in self.up_since if link not in waited]:
+            del self.up_since[link]
+
+    def counters(self):
+        return {"events": self.events, "failovers": self.failovers, "unprotected": self.unprotected,
+                "restores": self.restores, "away": len(self.primaries), "last_ms": self.last_ms}
@@ -0,0 +1,222 @@
+"""
+ Registry of the flows placed by routing_controller.py, and the planner moving them off overloaded links.
+
+ Every flow installed at a dynamic edge is recorded with its path and its rate, estimated (EWMA) from the
+ byte counters of its rule in the flow stats replies of the switch. Flows whose rules are not listed in a
+ reply anymore have expired and are dropped. An index link -> flows gives the flows crossing a link.
+
+ When a link is overloaded, plan() picks the flows to move away from it: the smallest flow that carries
+ the excess alone, if there is one, otherwise the largest flows first (elephants) until the excess is
+ covered, so the set of moved flows is as small as possible. The number of moves per interval is limited
+ by a budget, and a flow that has just been moved is not moved again for `hold` seconds.
+
+ The minimum bandwidth reserved by the intent flows is summed per link (reserved), for the placement engine
+ (routing_placement.py).
+
+ The intent flows are registered with their end hosts, so the flow of the opposite direction of a pair (the
+ mirror of the intent, from the destination back to the source, see routing_intents.py) is found by opposite().
+
+ The registry also counts the rules of the flows per switch (every switch of the path holding a rule of the
+ flow), which the controller compares with its table budget; coldest() gives the rules to evict first.
+
+ The module does not depend on POX.
+"""
+
+import heapq
+
+
+class FlowRecord(object):
+    __slots__ = ("key", "dpid", "path", "match", "intent", "flow", "decision_key", "installed", "moved",
+                 "bytes", "last_time", "rate", "priority", "switches", "backup", "reserve", "ends")
+
+    def __init__(self, key, dpid, path, match, intent, flow, decision_key, now, priority=None, switches=None,
+                 reserve=0.0, ends=None):
+        self.key = key
+        self.dpid = dpid
+        self.path = path
+        self.match = match
+        self.intent = intent
+        self.flow = flow  # 5-tuple bytes used by the balancer
+        self.decision_key = decision_key
+        self.installed = now
+        self.moved = None  # time of the last migration
+        self.bytes = 0
+        self.last_time = None
+        self.rate = 0.0  # bit/s
+        self.priority = priority  # priority of its rules
+        self.switches = switches if switches is not None else (dpid,)  # switches holding a rule of the flow
+        self.backup = None  # path the flow fails over to (see routing_failover.py)
+        self.reserve = reserve  # bit/s reserved for the flow on every link of its path
+        self.ends = ends  # (source, destination) addresses of an intent flow, as ints
+
+    def __repr__(self):
+        return "FlowRecord(%s, %s, %.0f bit/s)" % (self.key, self.path, self.rate)
+
+
+class FlowRegistry(object):
+
+    def __init__(self, alpha=0.5, budget=8, interval=1.0, hold=5.0):
+        self.alpha = alpha  # weight of the newest rate sample in the EWMA
+        self.budget = budget  # moves allowed per interval
+        self.interval = interval
+        self.hold = hold  # seconds a moved flow stays where it has been moved
+        self.flows = {}  # key -> FlowRecord
+        self.by_link = {}  # (dpid, port) -> set of keys
+        self.rules = {}  # dpid -> rules of the registered flows in the switch
+        self.reserved = {}  # (dpid, port) -> bit/s reserved by the flows crossing the link
+        self.pairs = {}  # (intent, source, destination) -> key of the latest flow of that direction
+        self._window = None  # start of the current budget interval
+        self._spent = 0
+        self.migrations = 0
+        self.expired = 0
+
+    def __len__(self):
+        return len(self.flows)
+
+    def _count(self, record, n):
+        for dpid in record.switches:
+            count = self.rules.get(dpid, 0) + n
+            if count > 0:
+                self.rules[dpid] = count
+            else:
+                self.rules.pop(dpid, None)
+
+    def _index(self, record, add):
+        for link in record.path.links:
+            if add:
+                self.by_link.setdefault(link, set()).add(record.key)
+            else:
+                keys = self.by_link.get(link)
+                if keys is not None:
+                    keys.discard(record.key)
+                    if not keys:
+                        del self.by_link[link]
+            if record.reserve:
+                reserved = self.reserved.get(link, 0.0) + (record.reserve if add else -record.reserve)
+                if reserved > 0:
+                    self.reserved[link] = reserved
+                else:
+                    self.reserved.pop(link, None)
+
+    def add(self, key, dpid, path, match, intent, flow, decision_key, now, priority=None, switches=None,
+            reserve=0.0, ends=None):
+        record = self.flows.get(key)
+        if record is not None:
+            if record.path is path:
+                return record
+            self.remove(key)
+        record = self.flows[key] = FlowRecord(key, dpid, path, match, intent, flow, decision_key, now, priority,
+                                              switches, reserve, ends)
+        self._index(record, True)
+        self._count(record, 1)
+        if ends is not None and intent is not None:
+            self.pairs[(intent,) + ends] = key
+        return record
+
+    def remove(self, key):
+        record = self.flows.pop(key, None)
+        if record is not None:
+            self._index(record, False)
+            self._count(record, -1)
+            if record.ends is not None and self.pairs.get((record.intent,) + record.ends) == key:
+                del self.pairs[(record.intent,) + record.ends]
+        return record
+
+    def opposite(self, intent, src, dst):
+        """ Record of the flow of the opposite direction of the intent flow from src to dst (ints), or None. """
+        key = self.pairs.get((intent.pair, dst, src))
+        return self.flows.get(key) if key is not None else None
+
+    def move(self, record, path, now, switches=None):
+        self._index(record, False)
+        record.path = path
+        record.moved = now
+        self._index(record, True)
+        if switches is not None:
+            # the rules along the old path are left to expire, they are not counted anymore
+            self._count(record, -1)
+            record.switches = switches
+            self._count(record, 1)
+        self.migrations += 1
+
+    def coldest(self, dpid, n):
+        """ The n flows entering at switch dpid with the lowest rates (the oldest first among equal rates). """
+        return heapq.nsmallest(n, (record for record in self.flows.values() if record.dpid == dpid),
+                               key=lambda record: (record.rate, record.installed))
+
+    def on_link(self, link):
+        return [self.flows[key] for key in self.by_link.get(link, ())]
+
+    def reserved_rate(self, link):
+        """ Measured rate (bit/s) of the flows with a reservation on the link. """
+        return sum(self.flows[key].rate for key in self.by_link.get(link, ()) if self.flows[key].reserve)
+
+    def update(self, dpid, sent, now, entries):
+        """
+        Flow stats reply of switch dpid, requested at `sent`: entries is a list of (key, byte count).
+        Rates are updated, and the flows of the switch installed before the request and missing from
+        the reply have expired.
+        """
+        seen = set()
+        for key, byte_count in entries:
+            record = self.flows.get(key)
+            if record is None:
+                continue
+            seen.add(key)
+            if record.last_time is not None and now > record.last_time and byte_count >= record.bytes:
+                rate = 8.0 * (byte_count - record.bytes) / (now - record.last_time)
+                record.rate += self.alpha * (rate - record.rate)
+            record.bytes = byte_count
+            record.last_time = now
+        for key, record in list(self.flows.items()):
+            if record.dpid == dpid and key not in seen and record.installed < sent:
+                self.remove(key)
+                self.expired += 1
+
+    def forget_switch(self, dpid):
+        for key in [key for key, record in self.flows.items() if dpid in [hop[0] for hop in record.path.hops]]:
+            self.remove(key)
+
+    # ---------------------------------------------------------------- migrations
+    def _budget_left(self, now):
+        if self._window is None or now - self._window >= self.interval:
+            self._window = now
+            self._spent = 0
+        return self.budget - self._spent
+
+    def plan(self, link, excess, choose, now):
+        """
+        Moves taking at least `excess` bit/s off the link: list of (record, new path). choose(record, extra)
+        returns the path the flow can be moved to (extra: bit/s already planned onto every link) or None.
+        """
+        left = self._budget_left(now)
+        if left <= 0 or excess <= 0:
+            return []
+        candidates = [record for record in self.on_link(link)
+                      if record.rate > 0 and (record.moved is None or now - record.moved >= self.hold)]
+        if not candidates:
+            return []
+        candidates.sort(key=lambda record: -record.rate)
+        # one flow is enough: the smallest one that carries the whole excess
+        single = [record for record in candidates if record.rate >= excess]
+        order = [single[-1]] + candidates if single else candidates
+        moves = []
+        extra = {}
+        moved = 0.0
+        for record in order:
+            if moved >= excess or len(moves) >= left:
+                break
+            if any(record is planned for planned, path in moves):
+                continue
+            path = choose(record, extra)
+            if path is None:
+                continue
+            moves.append((record, path))
+            moved += record.rate
+            for new_link in path.links:
+                extra[new_link] = extra.get(new_link, 0.0) + record.rate
+        self._spent += len(moves)
+        return moves
+
+    def counters(self):
+        return {"flows": len(self.flows), "migrations": self.migrations, "expired": self.expired}
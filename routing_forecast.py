@@ -0,0 +1,156 @@
+"""
+ Short-horizon forecast of the link utilization used by routing_controller.py to steer new flows away from links
+ before they saturate.
+
+ Every port stats sample of a link (its utilization over the last polling interval) updates a per-link model:
+    - "ewma": the smoothed level only, the forecast is flat,
+    - "holt": Holt's linear method, a smoothed level and a smoothed trend (per second); the smoothing weights
+      follow the time between the samples (1 - exp(-dt / tau)), as the EWMA of routing_stats.py,
+    - "linear": the least-squares line through the samples of the last `window` seconds.
+ The forecast is the utilization expected `horizon` seconds after the newest sample (never negative).
+
+ A link is marked congested when its forecast reaches `enter` and stays marked until the forecast drops below
+ `exit` (entry/exit hysteresis bands), so the routing decisions do not flip when the load hovers around a single
+ threshold.
+
+ Every forecast is kept until the first sample taken at least `horizon` seconds later, and the difference
+ (actual - predicted) is the forecast error: it is returned by update() (for the telemetry) and accumulated as
+ the mean absolute error and the bias per link and in total, to tune the model and its parameters.
+
+ The module does not depend on POX.
+"""
+
+import math
+from collections import deque
+
+MODELS = ("ewma", "holt", "linear")
+
+
+class LinkForecast(object):
+    __slots__ = ("level", "trend", "last_time", "samples", "pending", "congested", "errors", "abs_error", "bias",
+                 "forecast")
+
+    def __init__(self):
+        self.level = None
+        self.trend = 0.0  # utilization per second
+        self.last_time = None
+        self.samples = deque()  # (time, utilization) of the last window, for the linear model
+        self.pending = deque()  # (target time, predicted utilization) waiting for their actual value
+        self.congested = False
+        self.errors = 0
+        self.abs_error = 0.0
+        self.bias = 0.0
+        self.forecast = 0.0  # at the newest sample
+
+
+class LinkForecaster(object):
+
+    def __init__(self, model="holt", horizon=2.0, tau=2.0, trend_tau=4.0, window=5.0, enter=0.8, exit=0.6):
+        if model not in MODELS:
+            raise ValueError("unknown forecast model %r (one of %s)" % (model, ", ".join(MODELS)))
+        if exit > enter:
+            raise ValueError("the exit band (%g) must not be above the entry band (%g)" % (exit, enter))
+        self.model = model
+        self.horizon = horizon
+        self.tau = tau  # time constant of the level
+        self.trend_tau = trend_tau  # time constant of the trend (holt)
+        self.window = window  # seconds of samples fitted by the linear model
+        self.enter = enter
+        self.exit = exit
+        self.links = {}  # link -> LinkForecast
+        self.errors = 0
+        self.abs_error = 0.0
+        self.bias = 0.0
+        self.onsets = 0  # times a link entered the congested band
+
+    def __len__(self):
+        return len(self.links)
+
+    def _fit(self, state, t, value):
+        if state.level is None:
+            state.level, state.trend = value, 0.0
+            return
+        dt = t - state.last_time
+        if self.model == "linear":
+            samples = state.samples
+            n = len(samples)
+            mean_t = sum(s[0] for s in samples) / n
+            mean_u = sum(s[1] for s in samples) / n
+            var = sum((s[0] - mean_t) ** 2 for s in samples)
+            state.trend = sum((s[0] - mean_t) * (s[1] - mean_u) for s in samples) / var if var > 0 else 0.0
+            state.level = mean_u + state.trend * (t - mean_t)
+            return
+        a = 1.0 - math.exp(-dt / self.tau)
+        previous = state.level
+        if self.model == "holt":
+            predicted = previous + state.trend * dt
+            state.level = predicted + a * (value - predicted)
+            b = 1.0 - math.exp(-dt / self.trend_tau)
+            state.trend += b * ((state.level - previous) / dt - state.trend)
+        else:
+            state.level = previous + a * (value - previous)
+
+    def update(self, link, t, utilization):
+        """
+        New sample of the link taken at time t. Returns the errors of the forecasts that came due:
+        a list of (predicted, actual).
+        """
+        state = self.links.get(link)
+        if state is None:
+            state = self.links[link] = LinkForecast()
+        elif t <= state.last_time:
+            return []
+        errors = []
+        while state.pending and state.pending[0][0] <= t:
+            target, predicted = state.pending.popleft()
+            if t - target > self.horizon:
+                continue  # no sample near the target time: not a measure of the model
+            error = utilization - predicted
+            errors.append((predicted, utilization))
+            state.errors += 1
+            state.abs_error += abs(error)
+            state.bias += error
+            self.errors += 1
+            self.abs_error += abs(error)
+            self.bias += error
+        state.samples.append((t, utilization))
+        while state.samples[0][0] < t - self.window:
+            state.samples.popleft()
+        self._fit(state, t, utilization)
+        state.last_time = t
+        state.forecast = max(state.level + state.trend * self.horizon, 0.0)
+        state.pending.append((t + self.horizon, state.forecast))
+        if not state.congested and state.forecast >= self.enter:
+            state.congested = True
+            self.onsets += 1
+        elif state.congested and state.forecast < self.exit:
+            state.congested = False
+        return errors
+
+    def forecast(self, link, now=None):
+        """ Utilization of the link expected `horizon` seconds from now (from the newest sample if now is None). """
+        state = self.links.get(link)
+        if state is None or state.level is None:
+            return 0.0
+        ahead = self.horizon if now is None else max(now - state.last_time, 0.0) + self.horizon
+        return max(state.level + state.trend * ahead, 0.0)
+
+    def congested(self, link):
+        state = self.links.get(link)
+        return state is not None and state.congested
+
+    def forget(self, predicate):
+        # links of a switch that disconnected, or that are gone from the topology
+        for link in [link for link in self.links if predicate(link)]:
+            del self.links[link]
+
+    def report(self):
+        links = {}
+        for link, state in self.links.items():
+            links[link] = {"forecast": round(state.forecast, 4), "trend": round(state.trend, 4),
+                           "congested": state.congested,
+                           "mae": round(state.abs_error / state.errors, 4) if state.errors else None,
+                           "bias": round(state.bias / state.errors, 4) if state.errors else None}
+        return {"model": self.model, "horizon": self.horizon, "onsets": self.onsets, "errors": self.errors,
+                "mae": round(self.abs_error / self.errors, 4) if self.errors else None,
+                "bias": round(self.bias / self.errors, 4) if self.errors else None, "links": links}
@@ -0,0 +1,1877 @@
+"""
+ Mininet-free replay harness and benchmark for routing_controller.py.
+
+ The harness installs a minimal, pure Python stand-in for the parts of POX used by the controller
+ (pox.core.core with core.openflow, libopenflow_01 messages, packet parsing, Timer) and drives the
+ controller handlers with synthetic events:
+    - switches of a topology (the diamond of routing_net.py, or N parallel paths) connect and get
+      their links reported as openflow.discovery would,
+    - hosts ARP for each other and send flows through a tiny flow-table model of the switches, so
+      only real table misses become packet_in events,
+    - port statistics replies are generated for the stats requests sent by the controller,
+    - links between switches can be set down and up again during the trace (--link-down s1-s4@10-20), with
+      the PortStatus and LinkEvent events a real network would raise; the packets sent into a down link are
+      counted as lost,
+    - the controller can be restarted during the trace (--restart 10): the new process starts from the state
+      file of the old one (--state <file>, or from nothing), the switches keep their flow tables and connect
+      again, and openflow.discovery reports the links DISCOVERY_DELAY seconds later; the packet_in burst after
+      the restart and the time until the packet_in rate is back to its level before are reported.
+
+ It reports events/s, per-handler latency percentiles, messages and bytes emitted per event, memory
+ growth and the utilization of the links between switches per second of the trace (with --placement=minmax|hash
+ to compare the placements of the controller). No root, network or POX installation is needed:
+
+    python routing_harness.py --flows 20000 --events 1000000
+"""
+
+import argparse
+import array
+import collections
+import heapq
+import json
+import os
+import random
+import resource
+import struct
+import sys
+import time as _time
+import types
+
+# =====================================================================================================
+# Minimal stand-in for POX
+# =====================================================================================================
+
+
+class _Log(object):
+    def __init__(self):
+        self.messages = collections.Counter()
+
+    def _record(self, level, *args, **kw):
+        self.messages[level] += 1
+
+    def debug(self, *args, **kw):
+        self._record("debug")
+
+    def info(self, *args, **kw):
+        self._record("info")
+
+    def warning(self, *args, **kw):
+        self._record("warning")
+
+    warn = warning
+
+    def error(self, *args, **kw):
+        self._record("error")
+
+    def exception(self, *args, **kw):
+        self._record("exception")
+
+
+class Clock(object):
+    """ Virtual clock replacing the `time` module in the controller modules (everything else is delegated). """
+
+    def __init__(self, start=1000000.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def __getattr__(self, name):
+        return getattr(_time, name)
+
+
+class _Timer(object):
+    def __init__(self, timeToWake, callback, absoluteTime=False, recurring=False, args=(), kw={}, scheduler=None,
+                 started=True, selfStoppable=True):
+        self.interval = timeToWake
+        self.callback = callback
+        self.recurring = recurring
+        self.args = args
+        self.kw = kw
+        self.cancelled = False
+        harness = Harness.current
+        harness.schedule(self, harness.clock.now + timeToWake)
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class ConnectionDict(dict):
+    def __iter__(self):
+        return iter(list(self.values()))
+
+    def __contains__(self, item):
+        return dict.__contains__(self, item) or item in self.values()
+
+
+class _EventSource(object):
+    def __init__(self, harness, name):
+        self.harness = harness
+        self.name = name
+        self.listeners = collections.defaultdict(list)
+
+    def addListenerByName(self, event_name, handler, **kw):
+        self.listeners[event_name].append(self.harness.instrument(event_name, handler))
+
+    def raiseEvent(self, event_name, event):
+        for handler in self.listeners.get(event_name, ()):
+            handler(event)
+
+
+class _Nexus(_EventSource):
+    def __init__(self, harness):
+        _EventSource.__init__(self, harness, "openflow")
+        self.connections = ConnectionDict()
+
+    def getConnection(self, dpid):
+        return self.connections.get(dpid)
+
+    def sendToDPID(self, dpid, data):
+        connection = self.connections.get(dpid)
+        if connection is None:
+            return False
+        connection.send(data)
+        return True
+
+
+class _Core(object):
+    def __init__(self, harness):
+        self._harness = harness
+        self._components = {}
+        self._waiting = []
+        self.register("openflow", _Nexus(harness))
+
+    def getLogger(self, name=None):
+        return self._harness.log
+
+    def hasComponent(self, name):
+        return name in self._components
+
+    def register(self, name, component):
+        self._components[name] = component
+        setattr(self, name, component)
+        for callback, names in list(self._waiting):
+            if all(n in self._components for n in names):
+                self._waiting.remove((callback, names))
+                callback()
+
+    def registerNew(self, cls, *args, **kw):
+        component = cls(*args, **kw)
+        self.register(getattr(component, "_core_name", cls.__name__), component)
+        return component
+
+    def call_when_ready(self, callback, components=[], name=None, args=(), kw={}):
+        if isinstance(components, str):
+            components = [components]
+        if all(n in self._components for n in components):
+            callback(*args, **kw)
+        else:
+            self._waiting.append((lambda: callback(*args, **kw), tuple(components)))
+
+    def callLater(self, callback, *args, **kw):
+        self._harness.later.append((callback, args, kw))
+
+    def listen_to_dependencies(self, *args, **kw):
+        pass
+
+
+# ----------------------------------------------------------------------------------------------------- addresses
+class EthAddr(object):
+    __slots__ = ("_value",)
+
+    def __init__(self, addr):
+        if isinstance(addr, EthAddr):
+            self._value = addr._value
+        elif isinstance(addr, bytes):
+            self._value = addr
+        else:
+            self._value = bytes(int(part, 16) for part in str(addr).replace("-", ":").split(":"))
+
+    def toRaw(self):
+        return self._value
+
+    raw = property(toRaw)
+
+    def toStr(self, separator=":"):
+        return separator.join("%02x" % b for b in self._value)
+
+    def __str__(self):
+        return self.toStr()
+
+    __repr__ = __str__
+
+    def __eq__(self, other):
+        try:
+            return self._value == EthAddr(other)._value
+        except Exception:
+            return False
+
+    def __hash__(self):
+        return hash(self._value)
+
+    def is_multicast(self):
+        return bool(self._value[0] & 1)
+
+
+class IPAddr(object):
+    __slots__ = ("_value",)
+
+    def __init__(self, addr):
+        if isinstance(addr, IPAddr):
+            self._value = addr._value
+        elif isinstance(addr, bytes):
+            self._value = addr
+        elif isinstance(addr, int):
+            self._value = struct.pack("!I", addr)
+        else:
+            self._value = bytes(int(part) for part in str(addr).split("."))
+
+    def toRaw(self):
+        return self._value
+
+    raw = property(toRaw)
+
+    def toUnsigned(self):
+        return struct.unpack("!I", self._value)[0]
+
+    def toStr(self):
+        return ".".join(str(b) for b in self._value)
+
+    def __str__(self):
+        return self.toStr()
+
+    __repr__ = __str__
+
+    def __eq__(self, other):
+        try:
+            return self._value == IPAddr(other)._value
+        except Exception:
+            return False
+
+    def __hash__(self):
+        return hash(self._value)
+
+    def inNetwork(self, network, netmask=None):
+        if netmask is None:
+            network, bits = str(network).split("/")
+            netmask = int(bits)
+        mask = (0xffffffff << (32 - netmask)) & 0xffffffff
+        return (self.toUnsigned() & mask) == (IPAddr(network).toUnsigned() & mask)
+
+
+ETHER_BROADCAST = EthAddr(b"\xff" * 6)
+
+
+# ----------------------------------------------------------------------------------------------------- packets
+class _Packet(object):
+    def find(self, name):
+        packet = self
+        while packet is not None:
+            if packet.__class__.__name__ == name:
+                return packet
+            packet = getattr(packet, "next", None)
+            if not isinstance(packet, _Packet):
+                return None
+        return None
+
+
+class ethernet(_Packet):
+    IP_TYPE = 0x0800
+    ARP_TYPE = 0x0806
+    VLAN_TYPE = 0x8100
+    LLDP_TYPE = 0x88cc
+    IPV6_TYPE = 0x86dd
+
+    def __init__(self, raw=None, dst=None, src=None, type=0, payload=None):
+        self.next = payload
+        self.dst, self.src, self.type = dst, src, type
+        self.raw = raw
+        if raw is not None:
+            self.dst = EthAddr(raw[0:6])
+            self.src = EthAddr(raw[6:12])
+            self.type = (raw[12] << 8) | raw[13]
+            body = raw[14:]
+            if self.type == ethernet.ARP_TYPE:
+                self.next = arp(body)
+            elif self.type == ethernet.IP_TYPE:
+                self.next = ipv4(body)
+            else:
+                self.next = body
+        self.parsed = True
+
+    @property
+    def payload(self):
+        return self.next
+
+
+class arp(_Packet):
+    REQUEST = 1
+    REPLY = 2
+
+    def __init__(self, raw=None):
+        self.next = None
+        self.hwtype, self.prototype, self.hwlen, self.protolen, self.opcode = 1, 0x0800, 6, 4, 1
+        self.hwsrc = self.hwdst = self.protosrc = self.protodst = None
+        if raw is not None:
+            self.opcode = (raw[6] << 8) | raw[7]
+            self.hwsrc = EthAddr(raw[8:14])
+            self.protosrc = IPAddr(raw[14:18])
+            self.hwdst = EthAddr(raw[18:24])
+            self.protodst = IPAddr(raw[24:28])
+
+
+class ipv4(_Packet):
+    ICMP_PROTOCOL = 1
+    TCP_PROTOCOL = 6
+    UDP_PROTOCOL = 17
+
+    def __init__(self, raw=None):
+        self.next = None
+        if raw is not None:
+            ihl = (raw[0] & 0x0f) * 4
+            self.tos = raw[1]
+            self.iplen = (raw[2] << 8) | raw[3]
+            self.protocol = raw[9]
+            self.srcip = IPAddr(raw[12:16])
+            self.dstip = IPAddr(raw[16:20])
+            body = raw[ihl:]
+            if self.protocol == ipv4.ICMP_PROTOCOL:
+                self.next = icmp(body)
+            elif self.protocol == ipv4.TCP_PROTOCOL:
+                self.next = tcp(body)
+            elif self.protocol == ipv4.UDP_PROTOCOL:
+                self.next = udp(body)
+
+
+class icmp(_Packet):
+    def __init__(self, raw=None):
+        self.next = None
+        self.type, self.code = raw[0], raw[1]
+
+
+class tcp(_Packet):
+    def __init__(self, raw=None):
+        self.next = None
+        self.srcport, self.dstport = struct.unpack("!HH", raw[0:4])
+
+
+class udp(_Packet):
+    def __init__(self, raw=None):
+        self.next = None
+        self.srcport, self.dstport = struct.unpack("!HH", raw[0:4])
+
+
+def build_arp(src_mac, src_ip, dst_mac, dst_ip, opcode):
+    eth_dst = b"\xff" * 6 if opcode == arp.REQUEST else dst_mac
+    body = struct.pack("!HHBBH6s4s6s4s", 1, 0x0800, 6, 4, opcode, src_mac, src_ip,
+                       dst_mac if opcode == arp.REPLY else b"\x00" * 6, dst_ip)
+    return eth_dst + src_mac + b"\x08\x06" + body
+
+
+def build_ipv4(src_mac, dst_mac, src_ip, dst_ip, proto, sport=0, dport=0, size=64, seq=0):
+    if proto == ipv4.ICMP_PROTOCOL:
+        l4 = struct.pack("!BBHHH", 8, 0, 0, sport, seq)  # echo request, id = sport
+    else:
+        l4 = struct.pack("!HH", sport, dport) + b"\x00" * (16 if proto == ipv4.TCP_PROTOCOL else 4)
+    payload = b"\x00" * max(0, size - 20 - len(l4))
+    header = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(l4) + len(payload), 0, 0, 64, proto, 0, src_ip, dst_ip)
+    return dst_mac + src_mac + b"\x08\x00" + header + l4 + payload
+
+
+# ----------------------------------------------------------------------------------------------------- OpenFlow 1.0
+OFPT_PACKET_IN, OFPT_FLOW_REMOVED, OFPT_PORT_STATUS = 10, 11, 12
+OFPT_PACKET_OUT, OFPT_FLOW_MOD = 13, 14
+OFPT_STATS_REQUEST, OFPT_STATS_REPLY = 16, 17
+OFPT_BARRIER_REQUEST, OFPT_BARRIER_REPLY = 18, 19
+OFPT_QUEUE_GET_CONFIG_REQUEST = 20
+
+OFPFC_ADD, OFPFC_MODIFY, OFPFC_MODIFY_STRICT, OFPFC_DELETE, OFPFC_DELETE_STRICT = range(5)
+OFPFF_SEND_FLOW_REM, OFPFF_CHECK_OVERLAP, OFPFF_EMERG = 1, 2, 4
+OFPRR_IDLE_TIMEOUT, OFPRR_HARD_TIMEOUT, OFPRR_DELETE = range(3)
+OFPPR_ADD, OFPPR_DELETE, OFPPR_MODIFY = range(3)
+OFPP_MAX, OFPP_IN_PORT, OFPP_TABLE, OFPP_NORMAL, OFPP_FLOOD = 0xff00, 0xfff8, 0xfff9, 0xfffa, 0xfffb
+OFPP_ALL, OFPP_CONTROLLER, OFPP_LOCAL, OFPP_NONE = 0xfffc, 0xfffd, 0xfffe, 0xffff
+OFPPS_LINK_DOWN = 1
+OFPPC_PORT_DOWN = 1
+OFPST_FLOW, OFPST_AGGREGATE, OFPST_TABLE, OFPST_PORT, OFPST_QUEUE = 1, 2, 3, 4, 5
+OFPAT_OUTPUT, OFPAT_SET_NW_TOS, OFPAT_ENQUEUE = 0, 8, 11
+OFPQ_ALL = 0xffffffff
+NO_BUFFER = 0xffffffff
+OFPFW_ALL = (1 << 22) - 1
+
+_xids = [0]
+
+
+def _next_xid():
+    _xids[0] += 1
+    return _xids[0]
+
+
+_MATCH_FIELDS = ("in_port", "dl_src", "dl_dst", "dl_vlan", "dl_vlan_pcp", "dl_type", "nw_tos", "nw_proto",
+                 "nw_src", "nw_dst", "tp_src", "tp_dst")
+_WILDCARD_BITS = {"in_port": 1 << 0, "dl_vlan": 1 << 1, "dl_src": 1 << 2, "dl_dst": 1 << 3, "dl_type": 1 << 4,
+                  "nw_proto": 1 << 5, "tp_src": 1 << 6, "tp_dst": 1 << 7, "dl_vlan_pcp": 1 << 20,
+                  "nw_tos": 1 << 21}
+
+
+def _ip_prefix(value):
+    # "10.0.0.0/24" -> (IPAddr, 24)
+    if value is None:
+        return None
+    if isinstance(value, tuple):
+        return IPAddr(value[0]), value[1]
+    text = str(value)
+    if "/" in text:
+        address, bits = text.split("/")
+        return IPAddr(address), int(bits)
+    return IPAddr(value), 32
+
+
+class ofp_match(object):
+
+    def __init__(self, **kw):
+        for name in _MATCH_FIELDS:
+            setattr(self, name, None)
+        for name, value in kw.items():
+            setattr(self, name, value)
+
+    def __setattr__(self, name, value):
+        if value is not None:
+            if name in ("dl_src", "dl_dst"):
+                value = EthAddr(value)
+            elif name in ("nw_src", "nw_dst"):
+                value = _ip_prefix(value)
+                value = value if value[1] < 32 else value[0]
+        object.__setattr__(self, name, value)
+        object.__setattr__(self, "_tests", None)
+
+    @classmethod
+    def from_packet(cls, packet, in_port=None, spec_frags=False):
+        match = cls()
+        match.in_port = in_port
+        match.dl_src, match.dl_dst, match.dl_type = packet.src, packet.dst, packet.type
+        match.dl_vlan, match.dl_vlan_pcp = 0xffff, 0
+        p = packet.next
+        if isinstance(p, arp):
+            match.nw_proto = p.opcode
+            match.nw_src, match.nw_dst = p.protosrc, p.protodst
+        elif isinstance(p, ipv4):
+            match.nw_src, match.nw_dst, match.nw_proto, match.nw_tos = p.srcip, p.dstip, p.protocol, p.tos
+            l4 = p.next
+            if isinstance(l4, icmp):
+                match.tp_src, match.tp_dst = l4.type, l4.code
+            elif isinstance(l4, (tcp, udp)):
+                match.tp_src, match.tp_dst = l4.srcport, l4.dstport
+        return match
+
+    def clone(self):
+        other = ofp_match()
+        for name in _MATCH_FIELDS:
+            object.__setattr__(other, name, getattr(self, name))
+        return other
+
+    def key(self):
+        return tuple(str(getattr(self, name)) if getattr(self, name) is not None else None for name in _MATCH_FIELDS)
+
+    def __eq__(self, other):
+        return isinstance(other, ofp_match) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def is_exact(self):
+        return all(getattr(self, name) is not None for name in _MATCH_FIELDS)
+
+    def pack(self):
+        wildcards = 0
+        for name, bit in _WILDCARD_BITS.items():
+            if getattr(self, name) is None:
+                wildcards |= bit
+        nw_src, nw_dst = _ip_prefix(self.nw_src), _ip_prefix(self.nw_dst)
+        wildcards |= (32 - nw_src[1] if nw_src else 32) << 8
+        wildcards |= (32 - nw_dst[1] if nw_dst else 32) << 14
+        return struct.pack("!IH6s6sHBxHBBxx4s4sHH", wildcards, self.in_port or 0,
+                           EthAddr(self.dl_src).raw if self.dl_src is not None else b"\x00" * 6,
+                           EthAddr(self.dl_dst).raw if self.dl_dst is not None else b"\x00" * 6,
+                           self.dl_vlan or 0, self.dl_vlan_pcp or 0, self.dl_type or 0, self.nw_tos or 0,
+                           self.nw_proto or 0, nw_src[0].raw if nw_src else b"\x00" * 4,
+                           nw_dst[0].raw if nw_dst else b"\x00" * 4, self.tp_src or 0, self.tp_dst or 0)
+
+    @classmethod
+    def unpack(cls, raw):
+        (wildcards, in_port, dl_src, dl_dst, dl_vlan, dl_vlan_pcp, dl_type, nw_tos, nw_proto, nw_src, nw_dst,
+         tp_src, tp_dst) = struct.unpack("!IH6s6sHBxHBBxx4s4sHH", raw)
+        match = cls()
+        values = {"in_port": in_port, "dl_src": EthAddr(dl_src), "dl_dst": EthAddr(dl_dst), "dl_vlan": dl_vlan,
+                  "dl_vlan_pcp": dl_vlan_pcp, "dl_type": dl_type, "nw_tos": nw_tos, "nw_proto": nw_proto,
+                  "tp_src": tp_src, "tp_dst": tp_dst}
+        for name, bit in _WILDCARD_BITS.items():
+            if not wildcards & bit:
+                setattr(match, name, values[name])
+        src_bits = 32 - min((wildcards >> 8) & 0x3f, 32)
+        dst_bits = 32 - min((wildcards >> 14) & 0x3f, 32)
+        if src_bits:
+            match.nw_src = (IPAddr(nw_src), src_bits)
+        if dst_bits:
+            match.nw_dst = (IPAddr(nw_dst), dst_bits)
+        return match
+
+    def _compile(self):
+        # (field, value, prefix mask or None) for every matched field, compared with the raw packet fields
+        tests = []
+        for name in _MATCH_FIELDS:
+            value = getattr(self, name)
+            if value is None:
+                continue
+            if name in ("nw_src", "nw_dst"):
+                address, bits = _ip_prefix(value)
+                mask = (0xffffffff << (32 - bits)) & 0xffffffff
+                tests.append((name, address.toUnsigned() & mask, mask))
+            elif name in ("dl_src", "dl_dst"):
+                tests.append((name, value.raw, None))
+            else:
+                tests.append((name, value, None))
+        object.__setattr__(self, "_tests", tests)
+        return tests
+
+    def matches_fields(self, fields):
+        # fields: dict of the header fields of a packet (see _packet_fields)
+        for name, value, mask in self._tests or self._compile():
+            other = fields.get(name)
+            if mask is None:
+                if other != value:
+                    return False
+            elif other is None or int.from_bytes(other, "big") & mask != value:
+                return False
+        return True
+
+
+class ofp_header(object):
+    header_type = 0
+
+    def __init__(self, **kw):
+        self.xid = kw.pop("xid", None)
+        if self.xid is None:
+            self.xid = _next_xid()
+        for name, value in kw.items():
+            setattr(self, name, value)
+
+    def _header(self, length):
+        return struct.pack("!BBHI", 1, self.header_type, length, self.xid)
+
+    def pack(self):
+        return self._header(8)
+
+
+class ofp_action_output(object):
+    def __init__(self, port=None, max_len=0xffff):
+        self.port = port
+        self.max_len = max_len
+
+    def pack(self):
+        return struct.pack("!HHHH", OFPAT_OUTPUT, 8, self.port, self.max_len)
+
+
+class ofp_action_enqueue(object):
+    def __init__(self, port=None, queue_id=0):
+        self.port = port
+        self.queue_id = queue_id
+
+    def pack(self):
+        return struct.pack("!HHH6xI", OFPAT_ENQUEUE, 16, self.port, self.queue_id)
+
+
+class ofp_action_nw_tos(object):
+    port = None
+
+    def __init__(self, nw_tos=0):
+        self.nw_tos = nw_tos
+
+    def pack(self):
+        return struct.pack("!HHB3x", OFPAT_SET_NW_TOS, 8, self.nw_tos)
+
+
+def _unpack_actions(raw):
+    actions = []
+    offset = 0
+    while offset < len(raw):
+        kind, length = struct.unpack("!HH", raw[offset:offset + 4])
+        if kind == OFPAT_OUTPUT:
+            actions.append(ofp_action_output(port=struct.unpack("!H", raw[offset + 4:offset + 6])[0]))
+        elif kind == OFPAT_ENQUEUE:
+            port, queue_id = struct.unpack("!H6xI", raw[offset + 4:offset + 16])
+            actions.append(ofp_action_enqueue(port=port, queue_id=queue_id))
+        elif kind == OFPAT_SET_NW_TOS:
+            actions.append(ofp_action_nw_tos(nw_tos=raw[offset + 4]))
+        offset += length
+    return actions
+
+
+class ofp_flow_mod(ofp_header):
+    header_type = OFPT_FLOW_MOD
+
+    def __init__(self, **kw):
+        self.match = ofp_match()
+        self.cookie = 0
+        self.command = OFPFC_ADD
+        self.idle_timeout = 0
+        self.hard_timeout = 0
+        self.priority = 0x8000
+        self.buffer_id = None
+        self.out_port = OFPP_NONE
+        self.flags = 0
+        self.actions = []
+        self.data = None
+        ofp_header.__init__(self, **kw)
+        if isinstance(self.data, ofp_packet_in):
+            self.buffer_id = self.data.buffer_id
+            if self.match is None or self.match == ofp_match():
+                pass
+
+    def pack(self):
+        actions = b"".join(action.pack() for action in self.actions)
+        buffer_id = NO_BUFFER if self.buffer_id is None else self.buffer_id
+        body = (self.match.pack() + struct.pack("!QHHHHIHH", self.cookie, self.command, self.idle_timeout,
+                                                self.hard_timeout, self.priority, buffer_id, self.out_port,
+                                                self.flags) + actions)
+        return self._header(8 + len(body)) + body
+
+
+class ofp_packet_out(ofp_header):
+    header_type = OFPT_PACKET_OUT
+
+    def __init__(self, **kw):
+        self.buffer_id = None
+        self.in_port = OFPP_NONE
+        self.actions = []
+        self._data = b""
+        data = kw.pop("data", None)
+        ofp_header.__init__(self, **kw)
+        if data is not None:
+            self.data = data
+
+    def _get_data(self):
+        return self._data
+
+    def _set_data(self, data):
+        if isinstance(data, ofp_packet_in):
+            if data.buffer_id is not None and data.buffer_id != NO_BUFFER:
+                self.buffer_id = data.buffer_id
+                self._data = b""
+            else:
+                self._data = data.data
+            if self.in_port == OFPP_NONE:
+                self.in_port = data.in_port
+        elif isinstance(data, _Packet):
+            self._data = data.raw
+        else:
+            self._data = data or b""
+
+    data = property(_get_data, _set_data)
+
+    def pack(self):
+        actions = b"".join(action.pack() for action in self.actions)
+        buffer_id = NO_BUFFER if self.buffer_id is None else self.buffer_id
+        body = struct.pack("!IHH", buffer_id, self.in_port, len(actions)) + actions
+        data = self._data if buffer_id == NO_BUFFER else b""
+        return self._header(8 + len(body) + len(data)) + body + data
+
+
+class ofp_barrier_request(ofp_header):
+    header_type = OFPT_BARRIER_REQUEST
+
+
+class ofp_port_stats_request(object):
+    stats_type = OFPST_PORT
+
+    def __init__(self, port_no=OFPP_NONE):
+        self.port_no = port_no
+
+    def pack(self):
+        return struct.pack("!H6x", self.port_no)
+
+
+class ofp_flow_stats_request(object):
+    stats_type = OFPST_FLOW
+
+    def __init__(self, match=None, table_id=0xff, out_port=OFPP_NONE):
+        self.match = match if match is not None else ofp_match()
+        self.table_id = table_id
+        self.out_port = out_port
+
+    def pack(self):
+        return self.match.pack() + struct.pack("!BxH", self.table_id, self.out_port)
+
+
+class ofp_queue_stats_request(object):
+    stats_type = OFPST_QUEUE
+
+    def __init__(self, port_no=OFPP_ALL, queue_id=OFPQ_ALL):
+        self.port_no = port_no
+        self.queue_id = queue_id
+
+    def pack(self):
+        return struct.pack("!H2xI", self.port_no, self.queue_id)
+
+
+class ofp_stats_request(ofp_header):
+    header_type = OFPT_STATS_REQUEST
+
+    def __init__(self, **kw):
+        self.body = None
+        self.flags = 0
+        ofp_header.__init__(self, **kw)
+        self.type = self.body.stats_type if self.body is not None else OFPST_PORT
+
+    def pack(self):
+        body = struct.pack("!HH", self.type, self.flags) + (self.body.pack() if self.body is not None else b"")
+        return self._header(8 + len(body)) + body
+
+
+class ofp_packet_in(ofp_header):
+    header_type = OFPT_PACKET_IN
+
+    def __init__(self, **kw):
+        self.buffer_id = None
+        self.total_len = 0
+        self.in_port = 0
+        self.reason = 0
+        self.data = b""
+        ofp_header.__init__(self, **kw)
+
+
+class ofp_phy_port(object):
+    def __init__(self, port_no, name, hw_addr=None, config=0, state=0):
+        self.port_no = port_no
+        self.name = name
+        self.hw_addr = hw_addr
+        self.config = config
+        self.state = state
+
+
+class ofp_port_stats(object):
+    __slots__ = ("port_no", "rx_packets", "tx_packets", "rx_bytes", "tx_bytes", "rx_dropped", "tx_dropped",
+                 "rx_errors", "tx_errors", "rx_frame_err", "rx_over_err", "rx_crc_err", "collisions")
+
+    def __init__(self, port_no):
+        self.port_no = port_no
+        for name in self.__slots__[1:]:
+            setattr(self, name, 0)
+
+
+class ofp_flow_stats(object):
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class ofp_queue_stats(object):
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+class ofp_flow_removed(ofp_header):
+    header_type = OFPT_FLOW_REMOVED
+
+
+class ofp_port_status(ofp_header):
+    header_type = OFPT_PORT_STATUS
+
+
+def _dpid_to_str(dpid, alwaysLong=False):
+    text = "%016x" % dpid
+    return "-".join(text[i:i + 2] for i in range(4, 16, 2))
+
+
+class _Link(object):
+    def __init__(self, dpid1, port1, dpid2, port2):
+        self.dpid1, self.port1, self.dpid2, self.port2 = dpid1, port1, dpid2, port2
+
+
+class _Event(object):
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+        self.halt = False
+
+
+def install_fake_pox(harness):
+    """ Register the stand-in POX modules in sys.modules (replacing nothing if POX is really installed). """
+    core = _Core(harness)
+
+    def module(name, **attrs):
+        mod = types.ModuleType(name)
+        mod.__dict__.update(attrs)
+        sys.modules[name] = mod
+        return mod
+
+    of_names = dict((name, value) for name, value in globals().items()
+                    if name.startswith(("ofp_", "OFP", "NO_BUFFER")))
+    of_module = module("pox.openflow.libopenflow_01", **of_names)
+    packet_module = module("pox.lib.packet", ethernet=ethernet, arp=arp, ipv4=ipv4, icmp=icmp, tcp=tcp, udp=udp,
+                           ETHER_BROADCAST=ETHER_BROADCAST, ETHERNET=types.SimpleNamespace(
+                               NDP_MULTICAST=EthAddr("01:23:20:00:00:01")))
+
+    def discovery_launch(*args, **kw):
+        core.register("openflow_discovery", _EventSource(harness, "openflow_discovery"))
+
+    module("pox", core=None)
+    module("pox.core", core=core)
+    module("pox.openflow", libopenflow_01=of_module)
+    module("pox.openflow.discovery", launch=discovery_launch)
+    module("pox.lib", packet=packet_module)
+    module("pox.lib.util", dpidToStr=_dpid_to_str, dpid_to_str=_dpid_to_str)
+    module("pox.lib.addresses", IPAddr=IPAddr, EthAddr=EthAddr)
+    module("pox.lib.packet.arp", arp=arp)
+    module("pox.lib.packet.ethernet", ethernet=ethernet, ETHER_BROADCAST=ETHER_BROADCAST)
+    module("pox.lib.packet.ipv4", ipv4=ipv4)
+    module("pox.lib.packet.packet_base", packet_base=_Packet)
+    module("pox.lib.packet.packet_utils", __all__=[])
+    module("pox.lib.recoco", Timer=_Timer)
+    sys.modules["pox"].core = sys.modules["pox.core"]
+    sys.modules["pox"].openflow = sys.modules["pox.openflow"]
+    sys.modules["pox"].lib = sys.modules["pox.lib"]
+    sys.modules["pox.openflow"].discovery = sys.modules["pox.openflow.discovery"]
+    return core
+
+
+# =====================================================================================================
+# Data plane model
+# =====================================================================================================
+
+def _packet_fields(frame, in_port):
+    """ Header fields of a frame as used for flow table lookups. """
+    fields = {"in_port": in_port, "dl_dst": frame[0:6], "dl_src": frame[6:12],
+              "dl_type": (frame[12] << 8) | frame[13], "dl_vlan": 0xffff, "dl_vlan_pcp": 0}
+    if fields["dl_type"] == ethernet.IP_TYPE:
+        ihl = (frame[14] & 0x0f) * 4
+        proto = frame[23]
+        fields.update(nw_tos=frame[15], nw_proto=proto, nw_src=frame[26:30], nw_dst=frame[30:34])
+        l4 = 14 + ihl
+        if proto == ipv4.ICMP_PROTOCOL:
+            fields.update(tp_src=frame[l4], tp_dst=frame[l4 + 1])
+        elif proto in (ipv4.TCP_PROTOCOL, ipv4.UDP_PROTOCOL):
+            fields.update(tp_src=(frame[l4] << 8) | frame[l4 + 1], tp_dst=(frame[l4 + 2] << 8) | frame[l4 + 3])
+        else:
+            fields.update(tp_src=0, tp_dst=0)
+    elif fields["dl_type"] == ethernet.ARP_TYPE:
+        fields.update(nw_proto=(frame[20] << 8) | frame[21], nw_src=frame[28:32], nw_dst=frame[38:42],
+                      nw_tos=0, tp_src=0, tp_dst=0)
+    return fields
+
+
+def _exact_key(fields):
+    return tuple(map(fields.get, _MATCH_FIELDS))
+
+
+class FlowEntry(object):
+    __slots__ = ("match", "priority", "actions", "idle_timeout", "hard_timeout", "flags", "cookie", "installed",
+                 "last_used", "packets", "bytes", "exact_key")
+
+    def __init__(self, msg, now):
+        self.match = msg.match
+        self.priority = msg.priority
+        self.actions = msg.actions
+        self.idle_timeout = msg.idle_timeout
+        self.hard_timeout = msg.hard_timeout
+        self.flags = msg.flags
+        self.cookie = msg.cookie
+        self.installed = now
+        self.last_used = now
+        self.packets = 0
+        self.bytes = 0
+        self.exact_key = None
+        if msg.match.is_exact() and not isinstance(msg.match.nw_src, tuple) and not isinstance(msg.match.nw_dst, tuple):
+            self.exact_key = tuple(_exact_value(name, getattr(msg.match, name)) for name in _MATCH_FIELDS)
+
+
+def _exact_value(name, value):
+    if isinstance(value, (EthAddr, IPAddr)):
+        return value.raw
+    return value
+
+
+class FakeSwitch(object):
+    """ A switch with a flow table (exact-match entries first, then wildcard entries by priority) and port counters. """
+
+    def __init__(self, harness, dpid, name, ports, buffers=True, table_size=None):
+        self.harness = harness
+        self.dpid = dpid
+        self.name = name
+        self.ports = dict((port, ofp_port_stats(port)) for port in ports)
+        self.queues = {}  # (port, queue id) -> [tx_bytes, tx_packets, tx_errors]
+        self.peers = {}  # port -> (switch, port) or Host
+        self.exact = {}
+        self.wildcard = []
+        self.buffers = buffers
+        self.buffered = collections.OrderedDict()
+        self.next_buffer = 0
+        self.table_size = table_size
+        self.connection = None
+        self.lookups = 0
+        self.misses = 0
+
+    def features(self):
+        ports = [ofp_phy_port(port, "%s-eth%d" % (self.name, port)) for port in sorted(self.ports)]
+        ports.append(ofp_phy_port(OFPP_LOCAL, self.name))
+        return types.SimpleNamespace(ports=ports, datapath_id=self.dpid)
+
+    def flow_count(self):
+        return len(self.exact) + len(self.wildcard)
+
+    # ------------------------------------------------------------------ flow table
+    def _expired(self, entry, now):
+        if entry.idle_timeout and now - entry.last_used >= entry.idle_timeout:
+            return OFPRR_IDLE_TIMEOUT
+        if entry.hard_timeout and now - entry.installed >= entry.hard_timeout:
+            return OFPRR_HARD_TIMEOUT
+        return None
+
+    def _remove(self, entry, reason):
+        if entry.exact_key is not None:
+            self.exact.pop(entry.exact_key, None)
+        else:
+            self.wildcard.remove(entry)
+        if entry.flags & OFPFF_SEND_FLOW_REM:
+            self.harness.flow_removed(self, entry, reason)
+
+    def expire(self, now):
+        for entry in list(self.exact.values()) + list(self.wildcard):
+            reason = self._expired(entry, now)
+            if reason is not None:
+                self._remove(entry, reason)
+
+    def lookup(self, fields, now):
+        self.lookups += 1
+        entry = self.exact.get(_exact_key(fields))
+        if entry is not None:
+            reason = self._expired(entry, now)
+            if reason is None:
+                return entry
+            self._remove(entry, reason)
+        for entry in self.wildcard:
+            if entry.match.matches_fields(fields):
+                reason = self._expired(entry, now)
+                if reason is None:
+                    return entry
+                self._remove(entry, reason)
+                return self.lookup(fields, now)
+        return None
+
+    def flow_mod(self, msg, now):
+        if msg.command == OFPFC_ADD:
+            if self.table_size is not None and self.flow_count() >= self.table_size:
+                self.harness.counters["table_full"] += 1
+                return
+            entry = FlowEntry(msg, now)
+            if entry.exact_key is not None:
+                self.exact[entry.exact_key] = entry
+            else:
+                self.wildcard = [e for e in self.wildcard if not (e.priority == entry.priority and e.match == entry.match)]
+                self.wildcard.append(entry)
+                self.wildcard.sort(key=lambda e: -e.priority)
+        else:
+            strict = msg.command in (OFPFC_MODIFY_STRICT, OFPFC_DELETE_STRICT)
+            selected = []
+            for entry in list(self.exact.values()) + list(self.wildcard):
+                if strict:
+                    if entry.match == msg.match and entry.priority == msg.priority:
+                        selected.append(entry)
+                elif _covers(msg.match, entry.match):
+                    selected.append(entry)
+            if msg.command in (OFPFC_MODIFY, OFPFC_MODIFY_STRICT):
+                for entry in selected:
+                    entry.actions = msg.actions
+                if not selected:
+                    self.flow_mod(ofp_flow_mod(match=msg.match, priority=msg.priority, actions=msg.actions,
+                                               idle_timeout=msg.idle_timeout, hard_timeout=msg.hard_timeout,
+                                               flags=msg.flags, cookie=msg.cookie, xid=msg.xid), now)
+            else:
+                for entry in selected:
+                    self._remove(entry, OFPRR_DELETE)
+        if msg.buffer_id not in (None, NO_BUFFER):
+            frame, in_port = self.buffered.pop(msg.buffer_id, (None, None))
+            if frame is not None:
+                self.receive(in_port, frame, now)
+
+    # ------------------------------------------------------------------ forwarding
+    def receive(self, in_port, frame, now, fields=None):
+        stats = self.ports.get(in_port)
+        if stats is not None:
+            stats.rx_packets += 1
+            stats.rx_bytes += len(frame)
+        if fields is None:
+            fields = _packet_fields(frame, in_port)
+        else:
+            fields["in_port"] = in_port
+        entry = self.lookup(fields, now)
+        if entry is None:
+            self.misses += 1
+            self.harness.packet_in(self, in_port, frame)
+            return
+        entry.last_used = now
+        entry.packets += 1
+        entry.bytes += len(frame)
+        self.apply(entry.actions, in_port, frame, now)
+
+    def apply(self, actions, in_port, frame, now):
+        for action in actions:
+            port = action.port
+            if isinstance(action, ofp_action_nw_tos):
+                frame = frame[:15] + bytes((action.nw_tos,)) + frame[16:]
+            elif isinstance(action, ofp_action_enqueue):
+                counters = self.queues.setdefault((port, action.queue_id), [0, 0, 0])
+                counters[0] += len(frame)
+                counters[1] += 1
+                self.transmit(port, frame, now)
+            elif port == OFPP_CONTROLLER:
+                self.harness.packet_in(self, in_port, frame)
+            elif port in (OFPP_FLOOD, OFPP_ALL):
+                for out in self.ports:
+                    if out != in_port:
+                        self.transmit(out, frame, now)
+            elif port == OFPP_IN_PORT:
+                self.transmit(in_port, frame, now)
+            else:
+                self.transmit(port, frame, now)
+
+    def transmit(self, port, frame, now):
+        stats = self.ports.get(port)
+        if stats is None:
+            return
+        stats.tx_packets += 1
+        stats.tx_bytes += len(frame)
+        self.harness.deliver(self, port, frame, now)
+
+    def buffer(self, in_port, frame):
+        if not self.buffers:
+            return None
+        self.next_buffer = (self.next_buffer + 1) & 0xffffff
+        self.buffered[self.next_buffer] = (frame, in_port)
+        if len(self.buffered) > 256:
+            self.buffered.popitem(last=False)
+        return self.next_buffer
+
+
+def _covers(wide, narrow):
+    # True if every packet matched by `narrow` is matched by `wide` (non-strict flow_mod semantics)
+    for name in _MATCH_FIELDS:
+        value = getattr(wide, name)
+        if value is None:
+            continue
+        other = getattr(narrow, name)
+        if other is None:
+            return False
+        if name in ("nw_src", "nw_dst"):
+            address, bits = _ip_prefix(value)
+            other_address, other_bits = _ip_prefix(other)
+            if other_bits < bits or not other_address.inNetwork(address, bits):
+                return False
+        elif str(value) != str(other):
+            return False
+    return True
+
+
+class FakeConnection(object):
+    """ Control channel of a FakeSwitch: decodes what the controller sends and applies it to the switch. """
+
+    def __init__(self, harness, switch):
+        self.harness = harness
+        self.switch = switch
+        self.dpid = switch.dpid
+        self.features = switch.features()
+        self.ports = dict((port.port_no, port) for port in self.features.ports)
+        self.connect_time = harness.clock.now
+
+    def send(self, data):
+        # the switch handles the messages after the controller handler returns, as a real switch would
+        if not isinstance(data, (bytes, bytearray)):
+            data = data.pack()
+        self.harness.channel(self, data)
+        self.harness.outbox.append((self, data))
+
+    def receive(self, data):
+        offset = 0
+        while offset + 8 <= len(data):
+            version, kind, length, xid = struct.unpack("!BBHI", data[offset:offset + 8])
+            self.harness.handle_message(self, kind, xid, data[offset:offset + length])
+            offset += length
+
+    def disconnect(self):
+        self.harness.disconnect(self.switch)
+
+
+class Host(object):
+    def __init__(self, name, ip, mac):
+        self.name = name
+        self.ip = IPAddr(ip)
+        self.mac = EthAddr(mac)
+        self.switch = None
+        self.port = None
+        self.received = 0
+        self.received_bytes = 0
+
+
+# =====================================================================================================
+# Harness
+# =====================================================================================================
+
+def diamond_topology(paths=3, hosts_per_edge=3):
+    """
+    The diamond of routing_net.py generalised to `paths` parallel paths: s1 (left edge) and s{paths+2} (right edge)
+    connected through s2..s{paths+1}; returns (switches, links, hosts) with the port numbering of Mininet.
+    """
+    left, right = 1, paths + 2
+    switches = {}
+    links = []
+    hosts = []
+    ports = collections.defaultdict(int)
+
+    def port(dpid):
+        ports[dpid] += 1
+        return ports[dpid]
+
+    for i in range(hosts_per_edge):
+        hosts.append(("h%d" % (i + 1), left, port(left)))
+    for middle in range(2, paths + 2):
+        links.append((left, port(left), middle, port(middle)))
+    for middle in range(2, paths + 2):
+        links.append((middle, port(middle), right, port(right)))
+    for i in range(hosts_per_edge):
+        hosts.append(("h%d" % (hosts_per_edge + i + 1), right, port(right)))
+    for dpid in range(1, paths + 3):
+        switches[dpid] = ("s%d" % dpid, list(range(1, ports[dpid] + 1)))
+    return switches, links, hosts
+
+
+def manifest_topology(path):
+    """ (switches, links, hosts) of a network manifest written by routing_net.py --manifest. """
+    with open(path) as f:
+        manifest = json.load(f)
+    dpids = dict((switch["name"], switch["dpid"]) for switch in manifest["switches"])
+    ports = collections.defaultdict(list)
+    links = []
+    for link in manifest["links"]:
+        links.append((dpids[link["src"]], link["src_port"], dpids[link["dst"]], link["dst_port"]))
+        ports[link["src"]].append(link["src_port"])
+        ports[link["dst"]].append(link["dst_port"])
+    hosts = []
+    for host in manifest["hosts"]:
+        hosts.append((host["name"], dpids[host["switch"]], host["port"]))
+        ports[host["switch"]].append(host["port"])
+    switches = dict((dpid, (name, sorted(ports[name]))) for name, dpid in dpids.items())
+    return switches, links, hosts
+
+
+class HandlerStats(object):
+    def __init__(self):
+        self.samples = array.array("d")
+        self.calls = 0
+
+    def percentiles(self):
+        if not self.samples:
+            return {}
+        ordered = sorted(self.samples)
+        n = len(ordered)
+
+        def pick(q):
+            return ordered[min(n - 1, int(q * n))] * 1e6
+
+        return {"calls": self.calls, "mean_us": sum(ordered) / n * 1e6, "p50_us": pick(0.5), "p90_us": pick(0.9),
+                "p99_us": pick(0.99), "p999_us": pick(0.999), "max_us": ordered[-1] * 1e6}
+
+
+class LinkLoad(object):
+    """
+    Utilization of the links between switches per `interval` seconds of the trace, from the bytes sent on their
+    ports. The model does not limit the rates, so the bytes above the capacity of a link in an interval are
+    counted as excess: what a real link would have queued or dropped.
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.start = None
+        self.last = {}  # (switch, port) -> tx_bytes at the start of the interval
+        self.peaks = []  # utilization of the busiest link of every interval
+        self.excess = 0
+
+    def sample(self, harness, now):
+        if self.start is None:
+            self.start = now
+            self.last = self._counters(harness)
+            return
+        while now - self.start >= self.interval:
+            self.start += self.interval
+            counters = self._counters(harness)
+            peak = 0.0
+            for (switch, port_no), tx_bytes in counters.items():
+                sent = tx_bytes - self.last.get((switch, port_no), tx_bytes)
+                capacity = harness.controller._link_bw(switch.dpid, port_no) / 8.0 * self.interval
+                peak = max(peak, sent / capacity)
+                self.excess += max(sent - capacity, 0)
+            self.last = counters
+            self.peaks.append(peak)
+
+    def _counters(self, harness):
+        topology = harness.controller.topology
+        return dict(((switch, port_no), port.tx_bytes) for switch in harness.switches.values()
+                    for port_no, port in switch.ports.items() if topology.is_link_port(switch.dpid, port_no))
+
+    def report(self):
+        if not self.peaks:
+            return {}
+        peaks = sorted(self.peaks)
+        return {"intervals": len(peaks), "peak": round(peaks[-1], 3),
+                "p95_peak": round(peaks[min(len(peaks) - 1, int(0.95 * len(peaks)))], 3),
+                "mean_peak": round(sum(peaks) / len(peaks), 3),
+                "saturated": sum(1 for peak in peaks if peak > 1.0), "excess_bytes": self.excess}
+
+
+# switches a packet may cross before it is counted as looping
+MAX_HOPS = 64
+
+# seconds after a restart of the controller until openflow.discovery reports the links again (LLDP rounds)
+DISCOVERY_DELAY = 2.0
+
+
+class Timeline(object):
+    """ Counters of the harness (packet_in, flow_mod, packets sent and delivered) per `interval` seconds of the trace. """
+
+    FIELDS = ("packet_in", "flow_mod", "sent", "delivered")
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.start = None
+        self.last = None
+        self.rows = []  # (start of the interval, {field: count})
+
+    def sample(self, harness, now):
+        if self.start is None:
+            self.mark(harness, now)
+        while now - self.start >= self.interval:
+            self._close(harness, self.start + self.interval)
+
+    def mark(self, harness, now):
+        # an interval starts now (e.g. at a restart); the one in progress is closed short
+        if self.start is not None and now > self.start:
+            self._close(harness, now)
+        self.start = now
+        self.last = [harness.counters[field] for field in self.FIELDS]
+
+    def _close(self, harness, end):
+        counters = [harness.counters[field] for field in self.FIELDS]
+        self.rows.append((self.start, dict(zip(self.FIELDS, [now - last for now, last in zip(counters, self.last)]))))
+        self.start, self.last = end, counters
+
+    def after(self, at, window=10, before=5):
+        """
+        The `window` intervals from time `at` (a restart) compared with the `before` intervals up to it: packet_in,
+        flow_mod and packets lost in them, and the seconds until the first interval with no more packet_in than
+        the busiest interval before.
+        """
+        previous = [row for t, row in self.rows if t < at][-before:]
+        following = [row for t, row in self.rows if t >= at]
+        if not previous or not following:
+            return {}
+        normal = max(row["packet_in"] for row in previous)
+        settled = None
+        for i, row in enumerate(following):
+            if row["packet_in"] <= normal:
+                settled = i * self.interval
+                break
+        rows = following[:window]
+        return {"packet_in_per_s_before": round(sum(row["packet_in"] for row in previous) /
+                                                (len(previous) * self.interval), 1),
+                "packet_in_first_s": following[0]["packet_in"],
+                "packet_in": sum(row["packet_in"] for row in rows),
+                "flow_mod": sum(row["flow_mod"] for row in rows),
+                "lost": sum(row["sent"] - row["delivered"] for row in rows),
+                "window_s": len(rows) * self.interval, "settled_s": settled}
+
+
+class Harness(object):
+    current = None
+
+    def __init__(self, controller="routing_controller", buffers=True, table_size=None, seed=1, **launch_args):
+        Harness.current = self
+        self.clock = Clock()
+        self.log = _Log()
+        self.random = random.Random(seed)
+        random.seed(seed)
+        self.timers = []
+        self.timer_seq = 0
+        self.queue = collections.deque()
+        self.outbox = collections.deque()
+        self.later = []
+        self.handlers = collections.defaultdict(HandlerStats)
+        self.counters = collections.Counter()
+        self.switches = {}
+        self.hosts = {}
+        self.buffers = buffers
+        self.table_size = table_size
+        self.link_load = LinkLoad()
+        self.timeline = Timeline()
+        self.restarts = []  # times of the restarts of the controller
+        self.depth = 0  # switches crossed by the packet being forwarded
+        self.controller_name = controller
+        self.launch_args = launch_args
+        self.start_controller()
+
+    def start_controller(self):
+        self.core = install_fake_pox(self)
+        self.controller = __import__(self.controller_name)
+        for name, mod in list(sys.modules.items()):
+            if name.startswith("routing_") and getattr(mod, "time", None) is _time:
+                mod.time = self.clock
+        self.controller.launch(**self.launch_args)
+
+    # ------------------------------------------------------------------ instrumentation
+    def instrument(self, event_name, handler):
+        stats = self.handlers[event_name]
+        perf_counter = _time.perf_counter
+
+        def timed(event):
+            start = perf_counter()
+            handler(event)
+            stats.samples.append(perf_counter() - start)
+            stats.calls += 1
+        return timed
+
+    def channel(self, connection, data):
+        self.counters["channel_bytes"] += len(data)
+        self.counters["channel_writes"] += 1
+
+    # ------------------------------------------------------------------ timers
+    def schedule(self, timer, when):
+        self.timer_seq += 1
+        heapq.heappush(self.timers, (when, self.timer_seq, timer))
+
+    def run_timers(self):
+        while self.timers and self.timers[0][0] <= self.clock.now:
+            when, seq, timer = heapq.heappop(self.timers)
+            if timer.cancelled:
+                continue
+            stats = self.handlers["Timer"]
+            start = _time.perf_counter()
+            result = timer.callback(*timer.args, **timer.kw)
+            stats.samples.append(_time.perf_counter() - start)
+            stats.calls += 1
+            if timer.recurring and result is not False:
+                self.schedule(timer, when + timer.interval)
+            self.drain()
+
+    def advance(self, now):
+        if now > self.clock.now:
+            self.clock.now = now
+        self.run_timers()
+
+    # ------------------------------------------------------------------ controller events
+    def post(self, source, name, event):
+        self.queue.append((source, name, event))
+
+    def drain(self):
+        while self.queue or self.later or self.outbox:
+            while self.outbox:
+                connection, data = self.outbox.popleft()
+                connection.receive(data)
+            while self.queue:
+                source, name, event = self.queue.popleft()
+                self.counters["events"] += 1
+                self.counters["event." + name] += 1
+                source.raiseEvent(name, event)
+            later, self.later = self.later, []
+            for callback, args, kw in later:
+                callback(*args, **kw)
+
+    def packet_in(self, switch, in_port, frame):
+        connection = switch.connection
+        if connection is None:
+            return
+        buffer_id = switch.buffer(in_port, frame)
+        data = frame if buffer_id is None else frame[:128]
+        ofp = ofp_packet_in(buffer_id=buffer_id, total_len=len(frame), in_port=in_port, data=data, reason=0)
+        self.counters["packet_in"] += 1
+        self.counters["channel_bytes_in"] += 18 + len(data)
+        event = _Event(connection=connection, dpid=switch.dpid, port=in_port, ofp=ofp, data=data)
+        event.__class__ = _PacketInEvent
+        self.post(self.core.openflow, "PacketIn", event)
+
+    def flow_removed(self, switch, entry, reason):
+        if switch.connection is None:
+            return
+        ofp = ofp_flow_removed(match=entry.match, cookie=entry.cookie, priority=entry.priority, reason=reason,
+                               duration_sec=int(self.clock.now - entry.installed),
+                               duration_nsec=int((self.clock.now - entry.installed) % 1 * 1e9),
+                               idle_timeout=entry.idle_timeout, packet_count=entry.packets, byte_count=entry.bytes)
+        event = _Event(connection=switch.connection, dpid=switch.dpid, ofp=ofp,
+                       idleTimeout=reason == OFPRR_IDLE_TIMEOUT, hardTimeout=reason == OFPRR_HARD_TIMEOUT,
+                       deleted=reason == OFPRR_DELETE, timeout=reason != OFPRR_DELETE)
+        self.counters["flow_removed"] += 1
+        self.post(self.core.openflow, "FlowRemoved", event)
+
+    def handle_message(self, connection, kind, xid, raw):
+        switch = connection.switch
+        now = self.clock.now
+        self.counters["msg.%d" % kind] += 1
+        self.counters["messages"] += 1
+        if kind == OFPT_FLOW_MOD:
+            self.counters["flow_mod"] += 1
+            match = ofp_match.unpack(raw[8:48])
+            cookie, command, idle, hard, priority, buffer_id, out_port, flags = struct.unpack("!QHHHHIHH", raw[48:72])
+            msg = ofp_flow_mod(xid=xid, match=match, cookie=cookie, command=command, idle_timeout=idle,
+                               hard_timeout=hard, priority=priority, buffer_id=buffer_id, out_port=out_port,
+                               flags=flags, actions=_unpack_actions(raw[72:]))
+            switch.flow_mod(msg, now)
+        elif kind == OFPT_PACKET_OUT:
+            self.counters["packet_out"] += 1
+            buffer_id, in_port, actions_len = struct.unpack("!IHH", raw[8:16])
+            actions = _unpack_actions(raw[16:16 + actions_len])
+            frame = raw[16 + actions_len:]
+            if buffer_id != NO_BUFFER:
+                frame, buffered_port = switch.buffered.pop(buffer_id, (None, None))
+                if frame is None:
+                    self.counters["bad_buffer"] += 1
+                    return
+            switch.apply(actions, in_port, frame, now)
+        elif kind == OFPT_BARRIER_REQUEST:
+            self.post(self.core.openflow, "BarrierIn", _Event(connection=connection, dpid=switch.dpid, xid=xid,
+                                                              ofp=ofp_header(xid=xid)))
+        elif kind == OFPT_STATS_REQUEST:
+            stats_type = struct.unpack("!H", raw[8:10])[0]
+            self.stats_reply(connection, stats_type, xid, raw[12:])
+
+    def stats_reply(self, connection, stats_type, xid, body):
+        switch = connection.switch
+        ofp = [ofp_header(xid=xid)]
+        if stats_type == OFPST_PORT:
+            stats = []
+            for port in switch.ports.values():
+                copy = ofp_port_stats(port.port_no)
+                for name in ofp_port_stats.__slots__[1:]:
+                    setattr(copy, name, getattr(port, name))
+                stats.append(copy)
+            self.post(self.core.openflow, "PortStatsReceived",
+                      _Event(connection=connection, dpid=switch.dpid, stats=stats, ofp=ofp))
+        elif stats_type == OFPST_FLOW:
+            now = self.clock.now
+            stats = [ofp_flow_stats(match=entry.match, priority=entry.priority, cookie=entry.cookie,
+                                    actions=entry.actions, idle_timeout=entry.idle_timeout,
+                                    hard_timeout=entry.hard_timeout, duration_sec=int(now - entry.installed),
+                                    packet_count=entry.packets, byte_count=entry.bytes)
+                     for entry in list(switch.exact.values()) + switch.wildcard]
+            self.post(self.core.openflow, "FlowStatsReceived",
+                      _Event(connection=connection, dpid=switch.dpid, stats=stats, ofp=ofp))
+        elif stats_type == OFPST_QUEUE:
+            stats = [ofp_queue_stats(port_no=port, queue_id=queue_id, tx_bytes=counters[0], tx_packets=counters[1],
+                                     tx_errors=counters[2])
+                     for (port, queue_id), counters in sorted(switch.queues.items())]
+            self.post(self.core.openflow, "QueueStatsReceived",
+                      _Event(connection=connection, dpid=switch.dpid, stats=stats, ofp=ofp))
+
+    # ------------------------------------------------------------------ topology
+    def build(self, switches, links, hosts):
+        for dpid, (name, ports) in sorted(switches.items()):
+            self.switches[dpid] = FakeSwitch(self, dpid, name, ports, self.buffers, self.table_size)
+        for dpid1, port1, dpid2, port2 in links:
+            self.switches[dpid1].peers[port1] = (self.switches[dpid2], port2)
+            self.switches[dpid2].peers[port2] = (self.switches[dpid1], port1)
+        for index, (name, dpid, port) in enumerate(hosts):
+            # the addressing of routing_net.py: host i is 10.0.0.i / 00:00:00:00:00:i, counting on in the higher bytes
+            n = index + 1
+            host = Host(name, "10.%d.%d.%d" % ((n >> 16) & 0xff, (n >> 8) & 0xff, n & 0xff),
+                        "00:00:00:%02x:%02x:%02x" % ((n >> 16) & 0xff, (n >> 8) & 0xff, n & 0xff))
+            host.switch, host.port = self.switches[dpid], port
+            self.switches[dpid].peers[port] = host
+            self.hosts[name] = host
+        self.links = links
+        self.down = set()  # (switch, port) of the links set down
+
+    def connect_all(self):
+        for switch in self.switches.values():
+            self.connect(switch)
+        self.drain()
+        self.discover()
+
+    def discover(self):
+        # openflow.discovery would report every link that is up in both directions after a few LLDP rounds
+        for dpid1, port1, dpid2, port2 in self.links:
+            if (self.switches[dpid1], port1) in self.down:
+                continue
+            for link in (_Link(dpid1, port1, dpid2, port2), _Link(dpid2, port2, dpid1, port1)):
+                self.post(self.core.openflow_discovery, "LinkEvent", _Event(link=link, added=True, removed=False))
+        self.drain()
+
+    def restart(self, discovery_delay=DISCOVERY_DELAY):
+        """
+        The controller process dies and starts again: its timers, queued events and module state are lost (what
+        its state writer had written is kept), the switches keep their flow tables and connect to the new process,
+        and openflow.discovery reports the links discovery_delay seconds later.
+        """
+        journal = getattr(self.controller, "journal", None)
+        if journal is not None:
+            journal.stop()
+        self.controller.telemetry.stop()
+        for when, seq, timer in self.timers:
+            timer.cancelled = True
+        self.timers = []
+        self.queue.clear()
+        self.outbox.clear()
+        self.later = []
+        for switch in self.switches.values():
+            switch.connection = None
+            switch.buffered.clear()
+        for name in [name for name in sys.modules if name.startswith("routing_") and name != "routing_harness"]:
+            del sys.modules[name]
+        self.start_controller()
+        self.restarts.append(self.clock.now)
+        self.counters["restarts"] += 1
+        self.timeline.mark(self, self.clock.now)
+        for switch in self.switches.values():
+            self.connect(switch)
+        self.drain()
+        _Timer(discovery_delay, self.discover)
+
+    def connect(self, switch):
+        connection = FakeConnection(self, switch)
+        switch.connection = connection
+        self.core.openflow.connections[switch.dpid] = connection
+        self.post(self.core.openflow, "ConnectionUp", _Event(connection=connection, dpid=switch.dpid,
+                                                             ofp=connection.features))
+
+    def disconnect(self, switch):
+        if switch.connection is None:
+            return
+        connection, switch.connection = switch.connection, None
+        del self.core.openflow.connections[switch.dpid]
+        self.post(self.core.openflow, "ConnectionDown", _Event(connection=connection, dpid=switch.dpid))
+
+    def set_link(self, name1, name2, up):
+        """ Set the link between the switches named name1 and name2 down (or up again). """
+        for dpid1, port1, dpid2, port2 in self.links:
+            a, b = self.switches[dpid1], self.switches[dpid2]
+            if set((a.name, b.name)) == set((name1, name2)):
+                break
+        else:
+            raise ValueError("no link %s-%s" % (name1, name2))
+        if up:
+            a.peers[port1], b.peers[port2] = (b, port2), (a, port1)
+            self.down.difference_update(((a, port1), (b, port2)))
+        else:
+            a.peers.pop(port1, None)
+            b.peers.pop(port2, None)
+            self.down.update(((a, port1), (b, port2)))
+        state = 0 if up else OFPPS_LINK_DOWN
+        for switch, port in ((a, port1), (b, port2)):
+            if switch.connection is not None:
+                desc = ofp_phy_port(port, "%s-eth%d" % (switch.name, port), state=state)
+                self.post(self.core.openflow, "PortStatus",
+                          _Event(connection=switch.connection, dpid=switch.dpid, port=port, added=False,
+                                 deleted=False, modified=True, ofp=ofp_port_status(desc=desc, reason=2)))
+        # openflow.discovery reports the change in both directions
+        for link in (_Link(dpid1, port1, dpid2, port2), _Link(dpid2, port2, dpid1, port1)):
+            self.post(self.core.openflow_discovery, "LinkEvent", _Event(link=link, added=up, removed=not up))
+        self.counters["link_up" if up else "link_down"] += 1
+        self.drain()
+
+    def deliver(self, switch, port, frame, now):
+        peer = switch.peers.get(port)
+        if peer is None:
+            if (switch, port) in self.down:
+                self.counters["lost_link_down"] += 1
+            return
+        if isinstance(peer, Host):
+            self.host_receive(peer, frame, now)
+        elif self.depth >= MAX_HOPS:
+            self.counters["looped"] += 1  # OpenFlow 1.0 rules do not decrement the TTL: the packet would loop on;
+            # the run fails (main) instead of recursing until Python gives up
+        else:
+            self.counters["hops"] += 1
+            self.depth += 1
+            try:
+                peer[0].receive(peer[1], frame, now)
+            finally:
+                self.depth -= 1
+
+    def host_receive(self, host, frame, now):
+        kind = (frame[12] << 8) | frame[13]
+        if kind == ethernet.ARP_TYPE:
+            packet = arp(frame[14:])
+            if packet.opcode == arp.REQUEST and packet.protodst == host.ip:
+                reply = build_arp(host.mac.raw, host.ip.raw, packet.hwsrc.raw, packet.protosrc.raw, arp.REPLY)
+                host.switch.receive(host.port, reply, now)
+            elif packet.opcode == arp.REPLY and packet.protodst == host.ip:
+                self.counters["arp_resolved"] += 1
+            return
+        if frame[0:6] != host.mac.raw:
+            return
+        host.received += 1
+        host.received_bytes += len(frame)
+        self.counters["delivered"] += 1
+
+    def arp_all(self, pairs):
+        # every source host resolves every destination it will talk to
+        for src, dst in pairs:
+            frame = build_arp(src.mac.raw, src.ip.raw, b"\x00" * 6, dst.ip.raw, arp.REQUEST)
+            src.switch.receive(src.port, frame, self.clock.now)
+            self.drain()
+
+    # ------------------------------------------------------------------ traffic
+    def send(self, host, frame, fields=None):
+        host.switch.receive(host.port, frame, self.clock.now, fields)
+        self.drain()
+
+
+class _PacketInEvent(_Event):
+    _parsed = None
+
+    @property
+    def parsed(self):
+        if self._parsed is None:
+            self._parsed = ethernet(self.data)
+        return self._parsed
+
+    def parse(self):
+        return self.parsed
+
+
+# =====================================================================================================
+# Traces and benchmark
+# =====================================================================================================
+
+PROTOCOLS = {"icmp": ipv4.ICMP_PROTOCOL, "tcp": ipv4.TCP_PROTOCOL, "udp": ipv4.UDP_PROTOCOL}
+
+
+def synthetic_trace(hosts, flows, events, rate, size=1400, seed=1, zipf=1.1):
+    """
+    Records (time, src host, dst host, protocol, sport, dport, size) of `events` packets of `flows` flows
+    between hosts on different edges; flow popularity follows a Zipf law, packets arrive at `rate` packets/s.
+    """
+    rnd = random.Random(seed)
+    pairs = [(a.name, b.name) for a, b in cross_pairs(hosts)]
+    specs = []
+    for i in range(flows):
+        src, dst = pairs[rnd.randrange(len(pairs))]
+        proto = rnd.choice(("icmp", "udp", "tcp"))
+        specs.append((src, dst, proto, rnd.randrange(1024, 65535), rnd.choice((80, 443, 5001, 5201))))
+    weights = [1.0 / (i + 1) ** zipf for i in range(flows)]
+    chosen = rnd.choices(range(flows), weights=weights, k=events)
+    t = 0.0
+    for index in chosen:
+        t += rnd.expovariate(rate)
+        src, dst, proto, sport, dport = specs[index]
+        yield {"t": t, "src": src, "dst": dst, "proto": proto, "sport": sport, "dport": dport, "size": size,
+               "flow": index}
+
+
+def read_trace(path):
+    with open(path) as trace:
+        for line in trace:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _recorded(trace, out):
+    for record in trace:
+        out.write(json.dumps(record) + "\n")
+        yield record
+
+
+def _rss_kb():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (IOError, OSError, ValueError):
+        return 0
+
+
+def cross_pairs(hosts):
+    # pairs of hosts attached to different switches, i.e. the ones whose traffic reaches the controller
+    return [(a, b) for a in sorted(hosts.values(), key=lambda h: h.name)
+            for b in sorted(hosts.values(), key=lambda h: h.name) if a.switch is not b.switch]
+
+
+def link_actions(specs):
+    """ [(time, name1, name2, up)] of the --link-down specs "s1-s4@10" (down at 10 s) or "s1-s4@10-20" (up at 20 s). """
+    actions = []
+    for spec in specs:
+        link, _, times = spec.partition("@")
+        name1, name2 = link.split("-")
+        down, _, up = times.partition("-")
+        actions.append((float(down), name1, name2, False))
+        if up:
+            actions.append((float(up), name1, name2, True))
+    return sorted(actions)
+
+
+def run(trace, harness, actions=(), restarts=()):
+    frames = {}
+    start_rss = _rss_kb()
+    start = _time.perf_counter()
+    base = harness.clock.now
+    packets = 0
+    actions = collections.deque(actions)
+    restarts = collections.deque(sorted(restarts))
+    for record in trace:
+        while actions and actions[0][0] <= record["t"]:
+            t, name1, name2, up = actions.popleft()
+            harness.advance(base + t)
+            harness.set_link(name1, name2, up)
+        while restarts and restarts[0] <= record["t"]:
+            harness.advance(base + restarts.popleft())
+            harness.timeline.sample(harness, harness.clock.now)
+            harness.restart()
+        harness.advance(base + record["t"])
+        harness.link_load.sample(harness, harness.clock.now)
+        harness.timeline.sample(harness, harness.clock.now)
+        src, dst = harness.hosts[record["src"]], harness.hosts[record["dst"]]
+        key = (record["src"], record["dst"], record["proto"], record["sport"], record["dport"], record["size"])
+        frame = frames.get(key)
+        if frame is None:
+            frame = build_ipv4(src.mac.raw, dst.mac.raw, src.ip.raw, dst.ip.raw, PROTOCOLS[record["proto"]],
+                               record["sport"], record["dport"], record["size"])
+            frames[key] = frame
+        harness.counters["sent"] += 1
+        harness.send(src, frame)
+        packets += 1
+    elapsed = _time.perf_counter() - start
+    return packets, elapsed, _rss_kb() - start_rss
+
+
+def report(harness, packets, elapsed, rss_growth):
+    counters = harness.counters
+    events = counters["events"]
+    busy = sum(sum(stats.samples) for stats in harness.handlers.values())
+    result = {
+        "packets": packets,
+        "wall_s": round(elapsed, 3),
+        "packets_per_s": round(packets / elapsed) if elapsed else None,
+        "controller_events": events,
+        "events_per_s": round(events / elapsed) if elapsed else None,
+        # wall time includes the data plane model; the controller alone handles events_per_handler_s
+        "handler_s": round(busy, 3),
+        "events_per_handler_s": round(events / busy) if busy else None,
+        "packet_in": counters["packet_in"],
+        "packet_in_per_packet": round(counters["packet_in"] / packets, 5) if packets else None,
+        "messages": counters["messages"],
+        "messages_per_event": round(counters["messages"] / events, 3) if events else None,
+        "flow_mod": counters["flow_mod"],
+        "packet_out": counters["packet_out"],
+        "flow_mods_per_packet_in": round(counters["flow_mod"] / counters["packet_in"], 3) if counters["packet_in"] else None,
+        "channel_bytes_out": counters["channel_bytes"],
+        "channel_writes": counters["channel_writes"],
+        "channel_bytes_in": counters["channel_bytes_in"],
+        "delivered": counters["delivered"],
+        "flow_removed": counters["flow_removed"],
+        "lost_link_down": counters["lost_link_down"],
+        "looped": counters["looped"],
+        "flow_table_entries": dict((s.name, s.flow_count()) for s in harness.switches.values()),
+        "rss_growth_kb": rss_growth,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "handlers": dict((name, stats.percentiles()) for name, stats in sorted(harness.handlers.items())),
+    }
+    lifecycle = getattr(harness.controller, "lifecycle", None)
+    if lifecycle is not None:
+        result["flow_lifecycle"] = lifecycle.report(harness.clock.now)
+    failover = getattr(harness.controller, "failover", None)
+    if failover is not None and (counters["link_down"] or counters["link_up"]):
+        result["failover"] = failover.counters()
+    forecaster = getattr(harness.controller, "forecaster", None)
+    if forecaster is not None:
+        forecast = forecaster.report()
+        forecast["links"] = dict(("%s-%d" % (harness.controller.topology.name(dpid), port), state)
+                                 for (dpid, port), state in sorted(forecast["links"].items()))
+        result["forecast"] = forecast
+    placer = getattr(harness.controller, "placer", None)
+    if placer is not None:
+        result["placement"] = placer.counters()
+    result["link_load"] = harness.link_load.report()
+    queue_stats = getattr(harness.controller, "queue_stats", None)
+    if queue_stats is not None and len(queue_stats):
+        result["queues"] = dict((name, dict(total, bitrate=round(total["bitrate"])))
+                                for name, total in sorted(queue_stats.classes().items()))
+    if harness.restarts:
+        restart = harness.timeline.after(harness.restarts[0])
+        restart["reconciled"] = dict(harness.controller.reconciled)
+        if harness.controller.journal is not None:
+            restart["state"] = harness.controller.journal.counters()
+        result["restart"] = restart
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--manifest", help="network manifest written by routing_net.py (instead of the diamond)")
+    parser.add_argument("--paths", type=int, default=3, help="parallel paths of the diamond (default 3)")
+    parser.add_argument("--hosts", type=int, default=3, help="hosts per edge switch (default 3)")
+    parser.add_argument("--flows", type=int, default=2000, help="distinct flows of the synthetic trace")
+    parser.add_argument("--events", type=int, default=200000, help="packets of the synthetic trace")
+    parser.add_argument("--rate", type=float, default=2000.0, help="offered load in packets/s (virtual time)")
+    parser.add_argument("--size", type=int, default=1400, help="packet size in bytes")
+    parser.add_argument("--trace", help="replay a recorded JSONL trace instead of the synthetic one")
+    parser.add_argument("--record", help="write the synthetic trace to this JSONL file")
+    parser.add_argument("--no-buffers", action="store_true", help="switches do not buffer packets (buffer_id)")
+    parser.add_argument("--table-size", type=int, default=None, help="flow table capacity of the switches")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--metrics-port", type=int, default=0, help="serve the controller metrics (default: off)")
+    parser.add_argument("--telemetry", default="off", help="telemetry level of the controller (default: off)")
+    parser.add_argument("--arp-rules", action="store_true", help="let the controller install ARP rules")
+    parser.add_argument("--aggregation", default="pair", help="aggregation level of the flow rules (flow, pair, prefix)")
+    parser.add_argument("--fixed-timeouts", action="store_true", help="no adaptive idle/hard timeouts of the flow rules")
+    parser.add_argument("--forecast", default="holt", help="link utilization forecast (holt, linear, ewma, off)")
+    parser.add_argument("--placement", default="minmax", help="placement of the new flows (minmax, hash)")
+    parser.add_argument("--no-queues", action="store_true", help="the controller outputs without per-class queues")
+    parser.add_argument("--link-down", action="append", default=[], metavar="A-B@T[-T2]",
+                        help="set the link between switches A and B down at T s of the trace (and up at T2)")
+    parser.add_argument("--restart", type=float, action="append", default=[], metavar="T",
+                        help="restart the controller at T s of the trace")
+    parser.add_argument("--state", help="state file of the controller, kept across --restart (default: none)")
+    parser.add_argument("--quiet", action="store_true", help="silence the controller's console output")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    stdout = sys.stdout
+    record_file = None
+    if args.quiet:
+        sys.stdout = open(os.devnull, "w")
+    try:
+        # no metrics endpoint and no telemetry files: the benchmark measures the handlers alone
+        launch_args = {"metrics_port": args.metrics_port, "verbosity": args.telemetry, "arp_rules": args.arp_rules,
+                       "aggregation": args.aggregation, "adaptive_timeouts": not args.fixed_timeouts,
+                       "forecast": args.forecast, "placement": args.placement,
+                       "queues": not args.no_queues, "state": args.state}
+        if args.state and os.path.exists(args.state):
+            os.remove(args.state)  # the first controller starts from nothing
+        if args.manifest:
+            launch_args["manifest"] = args.manifest
+        harness = Harness(buffers=not args.no_buffers, table_size=args.table_size, seed=args.seed, **launch_args)
+        if args.manifest:
+            harness.build(*manifest_topology(args.manifest))
+        else:
+            harness.build(*diamond_topology(args.paths, args.hosts))
+        harness.connect_all()
+        harness.arp_all(cross_pairs(harness.hosts))
+        harness.advance(harness.clock.now + 5.0)  # let the statistics settle
+        # traces are streamed, so millions of events do not have to fit in memory
+        if args.trace:
+            trace = read_trace(args.trace)
+        else:
+            trace = synthetic_trace(harness.hosts, args.flows, args.events, args.rate, args.size, args.seed)
+            if args.record:
+                record_file = open(args.record, "w")
+                trace = _recorded(trace, record_file)
+        packets, elapsed, rss = run(trace, harness, link_actions(args.link_down), args.restart)
+    finally:
+        if record_file is not None:
+            record_file.close()
+        if args.quiet:
+            sys.stdout.close()
+            sys.stdout = stdout
+    result = report(harness, packets, elapsed, rss)
+    print(json.dumps(result, indent=2))
+    if result["looped"]:
+        sys.exit("%d packets looped between the switches" % result["looped"])
+
+
+if __name__ == "__main__":
+    main()
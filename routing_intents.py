@@ -0,0 +1,212 @@
+"""
+ Intent table used by routing_controller.py.
+
+ An intent selects traffic by source and destination prefixes and optionally by protocol and ports, and
+ asks for a maximum path delay (ms), a maximum round-trip delay (ms, twice the maximum path delay by default)
+ and a minimum bandwidth (bit/s). Intents are loaded from a JSON file:
+
+    {"intents": [
+        {"name": "h1-h4", "src": "10.0.0.1", "dst": "10.0.0.4", "max_delay": 60},
+        {"name": "video", "src": "10.0.0.0/24", "dst": "10.0.0.6", "proto": "udp", "dport": [5000, 5100],
+         "max_delay": 30, "max_rtt": 50, "min_bw": 200000}
+    ]}
+
+ and compiled into an index: one hash table per pair of prefix lengths in use, keyed by the masked
+ addresses, with the intents of a bucket grouped by (protocol, destination port). A lookup costs a few
+ dictionary probes per pair of prefix lengths (at most 33 * 33, in practice a handful), whatever the
+ number of intents. When several intents match a flow the most specific one wins: longer prefixes first
+ (destination, then source), then exact protocol and port over wildcards, then the order in the file.
+
+ An intent covers both directions of its flows: the table also holds its mirror (addresses and ports swapped,
+ the same budgets, reverse=True), so the replies match the mirror; an intent and its mirror are each other's
+ `pair`.
+
+ The module does not depend on POX.
+"""
+
+import json
+import socket
+import struct
+
+PROTOCOLS = {"icmp": 1, "tcp": 6, "udp": 17}
+
+
+def parse_prefix(text):
+    """ "10.0.0.0/24" -> (address as an int, prefix length); a plain address is a /32. """
+    address, _, length = str(text).partition("/")
+    length = int(length) if length else 32
+    if not 0 <= length <= 32:
+        raise ValueError("bad prefix length in %r" % text)
+    value = struct.unpack("!I", socket.inet_aton(address))[0]
+    return value & _mask(length), length
+
+
+def _mask(length):
+    return (0xffffffff << (32 - length)) & 0xffffffff
+
+
+def _port_range(value):
+    # None, a port or a [low, high] range -> None or (low, high)
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        low, high = value
+    else:
+        low = high = value
+    low, high = int(low), int(high)
+    if not 0 <= low <= high <= 0xffff:
+        raise ValueError("bad port range %r" % (value,))
+    return low, high
+
+
+class Intent(object):
+    __slots__ = ("name", "src", "src_len", "dst", "dst_len", "proto", "sport", "dport", "max_delay", "min_bw",
+                 "order", "max_rtt", "reverse", "pair")
+
+    def __init__(self, name, src="0.0.0.0/0", dst="0.0.0.0/0", proto=None, sport=None, dport=None,
+                 max_delay=None, min_bw=None, order=0, max_rtt=None):
+        self.name = name
+        self.src, self.src_len = parse_prefix(src)
+        self.dst, self.dst_len = parse_prefix(dst)
+        if isinstance(proto, str):
+            if proto.lower() not in PROTOCOLS:
+                raise ValueError("unknown protocol %r" % proto)
+            proto = PROTOCOLS[proto.lower()]
+        self.proto = proto
+        self.sport = _port_range(sport)
+        self.dport = _port_range(dport)
+        self.max_delay = max_delay  # ms, None = no latency budget
+        self.min_bw = min_bw  # bit/s, None = no bandwidth requirement
+        self.order = order
+        self.max_rtt = max_rtt  # ms, None = twice max_delay
+        self.reverse = False  # the mirror of an intent of the file
+        self.pair = self  # intent of the opposite direction (set by mirror())
+
+    @classmethod
+    def from_dict(cls, spec, order=0):
+        spec = dict(spec)
+        name = spec.pop("name", "intent-%d" % order)
+        unknown = set(spec) - set(("src", "dst", "proto", "sport", "dport", "max_delay", "max_rtt", "min_bw"))
+        if unknown:
+            raise ValueError("intent %s: unknown fields %s" % (name, ", ".join(sorted(unknown))))
+        return cls(name, order=order, **spec)
+
+    def mirror(self):
+        """ Intent of the opposite direction: addresses and ports swapped, the same budgets; None if the same. """
+        if (self.src, self.src_len, self.sport) == (self.dst, self.dst_len, self.dport):
+            return None  # symmetric: the intent matches its replies itself
+        other = Intent.__new__(Intent)
+        for name in self.__slots__:
+            setattr(other, name, getattr(self, name))
+        other.src, other.src_len, other.dst, other.dst_len = self.dst, self.dst_len, self.src, self.src_len
+        other.sport, other.dport = self.dport, self.sport
+        other.reverse = not self.reverse
+        other.pair, self.pair = self, other
+        return other
+
+    def rtt_budget(self):
+        """ Round-trip budget (ms) of the two directions, None if there is none. """
+        if self.max_rtt is not None:
+            return self.max_rtt
+        return 2 * self.max_delay if self.max_delay is not None else None
+
+    def _exact_dport(self):
+        if self.dport is not None and self.dport[0] == self.dport[1]:
+            return self.dport[0]
+        return None
+
+    def matches_ports(self, sport, dport):
+        if self.sport is not None and not self.sport[0] <= sport <= self.sport[1]:
+            return False
+        if self.dport is not None and not self.dport[0] <= dport <= self.dport[1]:
+            return False
+        return True
+
+    def __repr__(self):
+        return "Intent(%s%s, max_delay=%s, min_bw=%s)" % (self.name, " reverse" if self.reverse else "",
+                                                          self.max_delay, self.min_bw)
+
+
+class IntentTable(object):
+
+    def __init__(self, intents=()):
+        self.intents = []  # as loaded, without the mirrors
+        self.mirrors = []
+        self.index = {}  # (dst_len, src_len) -> {(src, dst): {(proto, dport): [Intent, ...]}}
+        self.lengths = []  # (src mask, dst mask, table) of the prefix length pairs in use, most specific first
+        for intent in intents:
+            self.add(intent)
+
+    def __len__(self):
+        return len(self.intents)
+
+    def __iter__(self):
+        return iter(self.intents)
+
+    @classmethod
+    def from_dicts(cls, specs):
+        return cls(Intent.from_dict(spec, order) for order, spec in enumerate(specs))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("intents", [])
+        return cls.from_dicts(data)
+
+    def directions(self):
+        """ The intents and their mirrors. """
+        return self.intents + self.mirrors
+
+    def add(self, intent):
+        self.intents.append(intent)
+        self._index(intent)
+        mirror = intent.mirror()
+        if mirror is not None:
+            self.mirrors.append(mirror)
+            self._index(mirror)
+
+    def _index(self, intent):
+        lengths = (intent.dst_len, intent.src_len)
+        if lengths not in self.index:
+            self.index[lengths] = {}
+            self.lengths = [(_mask(src_len), _mask(dst_len), self.index[(dst_len, src_len)])
+                            for dst_len, src_len in sorted(self.index, reverse=True)]
+        bucket = self.index[lengths].setdefault((intent.src, intent.dst), {})
+        group = bucket.setdefault((intent.proto, intent._exact_dport()), [])
+        group.append(intent)
+        group.sort(key=lambda i: (i.sport is None, i.dport is None, i.order))
+
+    def match(self, src, dst, proto=None, sport=0, dport=0):
+        """ Most specific intent for the flow (addresses as ints), or None. """
+        for src_mask, dst_mask, table in self.lengths:
+            bucket = table.get((src & src_mask, dst & dst_mask))
+            if bucket is None:
+                continue
+            for key in ((proto, dport), (proto, None), (None, dport), (None, None)):
+                for intent in bucket.get(key, ()):
+                    if intent.matches_ports(sport, dport):
+                        return intent
+        return None
+
+
+def choose_path(intent, paths, delays, loads, headroom, budget=None):
+    """
+    Index of the path for a flow of the intent: the least loaded of the paths meeting the latency budget
+    that have `min_bw` of headroom left (ties go to the shorter delay). If no path within the budget has
+    enough headroom the least loaded one within the budget is used; if no path meets the budget, the fastest.
+    delays: delay of every path in ms, loads: utilization of the busiest link of every path,
+    headroom: residual capacity (bit/s) of the bottleneck link of every path, budget: latency budget in ms
+    (max_delay of the intent by default).
+    """
+    if budget is None:
+        budget = intent.max_delay
+    within = [i for i in range(len(paths)) if budget is None or delays[i] <= budget]
+    if not within:
+        return min(range(len(paths)), key=lambda i: delays[i])
+    if intent.min_bw:
+        fitting = [i for i in within if headroom[i] >= intent.min_bw]
+        if fitting:
+            within = fitting
+    return min(within, key=lambda i: (loads[i], delays[i]))
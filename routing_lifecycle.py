@@ -0,0 +1,146 @@
+"""
+ Lifecycle of the rules installed by routing_controller.py for the flows entering at the dynamic edges, and the
+ timeouts of their next installs.
+
+ The rule of a flow at its edge is installed with OFPFF_SEND_FLOW_REM, so the switch reports it when it expires
+ (idle or hard timeout) or is deleted, with its duration and its packet and byte counts. The tracker keeps a
+ bounded LRU history per rule (keyed by its match at the edge) and classifies it when it is installed again:
+    - "new": never seen (or forgotten), installed with the base idle timeout,
+    - "recurring": installed again less than `recur_window` seconds after its idle expiry, i.e. the flow was only
+      paused and its packet_in could have been avoided; its idle timeout doubles at every recurrence, up to
+      `max_idle`,
+    - "one-shot": its last lifetime carried at most `one_shot` packets and it did not come back within the window;
+      installed with `min_idle`, so it leaves the table early.
+ A rule whose idle timeout was extended gets the hard timeout `max_hard`, so a longer idle timeout cannot keep
+ a stale rule in the table forever. Under table pressure (see the table budget of the controller) no idle timeout
+ is extended beyond the base one.
+
+ The churn is the number of re-installs (recurring installs) per second, measured over `window` seconds.
+
+ The module does not depend on POX.
+"""
+
+from collections import OrderedDict, deque
+
+CLASSES = ("new", "recurring", "one-shot")
+
+
+class RuleHistory(object):
+    __slots__ = ("cls", "idle", "installs", "recurrences", "installed", "removed", "reason", "duration", "packets",
+                 "bytes")
+
+    def __init__(self, idle):
+        self.cls = "new"
+        self.idle = idle  # idle timeout of the current (or next) install
+        self.installs = 0
+        self.recurrences = 0
+        self.installed = None
+        self.removed = None  # time the last lifetime ended, None while the rule is installed
+        self.reason = None  # "idle", "hard" or "delete"
+        self.duration = 0.0  # of the last lifetime
+        self.packets = 0
+        self.bytes = 0
+
+
+class FlowLifecycle(object):
+
+    def __init__(self, base_idle=2, min_idle=1, max_idle=16, max_hard=120, recur_window=10.0, one_shot=1,
+                 window=10.0, capacity=16384):
+        self.base_idle = base_idle
+        self.min_idle = min_idle
+        self.max_idle = max_idle
+        self.max_hard = max_hard
+        self.recur_window = recur_window
+        self.one_shot = one_shot
+        self.window = window
+        self.capacity = capacity
+        self.rules = OrderedDict()  # rule key -> RuleHistory, least recently used first
+        self._reinstalls = deque()  # times of the re-installs within the last window
+        self.installs = 0
+        self.reinstalls = 0
+        self.removed = {"idle": 0, "hard": 0, "delete": 0}
+        self.duration = 0.0  # total lifetime of the removed rules
+        self.packets = 0
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self.rules)
+
+    def timeouts(self, key, now, pressure=False):
+        """
+        (idle, hard) timeouts of the rule `key` installed now; the install is recorded. With `pressure` the idle
+        timeout is not extended beyond the base one.
+        """
+        history = self.rules.get(key)
+        if history is None:
+            history = self.rules[key] = RuleHistory(self.base_idle)
+            if len(self.rules) > self.capacity:
+                self.rules.popitem(last=False)
+        elif history.removed is not None:
+            self.rules.move_to_end(key)
+            # only an idle expiry means the flow paused; after a hard timeout or a delete the next install is not
+            # a recurrence of a pause
+            if history.reason == "idle" and now - history.removed <= self.recur_window:
+                history.cls = "recurring"
+                history.recurrences += 1
+                history.idle = min(max(history.idle, self.base_idle) * 2, self.max_idle)
+                self.reinstalls += 1
+                self._reinstalls.append(now)
+                self.churn(now)
+            elif history.packets <= self.one_shot:
+                history.cls = "one-shot"
+                history.idle = self.min_idle
+            else:
+                history.cls = "new"
+                history.idle = self.base_idle
+            history.removed = None
+        else:
+            # installed again (e.g. moved) before its removal was reported: it keeps its class
+            self.rules.move_to_end(key)
+        history.installs += 1
+        history.installed = now
+        self.installs += 1
+        idle = min(history.idle, self.base_idle) if pressure else history.idle
+        return idle, (self.max_hard if idle > self.base_idle else 0)
+
+    def removed_rule(self, key, reason, duration, packets, byte_count, now):
+        """ FlowRemoved of the rule `key`: reason is "idle", "hard" or "delete". """
+        self.removed[reason] = self.removed.get(reason, 0) + 1
+        self.duration += duration
+        self.packets += packets
+        self.bytes += byte_count
+        history = self.rules.get(key)
+        if history is None:
+            return None
+        history.duration = duration
+        history.packets = packets
+        history.bytes = byte_count
+        history.removed = now
+        history.reason = reason
+        return history
+
+    def churn(self, now):
+        """ Re-installs per second over the last `window` seconds. """
+        times = self._reinstalls
+        while times and times[0] < now - self.window:
+            times.popleft()
+        return len(times) / self.window
+
+    def report(self, now):
+        classes = dict((name, 0) for name in CLASSES)
+        idle = {}
+        for history in self.rules.values():
+            classes[history.cls] += 1
+            idle[history.idle] = idle.get(history.idle, 0) + 1
+        removed = sum(self.removed.values())
+        return {"rules": len(self.rules), "classes": classes, "idle_timeouts": dict(sorted(idle.items())),
+                "installs": self.installs, "reinstalls": self.reinstalls,
+                "reinstall_ratio": round(self.reinstalls / self.installs, 4) if self.installs else None,
+                "churn_per_s": round(self.churn(now), 3), "removed": dict(self.removed),
+                "mean_duration_s": round(self.duration / removed, 3) if removed else None,
+                "mean_packets": round(float(self.packets) / removed, 2) if removed else None}
+
+    def counters(self):
+        counters = {"installs": self.installs, "reinstalls": self.reinstalls}
+        counters.update(("removed_" + reason, n) for reason, n in self.removed.items())
+        return counters
@@ -0,0 +1,150 @@
+"""
+ Instrumentation of routing_controller.py.
+
+ The controller keeps, at the cost of a few dictionary updates per event:
+    - a latency histogram per handler (handlers are wrapped with timed()), with fixed buckets from 5 us to 1 s,
+    - counters of the OpenFlow messages sent to and received from every switch, by type,
+    - counters of the routing decisions per path (switch and output port) and kind (intent, balance, ...),
+    - gauges read when the metrics are collected, e.g. the depth of the queues of the controller.
+
+ They are served in the Prometheus text format by a small HTTP server on its own thread (start_server()),
+ so a scrape never runs on the event loop; it only copies the dictionaries it reads.
+
+ The module does not depend on POX.
+"""
+
+import bisect
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+BUCKETS = (5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 1.0)
+
+
+class Histogram(object):
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(names, values):
+    return ",".join('%s="%s"' % (name, str(value).replace('"', "'")) for name, value in zip(names, values))
+
+
+class Metrics(object):
+
+    def __init__(self, prefix="routing", switch_name=str):
+        self.prefix = prefix
+        self.switch_name = switch_name  # dpid -> label
+        self.handlers = {}  # handler name -> Histogram
+        self.messages = {}  # (dpid, direction, message type) -> count
+        self.decisions = {}  # (dpid, out_port, kind) -> count
+        self.gauges = {}  # (name, label) -> callable returning a number
+        self.server = None
+
+    # ---------------------------------------------------------------- event loop side
+    def timed(self, name, handler):
+        """ Wrap a handler so that the time spent in it is recorded in the histogram `name`. """
+        histogram = self.handlers.setdefault(name, Histogram())
+        perf_counter = time.perf_counter
+
+        def timed_handler(*args, **kw):
+            start = perf_counter()
+            try:
+                return handler(*args, **kw)
+            finally:
+                histogram.observe(perf_counter() - start)
+        timed_handler.__name__ = getattr(handler, "__name__", name)
+        return timed_handler
+
+    def sent(self, dpid, kind, n=1):
+        key = (dpid, "out", kind)
+        self.messages[key] = self.messages.get(key, 0) + n
+
+    def received(self, dpid, kind, n=1):
+        key = (dpid, "in", kind)
+        self.messages[key] = self.messages.get(key, 0) + n
+
+    def decision(self, dpid, out_port, kind):
+        key = (dpid, out_port, kind)
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+
+    def gauge(self, name, label, read):
+        self.gauges[(name, label)] = read
+
+    # ---------------------------------------------------------------- collection (HTTP thread)
+    def render(self):
+        p = self.prefix
+        lines = ["# HELP %s_handler_seconds Time spent in the handlers of the controller." % p,
+                 "# TYPE %s_handler_seconds histogram" % p]
+        for name, histogram in sorted(self.handlers.items()):
+            counts, total, count = list(histogram.counts), histogram.sum, histogram.count
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += n
+                lines.append('%s_handler_seconds_bucket{handler="%s",le="%s"} %d' % (p, name, bound, cumulative))
+            lines.append('%s_handler_seconds_sum{handler="%s"} %.9f' % (p, name, total))
+            lines.append('%s_handler_seconds_count{handler="%s"} %d' % (p, name, count))
+
+        lines += ["# HELP %s_messages_total OpenFlow messages exchanged with the switches." % p,
+                  "# TYPE %s_messages_total counter" % p]
+        for (dpid, direction, kind), n in sorted(self.messages.copy().items()):
+            lines.append("%s_messages_total{%s} %d" % (p, _labels(("switch", "direction", "type"),
+                                                                   (self.switch_name(dpid), direction, kind)), n))
+
+        lines += ["# HELP %s_decisions_total Routing decisions per path (switch and output port)." % p,
+                  "# TYPE %s_decisions_total counter" % p]
+        for (dpid, out_port, kind), n in sorted(self.decisions.copy().items()):
+            lines.append("%s_decisions_total{%s} %d" % (p, _labels(("switch", "out_port", "kind"),
+                                                                    (self.switch_name(dpid), out_port, kind)), n))
+
+        names = sorted(set(name for name, label in self.gauges))
+        for name in names:
+            lines += ["# TYPE %s_%s gauge" % (p, name)]
+            for (gauge, label), read in sorted(self.gauges.copy().items()):
+                if gauge != name:
+                    continue
+                try:
+                    value = float(read())
+                except Exception:
+                    continue
+                lines.append('%s_%s{name="%s"} %g' % (p, name, label, value))
+        return "\n".join(lines) + "\n"
+
+    def start_server(self, port, address="127.0.0.1"):
+        """ Serve /metrics on address:port from a daemon thread. """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self.server = Server((address, port), Handler)
+        thread = threading.Thread(target=self.server.serve_forever, name="metrics-http")
+        thread.daemon = True
+        thread.start()
+        return self.server
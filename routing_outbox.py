@@ -0,0 +1,68 @@
+"""
+ Coalescing of the messages sent by routing_controller.py to the switches.
+
+ Handlers queue their packed OpenFlow messages per switch instead of writing them to the connection one by one;
+ the first message queued in a tick of the event loop schedules a flush (POX core.callLater), which runs once the
+ events pending in that tick have been handled and writes the queue of every switch with a single send. The order
+ of the messages to one switch is kept, so a batch of flow_mods ended by a barrier stays a valid batch.
+
+ Messages queued with last=True (the rules of the ingress switches) make their switch flushed after the others,
+ so the rules of a new path are written downstream first. The switches are on separate connections: this orders
+ the writes, it does not guarantee the ingress rule is applied last.
+
+ The module does not depend on POX.
+"""
+
+
+class Outbox(object):
+
+    def __init__(self, connection_of, schedule):
+        self.connection_of = connection_of  # dpid -> connection, or None if the switch is not connected
+        self.schedule = schedule  # schedule(callback): call back once the current tick of the event loop is done
+        self.pending = {}  # dpid -> list of packed messages
+        self.last = set()  # switches flushed after the others
+        self._scheduled = False
+        self.messages = 0  # messages queued
+        self.writes = 0  # sends to the connections
+        self.flushes = 0
+        self.dropped = 0  # messages for switches that disconnected before the flush
+
+    def __len__(self):
+        return sum(len(batch) for batch in self.pending.values())
+
+    def send(self, dpid, data, last=False):
+        batch = self.pending.get(dpid)
+        if batch is None:
+            batch = self.pending[dpid] = []
+        batch.append(data)
+        if last:
+            self.last.add(dpid)
+        self.messages += 1
+        if not self._scheduled:
+            self._scheduled = True
+            self.schedule(self.flush)
+
+    def flush(self):
+        self._scheduled = False
+        pending, self.pending = self.pending, {}
+        last, self.last = self.last, set()
+        self.flushes += 1
+        order = [dpid for dpid in pending if dpid not in last] + [dpid for dpid in pending if dpid in last]
+        for dpid in order:
+            batch = pending[dpid]
+            connection = self.connection_of(dpid)
+            if connection is None:
+                self.dropped += len(batch)
+                continue
+            connection.send(batch[0] if len(batch) == 1 else b"".join(batch))
+            self.writes += 1
+
+    def discard(self, dpid):
+        # the switch disconnected: what was queued for it is dropped
+        batch = self.pending.pop(dpid, None)
+        self.last.discard(dpid)
+        if batch is not None:
+            self.dropped += len(batch)
+
+    def counters(self):
+        return {"messages": self.messages, "writes": self.writes, "flushes": self.flushes, "dropped": self.dropped}
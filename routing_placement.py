@@ -0,0 +1,141 @@
+"""
+ Bandwidth-aware placement of the flows entering at the dynamic edges, used by routing_controller.py.
+
+ The engine keeps, per directed link:
+    - its capacity (bit/s),
+    - its measured load, set from the port statistics (the EWMA rate, or the forecast of routing_forecast.py when
+      it is higher) together with the rate of the flows holding a reservation on it,
+    - the demand placed on it since (pending): the flows placed between two statistics replies are not in the
+      measured load yet, so their estimated demand is added and decays with the time constant of the EWMA,
+    - whether it is in the congested band of the forecast.
+ The reservations (minimum bandwidth of the intent flows crossing the link) are counted by the flow registry
+ (routing_flows.py); the part of them the flows do not use yet is held as load, so best-effort traffic cannot
+ take the headroom guaranteed to the intents.
+
+ The demand of a new flow is not known when it is placed: it is estimated per class of flows (e.g. intent,
+ protocol and destination port) as the EWMA of the rates measured for the flows of the class from the flow
+ statistics, DEFAULT_DEMAND until the class has been measured; an intent flow asks for at least its min_bw. A
+ flow placed again (its rules expired, or it is re-placed) is charged with its own last measured rate instead,
+ kept in a bounded LRU table, so the few heavy flows of a skewed mix are not taken for average ones.
+
+ place() is the online min-max heuristic: every candidate path is charged with the demand and the path whose
+ busiest link ends up with the lowest utilization wins (paths crossing a congested link rank last). Everything
+ is plain dictionary lookups over the few links of the candidate paths, so a decision takes a few microseconds.
+
+ The module does not depend on POX.
+"""
+
+import math
+from collections import OrderedDict
+
+
+class PlacementEngine(object):
+
+    def __init__(self, capacity_of, default_demand=50000.0, alpha=0.2, tau=2.0, capacity=16384):
+        self.capacity_of = capacity_of  # link -> capacity in bit/s
+        self.default_demand = default_demand
+        self.alpha = alpha  # weight of a new rate sample in the demand of its class
+        self.tau = tau  # time constant (s) of the decay of the pending demand
+        self.capacities = {}
+        self.measured = {}  # link -> bit/s
+        self.used = {}  # link -> bit/s of the flows with a reservation, at the last measurement
+        self.pending = {}  # link -> (bit/s, time placed)
+        self.congested = set()
+        self.demands = {}  # class -> EWMA of the rates of its flows
+        self.rates = OrderedDict()  # flow -> its last measured rate, least recently used first
+        self.flow_capacity = capacity
+        self.placements = 0
+
+    def capacity(self, link):
+        capacity = self.capacities.get(link)
+        if capacity is None:
+            capacity = self.capacities[link] = float(self.capacity_of(link))
+        return capacity
+
+    def clear_capacities(self):
+        # the links (or their configured capacities) changed
+        self.capacities.clear()
+
+    # ---------------------------------------------------------------- measurements
+    def measure(self, link, bitrate, used=0.0, congested=False):
+        """ Statistics of the link: its load, the part of it of the flows with a reservation, its congestion band. """
+        self.measured[link] = bitrate
+        self.used[link] = used
+        if congested:
+            self.congested.add(link)
+        else:
+            self.congested.discard(link)
+
+    def learn(self, cls, rate, flow=None):
+        demand = self.demands.get(cls)
+        self.demands[cls] = rate if demand is None else demand + self.alpha * (rate - demand)
+        if flow is not None:
+            self.rates[flow] = rate
+            self.rates.move_to_end(flow)
+            if len(self.rates) > self.flow_capacity:
+                self.rates.popitem(last=False)
+
+    def demand(self, cls, minimum=0.0, flow=None):
+        """ Estimated rate (bit/s) of a new flow of the class: its own last rate if it was measured, at least `minimum`. """
+        rate = self.rates.get(flow) if flow is not None else None
+        if rate is None:
+            rate = self.demands.get(cls, self.default_demand)
+        return max(rate, minimum)
+
+    def forget(self, predicate):
+        for table in (self.measured, self.used, self.pending, self.capacities):
+            for link in [link for link in table if predicate(link)]:
+                del table[link]
+        self.congested = set(link for link in self.congested if not predicate(link))
+
+    # ---------------------------------------------------------------- decisions
+    def load(self, link, reserved, now):
+        """ Load of the link (bit/s): measured, placed since, and the reservations not used yet. """
+        load = self.measured.get(link, 0.0) + max(reserved.get(link, 0.0) - self.used.get(link, 0.0), 0.0)
+        pending = self.pending.get(link)
+        if pending is not None:
+            load += pending[0] * math.exp(-(now - pending[1]) / self.tau)
+        return load
+
+    def state(self, paths, reserved, now, demand=0.0):
+        """
+        (loads, headroom) of the candidate paths (tuples of links): the utilization of the busiest link of every
+        path once charged with `demand` (plus one if the path crosses a congested link, unless they all do), and
+        the residual capacity (bit/s) of its bottleneck link before it.
+        """
+        loads, headroom, flagged = [], [], []
+        for links in paths:
+            worst, room, congested = 0.0, None, False
+            for link in links:
+                capacity = self.capacity(link)
+                load = self.load(link, reserved, now)
+                worst = max(worst, (load + demand) / capacity)
+                room = capacity - load if room is None else min(room, capacity - load)
+                congested = congested or link in self.congested
+            loads.append(worst)
+            headroom.append(room if room is not None else 0.0)
+            flagged.append(congested)
+        if any(flagged) and not all(flagged):
+            loads = [load + 1.0 if congested else load for load, congested in zip(loads, flagged)]
+            headroom = [0.0 if congested else room for room, congested in zip(headroom, flagged)]
+        return loads, headroom
+
+    def place(self, paths, demand, reserved, now):
+        """ Index of the path (among tuples of links) with the lowest utilization once charged with the demand. """
+        loads = self.state(paths, reserved, now, demand)[0]
+        return loads.index(min(loads))
+
+    def placed(self, links, demand, now):
+        # the flow is on these links now; it shows in the measured load only after the next statistics
+        for link in links:
+            pending = self.pending.get(link)
+            if pending is not None:
+                demand_left = pending[0] * math.exp(-(now - pending[1]) / self.tau)
+                self.pending[link] = (demand_left + demand, now)
+            else:
+                self.pending[link] = (demand, now)
+        self.placements += 1
+
+    def counters(self):
+        return {"placements": self.placements, "classes": len(self.demands), "flows": len(self.rates),
+                "congested": len(self.congested)}
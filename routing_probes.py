@@ -0,0 +1,193 @@
+"""
+ Active delay measurement of the paths used by routing_controller.py.
+
+ The controller injects small probe frames (packet_out) at the source edge switch of every probed path; the
+ frame follows the path and is sent back to the controller by a rule of the destination edge switch. The
+ time between the packet_out and the packet_in, minus the latency of the two control channels (half of the
+ stats request round trip of each switch), is a sample of the one-way delay of the path, queues included.
+ Per path the prober keeps:
+    - a smoothed delay (EWMA with gain 1/8, as the SRTT of RFC 6298),
+    - the jitter (mean deviation of consecutive samples with gain 1/16, as in RFC 3550),
+    - the probes sent, received and lost; a probe not back after `timeout` seconds is lost. From the second
+      probe lost in a row every lost probe counts as a sample of `timeout`, so a path that drops its probes
+      looks slow instead of keeping its last estimate (a single loss does not move the estimate).
+
+ The overhead is bounded: every path is probed at most every `interval` seconds, with at most `max_outstanding`
+ probes in flight per path and at most `rate` probes per second in total. The estimate of a path is used only
+ after `min_samples` samples; until then the configured delay of the path stands.
+
+ Probes are UDP datagrams to PROBE_IP:PROBE_PORT, so transit switches forward them like any other IP traffic
+ (switches inside a path must forward PROBE_IP, as the cross-connected transit switches of the diamond do; probes
+ coming back from another switch are counted as misrouted). Their payload holds a magic string, the probe id of
+ the path, a sequence number and the send time.
+
+ The module does not depend on POX.
+"""
+
+import socket
+import struct
+
+PROBE_IP = "10.255.255.254"
+PROBE_PORT = 0xfade
+PROBE_MAGIC = b"PRB1"
+PROBE_SRC_MAC = b"\x02\x00\x00\x00\xff\xfe"
+PROBE_DST_MAC = b"\x02\x00\x00\x00\xff\xff"
+
+_PAYLOAD = struct.Struct("!4sIId")
+_PROBE_IP = socket.inet_aton(PROBE_IP)
+
+
+def _checksum(header):
+    total = sum(struct.unpack("!%dH" % (len(header) // 2), header))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+def probe_frame(path_id, seq, sent):
+    """ Ethernet frame of a probe (IPv4/UDP, 62 bytes). """
+    payload = _PAYLOAD.pack(PROBE_MAGIC, path_id, seq, sent)
+    udp = struct.pack("!HHHH", PROBE_PORT, PROBE_PORT, 8 + len(payload), 0) + payload
+    header = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 20 + len(udp), seq & 0xffff, 0, 64, 17, 0, _PROBE_IP, _PROBE_IP)
+    header = header[:10] + struct.pack("!H", _checksum(header)) + header[12:]
+    return PROBE_DST_MAC + PROBE_SRC_MAC + b"\x08\x00" + header + udp
+
+
+def parse_probe(data):
+    """ (path id, seq, send time) of a probe frame, or None if the frame is not a probe. """
+    if len(data) < 42 + _PAYLOAD.size or data[30:34] != _PROBE_IP or data[23] != 17:
+        return None
+    l4 = 14 + (data[14] & 0x0f) * 4
+    magic, path_id, seq, sent = _PAYLOAD.unpack_from(data, l4 + 8)
+    if magic != PROBE_MAGIC:
+        return None
+    return path_id, seq, sent
+
+
+class PathEstimate(object):
+    __slots__ = ("links", "src", "dst", "first_port", "next_due", "in_flight", "delay", "jitter", "last",
+                 "samples", "sent", "received", "lost", "lost_in_row")
+
+    def __init__(self, path, next_due):
+        self.links = path.links
+        self.src = path.src
+        self.dst = path.dst
+        self.first_port = path.first_port
+        self.next_due = next_due
+        self.in_flight = {}  # seq -> send time
+        self.delay = None  # smoothed one-way delay, ms
+        self.jitter = 0.0  # ms
+        self.last = None  # last sample, ms
+        self.samples = 0
+        self.sent = 0
+        self.received = 0
+        self.lost = 0
+        self.lost_in_row = 0
+
+    def sample(self, delay):
+        if self.delay is None:
+            self.delay = delay
+        else:
+            self.delay += (delay - self.delay) / 8.0
+        if self.last is not None:
+            self.jitter += (abs(delay - self.last) - self.jitter) / 16.0
+        self.last = delay
+        self.samples += 1
+
+
+class PathProber(object):
+
+    def __init__(self, interval=0.5, rate=50.0, max_outstanding=4, timeout=2.0, min_samples=3):
+        self.interval = interval
+        self.rate = rate  # probes per second, all paths together
+        self.max_outstanding = max_outstanding
+        self.timeout = timeout
+        self.min_samples = min_samples
+        self.paths = {}  # probe id -> PathEstimate
+        self.ids = {}  # links of a path -> probe id
+        self._next_id = 1
+        self._seq = 0
+        self._credit = 0.0
+        self._last_tick = None
+        self.late = 0  # probes back after they were counted as lost
+        self.misrouted = 0  # probes that came back from another switch than the end of their path
+
+    def set_paths(self, paths, now):
+        """ Probe these paths from now on; estimates of paths that are still probed are kept. """
+        wanted = {}
+        for path in paths:
+            if path.links and path.links not in wanted:
+                wanted[path.links] = path
+        for links in [links for links in self.ids if links not in wanted]:
+            del self.paths[self.ids.pop(links)]
+        for i, (links, path) in enumerate(sorted(wanted.items())):
+            if links not in self.ids:
+                self.ids[links] = self._next_id
+                # spread the first probes of the paths over one interval
+                self.paths[self._next_id] = PathEstimate(path, now + self.interval * i / len(wanted))
+                self._next_id += 1
+
+    def tick(self, now):
+        """ Probes to send now: list of (PathEstimate, probe id, seq); lost probes are accounted for. """
+        if self._last_tick is not None:
+            self._credit = min(self._credit + (now - self._last_tick) * self.rate, max(self.rate, 1.0))
+        else:
+            self._credit = 1.0
+        self._last_tick = now
+        probes = []
+        for probe_id, estimate in self.paths.items():
+            for seq, sent in list(estimate.in_flight.items()):
+                if now - sent > self.timeout:
+                    del estimate.in_flight[seq]
+                    estimate.lost += 1
+                    estimate.lost_in_row += 1
+                    if estimate.lost_in_row > 1:
+                        estimate.sample(self.timeout * 1000.0)
+            if now < estimate.next_due or len(estimate.in_flight) >= self.max_outstanding or self._credit < 1.0:
+                continue
+            self._credit -= 1.0
+            self._seq = (self._seq + 1) & 0xffffffff
+            estimate.in_flight[self._seq] = now
+            estimate.sent += 1
+            estimate.next_due = now + self.interval
+            probes.append((estimate, probe_id, self._seq))
+        return probes
+
+    def cancel(self, estimate, seq):
+        # the probe could not be sent
+        if estimate.in_flight.pop(seq, None) is not None:
+            estimate.sent -= 1
+
+    def received(self, probe_id, seq, sent, dpid, now, correction=0.0):
+        """
+        Probe back from switch dpid: returns the PathEstimate with the new sample, or None for unknown, late
+        or misrouted probes. correction: control channel latency (s) to take off the measured time.
+        """
+        estimate = self.paths.get(probe_id)
+        if estimate is None:
+            return None
+        if dpid != estimate.dst:
+            self.misrouted += 1
+            return None
+        if estimate.in_flight.pop(seq, None) is None:
+            self.late += 1
+            return None
+        estimate.received += 1
+        estimate.lost_in_row = 0
+        estimate.sample(max(now - sent - correction, 0.0) * 1000.0)
+        return estimate
+
+    def delay(self, links, default):
+        """ Measured delay (ms) of the path with these links, or `default` while it is not known yet. """
+        probe_id = self.ids.get(links)
+        if probe_id is None:
+            return default
+        estimate = self.paths[probe_id]
+        if estimate.samples < self.min_samples:
+            return default
+        return estimate.delay
+
+    def counters(self):
+        return dict((estimate.links, {"delay": estimate.delay, "jitter": estimate.jitter, "sent": estimate.sent,
+                                      "received": estimate.received, "lost": estimate.lost})
+                    for estimate in self.paths.values())
@@ -0,0 +1,112 @@
+"""
+ Per-class queues of the links between switches, shared by routing_net.py (which sets them up) and
+ routing_controller.py (which puts the flows in them and polls their statistics).
+
+ Every inter-switch port gets an HTB tree in place of the single class of a Mininet TCLink:
+    1:100          the link rate (rate = ceil = the bandwidth of the link)
+      1:1          queue 0, best effort: guaranteed `share` of the link rate, may borrow up to all of it,
+      1:2          queue 1, intents: guaranteed its share, served first (lower HTB prio) when both have traffic,
+ each class with its own netem leaf carrying the delay and loss of the link and MAX_QUEUE_SIZE packets, so a
+ flood of best-effort packets fills its own queue and not the one of the intent flows. The default class is the
+ best-effort one: packets that are only output (ARP, static rules without a class) land there.
+
+ Open vSwitch maps the OpenFlow enqueue action on queue N to the Linux skb priority 1:(N+1) (with no QoS
+ record on the port it leaves the qdisc of the interface alone), so the classes above are the OpenFlow queues
+ 0 and 1 of the port. The edge marks the intent flows with DSCP EF (INTENT_TOS) when it enqueues them, so the
+ static rules of the other switches put them in the intent queue by their ToS.
+
+ QueueStats turns the queue statistics replies (OFPST_QUEUE: bytes, packets and errors, i.e. drops, per queue)
+ into per-queue rates and drop counts, and totals per class. OpenFlow 1.0 has no queue delay: the delay of the
+ intent class is the one measured by the delay probes (routing_probes.py), which are sent in the intent queue.
+
+ The module does not depend on POX.
+"""
+
+import math
+
+BEST_EFFORT = 0
+INTENT = 1
+INTENT_TOS = 0xb8  # DSCP EF (46) in the ToS byte
+
+# (queue id, name, share of the link rate guaranteed to the class, HTB prio)
+QUEUES = ((BEST_EFFORT, "best-effort", 0.3, 1),
+          (INTENT, "intent", 0.7, 0))
+
+
+def htb_commands(intf, bw, delay=0.0, loss=0.0, limit=1000, queues=QUEUES):
+    """ tc commands replacing the qdisc of the interface with the classes of `queues` (bw in Mbit/s, delay in ms). """
+    commands = ["tc qdisc del dev %s root" % intf,
+                "tc qdisc add dev %s root handle 1: htb default %x" % (intf, BEST_EFFORT + 1),
+                "tc class add dev %s parent 1: classid 1:100 htb rate %gmbit ceil %gmbit" % (intf, bw, bw)]
+    for queue_id, name, share, prio in queues:
+        commands.append("tc class add dev %s parent 1:100 classid 1:%x htb rate %gmbit ceil %gmbit prio %d"
+                        % (intf, queue_id + 1, bw * share, bw, prio))
+        netem = "tc qdisc add dev %s parent 1:%x handle %x: netem limit %d" % (intf, queue_id + 1, queue_id + 10,
+                                                                             limit)
+        if delay:
+            netem += " delay %gms" % delay
+        if loss:
+            netem += " loss %g%%" % loss
+        commands.append(netem)
+    return commands
+
+
+class QueueCounters(object):
+    __slots__ = ("time", "tx_bytes", "tx_packets", "tx_errors", "bitrate", "drops")
+
+    def __init__(self):
+        self.time = None
+        self.tx_bytes = 0
+        self.tx_packets = 0
+        self.tx_errors = 0
+        self.bitrate = 0.0  # EWMA, bit/s
+        self.drops = 0  # errors counted since the queue was first seen
+
+
+class QueueStats(object):
+
+    def __init__(self, tau=2.0, queues=QUEUES):
+        self.tau = tau
+        self.names = dict((queue_id, name) for queue_id, name, share, prio in queues)
+        self.queues = {}  # (dpid, port, queue id) -> QueueCounters
+
+    def __len__(self):
+        return len(self.queues)
+
+    def update(self, dpid, t, entries):
+        """
+        Queue statistics of the switch sampled at time t: entries of (port, queue id, tx_bytes, tx_packets,
+        tx_errors). Returns (port, queue id, bit/s, packets dropped) for the queues that were sampled before.
+        """
+        samples = []
+        for port, queue_id, tx_bytes, tx_packets, tx_errors in entries:
+            state = self.queues.get((dpid, port, queue_id))
+            if state is None:
+                state = self.queues[(dpid, port, queue_id)] = QueueCounters()
+            elif t > state.time and tx_bytes >= state.tx_bytes:
+                dt = t - state.time
+                rate = (tx_bytes - state.tx_bytes) * 8.0 / dt
+                state.bitrate += (1.0 - math.exp(-dt / self.tau)) * (rate - state.bitrate)
+                dropped = max(tx_errors - state.tx_errors, 0)
+                state.drops += dropped
+                samples.append((port, queue_id, rate, dropped))
+            elif t <= state.time:
+                continue  # an older reply
+            state.time, state.tx_bytes, state.tx_packets, state.tx_errors = t, tx_bytes, tx_packets, tx_errors
+        return samples
+
+    def forget_switch(self, dpid):
+        for key in [key for key in self.queues if key[0] == dpid]:
+            del self.queues[key]
+
+    def classes(self):
+        """ Per class: queues, bit/s (sum of the EWMAs), packets sent and dropped. """
+        totals = {}
+        for (dpid, port, queue_id), state in self.queues.items():
+            name = self.names.get(queue_id, str(queue_id))
+            total = totals.setdefault(name, {"queues": 0, "bitrate": 0.0, "packets": 0, "drops": 0})
+            total["queues"] += 1
+            total["bitrate"] += state.bitrate
+            total["packets"] += state.tx_packets
+            total["drops"] += state.drops
+        return totals
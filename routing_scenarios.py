@@ -0,0 +1,303 @@
+"""
+ Scenario runner used by routing_net.py.
+
+ A scenario is declared in a JSON file (scenarios.json) as a set of traffic flows started together:
+
+    {"scenarios": [
+        {"name": "intents", "capture": "test_1", "flows": [
+            {"name": "h1-h4", "kind": "ping", "src": "h1", "dst": "h4", "count": 50, "interval": 0.2, "size": 1400},
+            {"name": "load", "kind": "udp", "src": "h1", "dst": "h4", "rate": "1.2M", "duration": 30, "start": 5}
+        ]}
+    ]}
+
+ Flow kinds: "ping" (count, interval, size), "udp" (iperf at `rate` bit/s, with K/M/G suffixes) and "tcp" (iperf);
+ a flow starts `start` seconds after the scenario. Every flow is a process of its own, so independent flows
+ run concurrently, and iperf servers are started (and waited for) before their clients. A ping flow with
+ "timestamps": true also reports the longest gap between two replies (max_gap_ms) and the outage it means
+ (outage_ms: the gap less the interval), e.g. the recovery time after a link failure.
+
+ A scenario may also set links down and up again while its flows run:
+
+    "events": [{"at": 5, "link": "s1-s4", "state": "down"}, {"at": 15, "link": "s1-s4", "state": "up"}]
+
+ Every event gives a record of its own (kind "event") with the time it was applied.
+
+ Instead of fixed sleeps the runner waits for readiness conditions, polling them until a timeout:
+    - every switch connected to the controller,
+    - the hosts of the scenario reaching each other (one ping per pair),
+    - the static rules installed (every switch has flow entries; the edge switches get theirs once the
+      controller has learned the hosts),
+    - the tcpdump captures of the scenario running ("listening on" in their output).
+
+ Every flow gives a result record (sent, received, loss, RTT, throughput, jitter, status); the records of all
+ scenarios are returned and written as JSON by routing_net.py.
+
+ The module does not import Mininet; it works on the objects of a started Mininet network.
+"""
+
+import json
+import os
+import re
+import subprocess
+import time
+
+SCENARIOS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios.json")
+IPERF_PORT = 5001
+
+_PING_COUNTS = re.compile(r"(\d+) packets transmitted, (\d+) (?:packets )?received")
+_PING_RTT = re.compile(r"= ([\d.]+)/([\d.]+)/([\d.]+)/([\d.]+) ms")
+_PING_REPLY = re.compile(r"^\[([\d.]+)\] \d+ bytes from .*icmp_seq=(\d+)", re.M)
+
+
+def wait_until(condition, timeout, interval=0.1):
+    """ Poll condition() until it is true (returns True) or `timeout` seconds have passed (returns False). """
+    deadline = time.time() + timeout
+    while True:
+        if condition():
+            return True
+        if time.time() >= deadline:
+            return False
+        time.sleep(interval)
+
+
+def parse_rate(value):
+    """ "1.2M" -> 1200000.0 (bit/s) """
+    text = str(value).strip().upper()
+    scale = {"K": 1e3, "M": 1e6, "G": 1e9}.get(text[-1:], 1.0)
+    return float(text[:-1] if scale != 1.0 else text) * scale
+
+
+def load_scenarios(path=SCENARIOS_FILE):
+    with open(path) as f:
+        data = json.load(f)
+    return data.get("scenarios", []) if isinstance(data, dict) else data
+
+
+def ping_result(output):
+    result = {}
+    counts = _PING_COUNTS.search(output)
+    if counts:
+        sent, received = int(counts.group(1)), int(counts.group(2))
+        result.update(sent=sent, received=received,
+                      loss_pct=round(100.0 * (sent - received) / sent, 2) if sent else None)
+    rtt = _PING_RTT.search(output)
+    if rtt:
+        result.update(rtt_min_ms=float(rtt.group(1)), rtt_avg_ms=float(rtt.group(2)),
+                      rtt_max_ms=float(rtt.group(3)), rtt_mdev_ms=float(rtt.group(4)))
+    return result
+
+
+def ping_gaps(output, interval):
+    # longest gap between two consecutive replies of `ping -D` (timestamped lines), and the outage it means
+    times = [float(t) for t, seq in _PING_REPLY.findall(output)]
+    if len(times) < 2:
+        return {}
+    gap = max(b - a for a, b in zip(times, times[1:]))
+    return {"max_gap_ms": round(gap * 1000.0, 1), "outage_ms": round(max(gap - interval, 0.0) * 1000.0, 1)}
+
+
+def iperf_result(output, udp):
+    # iperf -y C: one CSV line per report; for UDP the last one is the report of the server with the
+    # jitter (ms), lost and sent datagrams
+    lines = [line.split(",") for line in output.splitlines() if line.count(",") >= 8]
+    if not lines:
+        return {}
+    last = lines[-1]
+    result = {"bytes": int(last[7]), "throughput_bps": float(last[8])}
+    if udp and len(last) >= 13:
+        result.update(jitter_ms=float(last[9]), sent=int(last[11]), received=int(last[11]) - int(last[10]),
+                      loss_pct=float(last[12]))
+    return result
+
+
+class Flow(object):
+
+    def __init__(self, spec, index):
+        self.name = spec.get("name", "%s-%s-%d" % (spec["src"], spec["dst"], index))
+        self.kind = spec.get("kind", "ping")
+        if self.kind not in ("ping", "udp", "tcp"):
+            raise ValueError("flow %s: unknown kind %r" % (self.name, self.kind))
+        self.src = spec["src"]
+        self.dst = spec["dst"]
+        self.start = float(spec.get("start", 0.0))
+        self.size = int(spec.get("size", 1400 if self.kind != "tcp" else 0))
+        self.count = int(spec.get("count", 10))
+        self.interval = float(spec.get("interval", 0.2))
+        self.duration = float(spec.get("duration", 10.0))
+        self.rate = parse_rate(spec.get("rate", "1M"))
+        self.port = int(spec.get("port", IPERF_PORT + index))
+        self.timestamps = bool(spec.get("timestamps", False))
+
+    def expected_time(self):
+        if self.kind == "ping":
+            return self.count * self.interval
+        return self.duration
+
+    def server(self):
+        if self.kind == "ping":
+            return None
+        return ["iperf", "-s", "-p", str(self.port)] + (["-u"] if self.kind == "udp" else [])
+
+    def client(self, dst_ip):
+        if self.kind == "ping":
+            output = ["-D", "-O"] if self.timestamps else ["-q"]
+            return ["ping"] + output + ["-c", str(self.count), "-i", str(self.interval), "-s", str(self.size), dst_ip]
+        command = ["iperf", "-c", dst_ip, "-p", str(self.port), "-t", "%g" % self.duration, "-y", "C"]
+        if self.kind == "udp":
+            command += ["-u", "-b", str(int(self.rate)), "-l", str(self.size)]
+        return command
+
+    def result(self, output):
+        if self.kind == "ping":
+            result = ping_result(output)
+            if self.timestamps:
+                result.update(ping_gaps(output, self.interval))
+            return result
+        return iperf_result(output, self.kind == "udp")
+
+
+class LinkEvent(object):
+
+    def __init__(self, spec):
+        self.start = float(spec["at"])
+        self.link = spec["link"]
+        self.ends = self.link.split("-")
+        if len(self.ends) != 2:
+            raise ValueError("link event: a link is given as <switch>-<switch>, not %r" % self.link)
+        self.state = spec.get("state", "down")
+        if self.state not in ("down", "up"):
+            raise ValueError("link event %s: unknown state %r" % (self.link, self.state))
+
+
+class ScenarioRunner(object):
+
+    def __init__(self, net, capture_interfaces=(), timeout=60.0, log=print):
+        self.net = net
+        self.capture_interfaces = list(capture_interfaces)  # interfaces captured when a scenario asks for it
+        self.timeout = timeout
+        self.log = log
+
+    # ---------------------------------------------------------------- readiness conditions
+    def switches_connected(self):
+        return all(switch.connected() for switch in self.net.switches)
+
+    def rules_installed(self):
+        return all("priority=" in switch.dpctl("dump-flows") for switch in self.net.switches)
+
+    def reachable(self, pairs):
+        return all(" 0% packet loss" in self.net.get(src).cmd("ping -c 1 -W 1 %s" % self.net.get(dst).IP())
+                   for src, dst in pairs)
+
+    def _wait(self, what, condition):
+        start = time.time()
+        if not wait_until(condition, self.timeout, 0.2):
+            raise RuntimeError("timeout waiting for %s" % what)
+        self.log("ready: %s (%.1f s)" % (what, time.time() - start))
+
+    def wait_network(self):
+        self._wait("switches connected", self.switches_connected)
+
+    # ---------------------------------------------------------------- captures
+    def start_capture(self, tag):
+        captures = []
+        for interface in self.capture_interfaces:
+            switch = self.net.get(interface.split("-")[0])
+            path = "%s-dump-%s.txt" % (interface, tag)
+            out = open(path, "w")
+            process = switch.popen(["tcpdump", "-l", "-i", interface, "-nn", "-e"], stdout=out,
+                                   stderr=subprocess.STDOUT)
+            captures.append((process, out, path))
+
+        def listening():
+            for process, out, path in captures:
+                with open(path) as f:
+                    if "listening on" not in f.read(4096):
+                        return False
+            return True
+        self._wait("capture %s" % tag, listening)
+        return captures
+
+    def stop_capture(self, captures):
+        for process, out, path in captures:
+            process.terminate()
+            process.wait()
+            out.close()
+
+    # ---------------------------------------------------------------- scenarios
+    def run(self, scenario):
+        name = scenario.get("name", "scenario")
+        flows = [Flow(spec, i) for i, spec in enumerate(scenario.get("flows", ()))]
+        events = sorted((LinkEvent(spec) for spec in scenario.get("events", ())), key=lambda event: event.start)
+        for host in set(flow.src for flow in flows) | set(flow.dst for flow in flows):
+            if host not in self.net:
+                raise ValueError("scenario %s: unknown host %s" % (name, host))
+        for event in events:
+            for switch in event.ends:
+                if switch not in self.net:
+                    raise ValueError("scenario %s: unknown switch %s" % (name, switch))
+        self.log("*** scenario %s: %d flows" % (name, len(flows)))
+        pairs = sorted(set((flow.src, flow.dst) for flow in flows))
+        self._wait("%d host pairs reachable" % len(pairs), lambda: self.reachable(pairs))
+        self._wait("static rules installed", self.rules_installed)
+        captures = self.start_capture(scenario["capture"]) if scenario.get("capture") else []
+
+        servers = []
+        try:
+            for flow in flows:
+                command = flow.server()
+                if command is not None:
+                    dst = self.net.get(flow.dst)
+                    servers.append(dst.popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+                    listening = "ss -ln%s | grep -c ':%d '" % ("u" if flow.kind == "udp" else "t", flow.port)
+                    self._wait("iperf server %s:%d" % (flow.dst, flow.port),
+                               lambda dst=dst, listening=listening: dst.cmd(listening).strip() not in ("", "0"))
+
+            # the flows start (and the link events are applied) at their offsets; the flows run concurrently
+            start = time.time()
+            running = []
+            results = []
+            for item in sorted(flows + events, key=lambda item: item.start):
+                delay = start + item.start - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                if isinstance(item, LinkEvent):
+                    self.net.configLinkStatus(item.ends[0], item.ends[1], item.state)
+                    self.log("link %s %s" % (item.link, item.state))
+                    results.append({"scenario": name, "flow": "link %s %s" % (item.link, item.state), "kind": "event",
+                                    "src": item.ends[0], "dst": item.ends[1], "status": "ok",
+                                    "at_s": round(time.time() - start, 3)})
+                    continue
+                src, dst = self.net.get(item.src), self.net.get(item.dst)
+                running.append((item, time.time(), src.popen(item.client(dst.IP()))))
+
+            for flow, started, process in running:
+                deadline = started + flow.expected_time() + self.timeout
+                status = "ok"
+                try:
+                    output = process.communicate(timeout=max(deadline - time.time(), 0.1))[0]
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    output = process.communicate()[0]
+                    status = "timeout"
+                output = output.decode(errors="replace") if isinstance(output, bytes) else output or ""
+                result = flow.result(output)
+                if status == "ok" and not result:
+                    status = "no output"
+                record = {"scenario": name, "flow": flow.name, "kind": flow.kind, "src": flow.src, "dst": flow.dst,
+                          "status": status, "wall_s": round(time.time() - started, 3)}
+                record.update(result)
+                results.append(record)
+            self.log("*** scenario %s done in %.1f s" % (name, time.time() - start))
+            return results
+        finally:
+            for server in servers:
+                server.terminate()
+                server.wait()
+            self.stop_capture(captures)
+
+    def run_all(self, scenarios):
+        self.wait_network()
+        results = []
+        for scenario in scenarios:
+            results += self.run(scenario)
+        return results
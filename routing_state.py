@@ -0,0 +1,176 @@
+"""
+ Warm restart of routing_controller.py: its routing state is kept in a local file, so a restarted controller takes
+ the flow tables of the switches over instead of deciding everything again from scratch.
+
+ Every `interval` seconds the controller hands a snapshot of its state to the journal (save()). A snapshot is a
+ dictionary of sections of plain values (strings, numbers, lists, dictionaries; no tuples) keyed by strings:
+    - "hosts":   ip -> [mac, dpid, port] of the learned hosts,
+    - "links":   "dpid:port" -> [peer dpid, peer port] of the links between switches,
+    - "flows":   the flows placed at the dynamic edges: their rules at the edge, paths, intents and rates,
+    - "demands", "rates": the demands of the classes of flows and the last rates of the flows (routing_placement.py),
+    - "loads":   "dpid:port" -> the load (bit/s) of every link as last measured.
+ A background thread compares every snapshot with the one written before and appends only the entries that
+ changed or went away, as one JSON line {"t": time, "set": {section: {key: value}}, "del": {section: [keys]}}, so
+ the file grows with the churn of the state, not with its size, and the event loop does no formatting or I/O.
+ When the file grows above `max_bytes` it is compacted: the whole state is written as a single "reset" line to a
+ temporary file that then replaces it, so a crash in the middle leaves either the old file or the new one.
+
+ load() replays the lines of the file; a last line cut short by a crash is ignored and cut off the file, so the
+ next lines are appended after the last complete one.
+
+ The module does not depend on POX.
+"""
+
+import atexit
+import json
+import os
+import threading
+
+SECTIONS = ("hosts", "links", "flows", "demands", "rates", "loads")
+
+_MISSING = object()
+
+
+def link_key(dpid, port):
+    return "%d:%d" % (dpid, port)
+
+
+def parse_link_key(key):
+    dpid, port = key.split(":")
+    return int(dpid), int(port)
+
+
+class StateJournal(object):
+
+    def __init__(self, path, interval=2.0, max_bytes=4 * 1024 * 1024):
+        self.path = path
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.state = {}  # section -> {key: value}, as in the file
+        self.size = 0
+        self.last_save = None
+        self.snapshots = 0  # snapshots handed to the writer
+        self.appended = 0  # lines appended
+        self.changes = 0  # entries written or deleted by them
+        self.compactions = 0
+        self._pending = None  # (time, snapshot) not written yet
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """ State kept in the file, {section: {key: value}} ({} without a file); the journal goes on from it. """
+        state = {}
+        try:
+            with open(self.path, "r+b") as f:
+                end = 0  # offset after the last complete line
+                while True:
+                    line = f.readline()
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        entry = json.loads(line.decode("utf-8"))
+                    except ValueError:
+                        break  # the last line was cut short
+                    end = f.tell()
+                    if entry.get("reset"):
+                        state = {}
+                    for section, values in entry.get("set", {}).items():
+                        state.setdefault(section, {}).update(values)
+                    for section, keys in entry.get("del", {}).items():
+                        values = state.get(section, {})
+                        for key in keys:
+                            values.pop(key, None)
+                f.seek(0, os.SEEK_END)
+                if f.tell() > end:
+                    f.truncate(end)
+                self.size = end
+        except (IOError, OSError):
+            return {}
+        self.state = dict((section, dict(values)) for section, values in state.items())
+        return state
+
+    def due(self, now):
+        return self.last_save is None or now - self.last_save >= self.interval
+
+    def save(self, snapshot, now):
+        """ Hand a snapshot over to the writer; called from the event loop, does no formatting. """
+        self.last_save = now
+        self._pending = (now, snapshot)
+        self.snapshots += 1
+        if self._thread is not None:
+            self._wake.set()
+
+    # ---------------------------------------------------------------- writer side
+    def start(self):
+        if self._thread is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._thread = threading.Thread(target=self._run, name="state-writer")
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(5.0)
+        self.flush()
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def _diff(self, snapshot):
+        # entries of the snapshot that are new or changed, and the keys that went away, per section
+        changed, gone = {}, {}
+        for section in set(snapshot) | set(self.state):
+            new, old = snapshot.get(section, {}), self.state.get(section, {})
+            values = dict((key, value) for key, value in new.items() if old.get(key, _MISSING) != value)
+            keys = [key for key in old if key not in new]
+            if values:
+                changed[section] = values
+            if keys:
+                gone[section] = keys
+        return changed, gone
+
+    def flush(self):
+        """ Write out the last snapshot handed over (in the writer thread, or on stop). """
+        with self._lock:
+            pending, self._pending = self._pending, None
+            if pending is None:
+                return
+            t, snapshot = pending
+            changed, gone = self._diff(snapshot)
+            if not changed and not gone:
+                return
+            line = json.dumps({"t": t, "set": changed, "del": gone}, separators=(",", ":")) + "\n"
+            self.state = dict((section, dict(values)) for section, values in snapshot.items())
+            if self.size + len(line) > self.max_bytes and self.size:
+                self.compact(t)
+            else:
+                with open(self.path, "a") as f:
+                    f.write(line)
+                self.size += len(line)
+                self.appended += 1
+            self.changes += sum(len(values) for values in changed.values()) + sum(len(keys) for keys in gone.values())
+
+    def compact(self, t):
+        # the whole state in one line, in a new file replacing the old one
+        line = json.dumps({"t": t, "reset": True, "set": self.state}, separators=(",", ":")) + "\n"
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            f.write(line)
+        os.replace(temporary, self.path)
+        self.size = len(line)
+        self.compactions += 1
+
+    def counters(self):
+        return {"snapshots": self.snapshots, "appended": self.appended, "changes": self.changes,
+                "compactions": self.compactions, "bytes": self.size}
@@ -0,0 +1,176 @@
+"""
+ Port statistics store used by routing_controller.py.
+
+ Every (dpid, port) gets a row of preallocated NumPy ring buffers holding the last `capacity` samples of the
+ port counters together with the time each sample was taken. Rates are computed from the real time between
+ samples (not from the polling period) and are kept both as an EWMA (time-aware smoothing with time
+ constant `tau`) and as averages over a time window. Queries over many ports at once (e.g. utilization of
+ all candidate egress ports of a routing decision) are vectorized.
+
+ Counter decreases (switch restart, port re-creation, counter wrap) restart the history of the port instead
+ of producing huge or negative rates, and samples older than the newest one stored for the port (late or
+ out-of-order replies) are ignored.
+"""
+
+import numpy as np
+
+FIELDS = ("tx_bytes", "rx_bytes", "tx_packets", "rx_packets", "tx_dropped", "rx_dropped")
+TX_BYTES, RX_BYTES, TX_PACKETS, RX_PACKETS, TX_DROPPED, RX_DROPPED = range(len(FIELDS))
+
+
+def port_counters(f):
+    """ Counters of an ofp_port_stats entry in the order of FIELDS. """
+    return (f.tx_bytes, f.rx_bytes, f.tx_packets, f.rx_packets, f.tx_dropped, f.rx_dropped)
+
+
+class PortStatsStore(object):
+
+    def __init__(self, capacity=32, tau=2.0, window=5.0, rows=64):
+        self.capacity = capacity
+        self.tau = tau  # time constant of the EWMA in seconds
+        self.window = window  # default window of the windowed averages in seconds
+        self.index = {}  # (dpid, port) -> row
+        self.keys = []  # row -> (dpid, port)
+        self.resets = 0
+        self.stale = 0
+        self._allocate(rows)
+
+    def _allocate(self, rows):
+        fields = len(FIELDS)
+        old = getattr(self, "counters", None)
+        counters = np.zeros((rows, self.capacity, fields), dtype=np.int64)
+        times = np.full((rows, self.capacity), np.nan)
+        head = np.zeros(rows, dtype=np.int64)  # slot of the next sample
+        count = np.zeros(rows, dtype=np.int64)  # number of valid samples
+        last_time = np.full(rows, -np.inf)
+        ewma = np.zeros((rows, fields))
+        rate = np.zeros((rows, fields))  # rate between the two newest samples
+        if old is not None:
+            n = len(old)
+            counters[:n], times[:n], head[:n], count[:n] = self.counters, self.times, self.head, self.count
+            last_time[:n], ewma[:n], rate[:n] = self.last_time, self.ewma, self.rate
+        self.counters, self.times, self.head, self.count = counters, times, head, count
+        self.last_time, self.ewma, self.rate = last_time, ewma, rate
+
+    def row(self, dpid, port):
+        row = self.index.get((dpid, port))
+        if row is None:
+            row = len(self.keys)
+            if row >= len(self.counters):
+                self._allocate(2 * len(self.counters))
+            self.index[(dpid, port)] = row
+            self.keys.append((dpid, port))
+        return row
+
+    def rows(self, keys):
+        # rows of the given ports, -1 for ports without statistics
+        index = self.index
+        return np.array([index.get(key, -1) for key in keys], dtype=np.int64)
+
+    def update(self, dpid, t, entries):
+        """
+        Store one stats reply of switch dpid: entries is a list of (port, counters) with the counters
+        in the order of FIELDS, t the time at which the switch took the sample.
+        """
+        if not entries:
+            return
+        rows = np.array([self.row(dpid, port) for port, values in entries], dtype=np.int64)
+        values = np.array([values for port, values in entries], dtype=np.int64)
+
+        fresh = t > self.last_time[rows]
+        self.stale += int(np.count_nonzero(~fresh))
+        rows, values = rows[fresh], values[fresh]
+        if not len(rows):
+            return
+
+        has_previous = self.count[rows] > 0
+        previous = self.counters[rows, (self.head[rows] - 1) % self.capacity]
+        delta = values - previous
+        reset = has_previous & (delta < 0).any(axis=1)
+        if reset.any():
+            self.resets += int(np.count_nonzero(reset))
+            self.count[rows[reset]] = 0
+            self.times[rows[reset]] = np.nan
+
+        measured = has_previous & ~reset
+        if measured.any():
+            m_rows = rows[measured]
+            dt = t - self.last_time[m_rows]
+            rate = delta[measured] / dt[:, None]
+            # time-aware EWMA: the weight of the new sample grows with the time elapsed since the previous one
+            weight = np.where(self.count[m_rows] > 1, 1.0 - np.exp(-dt / self.tau), 1.0)[:, None]
+            self.ewma[m_rows] += weight * (rate - self.ewma[m_rows])
+            self.rate[m_rows] = rate
+        self.ewma[rows[~measured]] = 0.0
+        self.rate[rows[~measured]] = 0.0
+
+        slots = self.head[rows]
+        self.counters[rows, slots] = values
+        self.times[rows, slots] = t
+        self.head[rows] = (slots + 1) % self.capacity
+        self.count[rows] = np.minimum(self.count[rows] + 1, self.capacity)
+        self.last_time[rows] = t
+
+    # ---------------------------------------------------------------- queries
+    def ewma_rates(self, keys, field=TX_BYTES):
+        rows = self.rows(keys)
+        return np.where(rows >= 0, self.ewma[rows, field], 0.0)
+
+    def window_rates(self, keys, field=TX_BYTES, window=None):
+        """ Average rate of the field over the last `window` seconds of samples of every port. """
+        window = self.window if window is None else window
+        rows = self.rows(keys)
+        valid = rows >= 0
+        rows = np.where(valid, rows, 0)
+        newest = (self.head[rows] - 1) % self.capacity
+        newest_t = self.last_time[rows]
+        times = self.times[rows]
+        with np.errstate(invalid="ignore"):
+            inside = times >= (newest_t - window)[:, None]
+        oldest = np.argmin(np.where(inside, times, np.inf), axis=1)
+        arange = np.arange(len(rows))
+        dt = newest_t - times[arange, oldest]
+        change = self.counters[rows, newest, field] - self.counters[rows, oldest, field]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rates = np.where(dt > 0, change / dt, 0.0)
+        return np.where(valid & np.isfinite(rates), rates, 0.0)
+
+    def last_rates(self, keys, field=TX_BYTES):
+        """ Rate of the field between the two newest samples of every port. """
+        rows = self.rows(keys)
+        return np.where(rows >= 0, self.rate[rows, field], 0.0)
+
+    def rates(self, keys, field=TX_BYTES, kind="ewma"):
+        if kind == "ewma":
+            return self.ewma_rates(keys, field)
+        if kind == "last":
+            return self.last_rates(keys, field)
+        return self.window_rates(keys, field)
+
+    def bitrates(self, keys, kind="ewma"):
+        return self.rates(keys, TX_BYTES, kind) * 8
+
+    def utilization(self, keys, capacities, kind="ewma"):
+        """ Sent bitrate of the ports divided by the capacities (bit/s) of the links behind them. """
+        return self.bitrates(keys, kind) / np.asarray(capacities, dtype=float)
+
+    def bitrate(self, dpid, port, kind="ewma"):
+        return float(self.bitrates([(dpid, port)], kind)[0])
+
+    def last_delta(self, dpid, port, field):
+        # change of a counter between the two newest samples of the port (0 if there are fewer samples)
+        row = self.index.get((dpid, port))
+        if row is None or self.count[row] < 2:
+            return 0
+        newest = (self.head[row] - 1) % self.capacity
+        return int(self.counters[row, newest, field] - self.counters[row, newest - 1, field])
+
+    def forget_switch(self, dpid):
+        # the rows are kept (and reused if the switch comes back), only their history is dropped
+        for (row_dpid, port), row in self.index.items():
+            if row_dpid == dpid:
+                self.count[row] = 0
+                self.times[row] = np.nan
+                self.last_time[row] = -np.inf
+                self.ewma[row] = 0.0
+                self.rate[row] = 0.0
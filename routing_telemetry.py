@@ -0,0 +1,208 @@
+"""
+ Telemetry of routing_controller.py.
+
+ The handlers of the controller run on the single event loop of POX, so they must not format or write
+ anything. They append compact records (tuples of the raw values: numbers, switch names, packed addresses)
+ to an in-memory ring buffer; a background thread takes the records out in batches every `flush_interval`
+ seconds, formats them and appends them to files in `directory`:
+    - JSONL: one telemetry.jsonl file, one object per record with its kind,
+    - CSV:   one <kind>.csv file per kind of record, with a header line.
+ Files are rotated when they grow above `max_bytes` (telemetry.jsonl.1, .2, ... up to `backups`).
+
+ Every kind of record has a verbosity level; records above the configured level are not produced at all
+ (the handlers test the `info` / `debug` flags before building them). When the writer cannot keep up the
+ oldest records are overwritten and counted in `dropped`; the controller is never slowed down.
+"""
+
+import atexit
+import collections
+import csv
+import io
+import json
+import os
+import socket
+import threading
+
+LEVELS = {"off": 0, "info": 1, "debug": 2}
+
+# kind -> (level, fields after the time); "ports" records hold a list of (port, counters) and give one row per port
+KINDS = {
+    "link": (1, ("src", "src_port", "dst", "dst_port", "bitrate", "sent", "received")),
+    "decision": (1, ("dpid", "src_ip", "dst_ip", "proto", "sport", "dport", "out_port", "delay", "intent")),
+    "migration": (1, ("dpid", "port", "load", "flows", "rate")),
+    "probe": (1, ("src", "port", "dst", "delay", "smoothed", "jitter", "lost")),
+    "forecast": (1, ("dpid", "port", "predicted", "actual", "error")),
+    "failover": (1, ("dpid", "port", "state", "flows", "elapsed_ms")),
+    "queue": (1, ("dpid", "port", "queue", "bitrate", "dropped")),
+    "flow_removed": (2, ("dpid", "reason", "priority", "duration", "packets", "bytes")),
+    "ports": (2, ("dpid", "port", "tx_bytes", "rx_bytes", "tx_packets", "rx_packets", "tx_dropped", "rx_dropped")),
+}
+
+
+def _value(value):
+    # packed IPv4 addresses are written in dotted notation, other bytes in hex
+    if isinstance(value, bytes):
+        return socket.inet_ntoa(value) if len(value) == 4 else value.hex()
+    return value
+
+
+def _rows(kind, record):
+    t, values = record[1], record[2:]
+    if kind == "ports":
+        dpid, entries = values
+        for port, counters in entries:
+            yield (t, dpid, port) + tuple(counters)
+    else:
+        yield (t,) + tuple(_value(value) for value in values)
+
+
+class _RotatingFile(object):
+
+    def __init__(self, path, max_bytes, backups, header=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.header = header
+        self.file = None
+        self.size = 0
+
+    def _open(self):
+        self.file = open(self.path, "a")
+        self.size = self.file.tell()
+        if self.size == 0 and self.header:
+            self.file.write(self.header)
+            self.size = len(self.header)
+
+    def write(self, text):
+        if self.file is None:
+            self._open()
+        elif self.size + len(text) > self.max_bytes and self.size:
+            self.rotate()
+        self.file.write(text)
+        self.size += len(text)
+
+    def rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists("%s.%d" % (self.path, i)):
+                os.replace("%s.%d" % (self.path, i), "%s.%d" % (self.path, i + 1))
+        if self.backups:
+            os.replace(self.path, self.path + ".1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class Telemetry(object):
+
+    def __init__(self, directory="telemetry", level="info", fmt="jsonl", capacity=65536, flush_interval=1.0,
+                 max_bytes=16 * 1024 * 1024, backups=5):
+        if level not in LEVELS:
+            raise ValueError("unknown telemetry level %r (one of %s)" % (level, ", ".join(LEVELS)))
+        if fmt not in ("jsonl", "csv"):
+            raise ValueError("unknown telemetry format %r (jsonl or csv)" % fmt)
+        self.directory = directory
+        self.level = LEVELS[level]
+        self.info = self.level >= LEVELS["info"]
+        self.debug = self.level >= LEVELS["debug"]
+        self.fmt = fmt
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffer = collections.deque(maxlen=capacity)
+        self.emitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.files = {}
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def emit(self, kind, *values):
+        """ Queue a record (kind, time, values...); called from the event loop, does no formatting. """
+        if len(self.buffer) >= self.capacity:
+            self.dropped += 1
+        self.buffer.append((kind,) + values)
+        self.emitted += 1
+
+    # ---------------------------------------------------------------- writer side
+    def start(self):
+        if self.level == 0 or self._thread is not None:
+            return
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer")
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(5.0)
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+    def _run(self):
+        while not self._stop:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _file(self, kind):
+        name = "telemetry.jsonl" if self.fmt == "jsonl" else kind + ".csv"
+        f = self.files.get(name)
+        if f is None:
+            header = None
+            if self.fmt == "csv":
+                header = ",".join(("time",) + KINDS[kind][1]) + "\r\n"
+            f = self.files[name] = _RotatingFile(os.path.join(self.directory, name), self.max_bytes,
+                                                 self.backups, header)
+        return f
+
+    def flush(self):
+        """ Write out everything queued so far (in the writer thread, or on stop). """
+        with self._lock:
+            batches = collections.defaultdict(list)
+            buffer = self.buffer
+            while buffer:
+                try:
+                    record = buffer.popleft()
+                except IndexError:
+                    break
+                batches[record[0]].append(record)
+            for kind, records in batches.items():
+                fields = ("time",) + KINDS[kind][1]
+                out = io.StringIO()
+                if self.fmt == "jsonl":
+                    for record in records:
+                        for row in _rows(kind, record):
+                            item = {"kind": kind}
+                            item.update(zip(fields, row))
+                            out.write(json.dumps(item))
+                            out.write("\n")
+                else:
+                    writer = csv.writer(out)
+                    for record in records:
+                        writer.writerows(_rows(kind, record))
+                f = self._file(kind)
+                f.write(out.getvalue())
+                f.flush()
+                self.written += len(records)
+
+    def counters(self):
+        return {"queued": len(self.buffer), "emitted": self.emitted, "written": self.written,
+                "dropped": self.dropped}
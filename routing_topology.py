@@ -0,0 +1,388 @@
+"""
+ Topology model used by routing_controller.py.
+
+ The controller feeds it with what it learns from the network (switch features, links found by
+ openflow.discovery, PortStatus events, hosts seen in packet_in messages) and asks it for paths.
+ For every pair of edge switches a table of the k shortest paths (Yen's algorithm, link cost =
+ 1 + configured delay in ms) is kept, so a routing decision on the packet_in path is a single
+ dictionary lookup. When a link changes only the table entries that can be affected are dropped
+ and recomputed on the next lookup.
+
+ The module does not depend on POX, so it can be used (and tested) without a running controller.
+"""
+
+import heapq
+import json
+
+OFPP_MAX = 0xff00  # ports above this number are the reserved OpenFlow ports (LOCAL, CONTROLLER, ...)
+
+
+class Host(object):
+    __slots__ = ("ip", "mac", "dpid", "port")
+
+    def __init__(self, ip, mac, dpid, port):
+        self.ip = ip
+        self.mac = mac
+        self.dpid = dpid
+        self.port = port
+
+    def __repr__(self):
+        return "Host(%s, %s, %s:%s)" % (self.ip, self.mac, self.dpid, self.port)
+
+
+class Path(object):
+    """
+    A path between two switches.
+    hops:  ((dpid, in_port, out_port), ...) for every switch of the path except the last one;
+           in_port of the first hop is None (it depends on the host that sends the traffic)
+    links: ((dpid, out_port), ...) directed links used by the path
+    """
+    __slots__ = ("src", "dst", "hops", "links", "delay", "cost", "first_port")
+
+    def __init__(self, topology, src, links):
+        self.src = src
+        self.dst = src
+        self.links = tuple(links)
+        hops = []
+        in_port = None
+        delay = 0
+        for dpid, out_port in self.links:
+            hops.append((dpid, in_port, out_port))
+            self.dst, in_port = topology.links[(dpid, out_port)]
+            delay += topology.link_delay(dpid, out_port)
+        self.hops = tuple(hops)
+        self.delay = delay
+        self.cost = len(self.links) + delay
+        self.first_port = self.links[0][1] if self.links else None
+
+    def nodes(self):
+        return [self.src] + [dpid for dpid, in_port, out_port in self.hops[1:]] + [self.dst]
+
+    def __repr__(self):
+        return "Path(%s->%s via %s, %sms)" % (self.src, self.dst, [link[1] for link in self.links], self.delay)
+
+
+class PathTable(object):
+    """ (src dpid, dst dpid) -> tuple of up to k Paths sorted by cost, plus an index of the entries using each link. """
+
+    def __init__(self, topology, k=3):
+        self.topology = topology
+        self.k = k
+        self.table = {}
+        self.users = {}  # (dpid, out_port) -> set of (src, dst) keys whose paths use the link
+        self.invalidated = set()  # keys dropped since the last precompute() or refresh()
+
+    def get(self, src, dst):
+        paths = self.table.get((src, dst))
+        if paths is None:
+            paths = self._compute(src, dst)
+        return paths
+
+    def precompute(self, switches):
+        self.invalidated.clear()
+        for src in switches:
+            for dst in switches:
+                if src != dst and (src, dst) not in self.table:
+                    self._compute(src, dst)
+
+    def refresh(self, switches):
+        """ Recompute the entries between the given switches dropped since the last precompute() or refresh(). """
+        switches = set(switches)
+        keys = sorted(key for key in self.invalidated
+                      if key[0] in switches and key[1] in switches and key not in self.table)
+        self.invalidated.clear()
+        for src, dst in keys:
+            self._compute(src, dst)
+        return keys
+
+    def invalidate(self, key):
+        paths = self.table.pop(key, None)
+        if paths is not None:
+            self.invalidated.add(key)
+            for path in paths:
+                for link in path.links:
+                    users = self.users.get(link)
+                    if users is not None:
+                        users.discard(key)
+                        if not users:
+                            del self.users[link]
+
+    def link_removed(self, link):
+        # only the entries whose paths go through the link are affected
+        for key in list(self.users.get(link, ())):
+            self.invalidate(key)
+
+    def link_added(self, link):
+        # A new link u->v can only change the entry (s, d) if a path through it, which costs at least
+        # dist(s, u) + cost(u->v) + dist(v, d), beats the k-th path currently stored for the pair.
+        # Links are assumed to be symmetric, so dist(v, d) == dist(d, v).
+        u, out_port = link
+        v = self.topology.links[link][0]
+        if not self.table:
+            return
+        cost = 1 + self.topology.link_delay(u, out_port)
+        dist_u = self.topology.distances(u)
+        dist_v = self.topology.distances(v)
+        infinity = float("inf")
+        for key, paths in list(self.table.items()):
+            src, dst = key
+            via = dist_u.get(src, infinity) + cost + dist_v.get(dst, infinity)
+            if len(paths) < self.k or via < paths[-1].cost:
+                self.invalidate(key)
+
+    def switch_removed(self, dpid):
+        for key in [key for key in self.table if dpid in key]:
+            self.invalidate(key)
+
+    def _compute(self, src, dst):
+        paths = tuple(Path(self.topology, src, links) for links in self.topology.k_shortest(src, dst, self.k))
+        self.table[(src, dst)] = paths
+        for path in paths:
+            for link in path.links:
+                self.users.setdefault(link, set()).add((src, dst))
+        return paths
+
+
+class Topology(object):
+    """ Switches, ports, directed links and hosts of the network, with the path table built on top of them. """
+
+    def __init__(self, k=3, delays=None):
+        self.switches = {}  # dpid -> switch name (e.g. "s1")
+        self.ports = {}  # dpid -> set of physical port numbers
+        self.links = {}  # (dpid, port) -> (peer dpid, peer port)
+        self.out_links = {}  # dpid -> {port: peer dpid}
+        self.hosts = {}  # ip -> Host
+        self.host_ports = {}  # (dpid, port) -> set of host ips
+        self.delays = delays if delays is not None else {}  # (name, name) -> configured delay in ms
+        self.paths = PathTable(self, k)
+
+    # ---------------------------------------------------------------- switches and ports
+    def add_switch(self, dpid, name, ports):
+        self.switches[dpid] = name
+        self.ports[dpid] = set(port for port in ports if port < OFPP_MAX)
+        self.out_links.setdefault(dpid, {})
+
+    def remove_switch(self, dpid):
+        changed = []
+        for port in list(self.out_links.get(dpid, {})):
+            changed += self.remove_port(dpid, port)
+        for (peer, peer_port), (other, other_port) in list(self.links.items()):
+            if other == dpid:
+                changed += self.remove_link(peer, peer_port)
+        for ip in [ip for ip, host in self.hosts.items() if host.dpid == dpid]:
+            self.forget_host(ip)
+        self.switches.pop(dpid, None)
+        self.ports.pop(dpid, None)
+        self.out_links.pop(dpid, None)
+        self.paths.switch_removed(dpid)
+        return changed
+
+    def add_port(self, dpid, port):
+        """ Returns True if the port is new. """
+        ports = self.ports.setdefault(dpid, set())
+        if port >= OFPP_MAX or port in ports:
+            return False
+        ports.add(port)
+        return True
+
+    def remove_port(self, dpid, port):
+        # the port is gone (or down): drop the links in both directions and the hosts behind it
+        changed = self.remove_link(dpid, port)
+        for (other, other_port), (peer_dpid, peer_port) in list(self.links.items()):
+            if (peer_dpid, peer_port) == (dpid, port):
+                changed += self.remove_link(other, other_port)
+        for ip in list(self.host_ports.get((dpid, port), ())):
+            self.forget_host(ip)
+        return changed
+
+    def name(self, dpid):
+        return self.switches.get(dpid, str(dpid))
+
+    def dpid_of(self, name):
+        for dpid, switch_name in self.switches.items():
+            if switch_name == name:
+                return dpid
+        return None
+
+    # ---------------------------------------------------------------- links
+    def add_link(self, dpid1, port1, dpid2, port2):
+        """ Add the directed link dpid1:port1 -> dpid2:port2; returns the list of links that changed. """
+        if self.links.get((dpid1, port1)) == (dpid2, port2):
+            return []
+        changed = self.remove_link(dpid1, port1)
+        self.links[(dpid1, port1)] = (dpid2, port2)
+        self.out_links.setdefault(dpid1, {})[port1] = dpid2
+        # a port that turns out to be a link port was never a host port
+        for ip in list(self.host_ports.get((dpid1, port1), ())):
+            self.forget_host(ip)
+        self.paths.link_added((dpid1, port1))
+        return changed + [(dpid1, port1)]
+
+    def remove_link(self, dpid, port):
+        if (dpid, port) not in self.links:
+            return []
+        del self.links[(dpid, port)]
+        self.out_links.get(dpid, {}).pop(port, None)
+        self.paths.link_removed((dpid, port))
+        return [(dpid, port)]
+
+    def is_link_port(self, dpid, port):
+        return (dpid, port) in self.links
+
+    def link_delay(self, dpid, port):
+        peer = self.links.get((dpid, port))
+        if peer is None:
+            return 0
+        a, b = self.name(dpid), self.name(peer[0])
+        return self.delays.get((a, b), self.delays.get((b, a), 0))
+
+    def link_name(self, dpid, port):
+        peer = self.links.get((dpid, port))
+        if peer is None:
+            return "%s-eth%s" % (self.name(dpid), port)
+        return "%s-%s" % (self.name(dpid), self.name(peer[0]))
+
+    def is_transit_pair(self, dpid):
+        # a switch whose only two ports are both links just cross-connects them, whatever the destination
+        ports = self.ports.get(dpid, ())
+        return len(ports) == 2 and all((dpid, port) in self.links for port in ports)
+
+    # ---------------------------------------------------------------- hosts
+    def learn_host(self, ip, mac, dpid, port):
+        """ Remember where host ip is attached; returns True if the host is new. """
+        if (dpid, port) in self.links or port >= OFPP_MAX:
+            return False
+        # The first location wins: copies of a host's packets re-entering the controller elsewhere
+        # (e.g. ARP flooded before all links were discovered) must not move it. Its location is
+        # forgotten when that port turns out to be a link port or goes down.
+        if ip in self.hosts:
+            return False
+        self.hosts[ip] = Host(ip, mac, dpid, port)
+        self.host_ports.setdefault((dpid, port), set()).add(ip)
+        return True
+
+    def forget_host(self, ip):
+        host = self.hosts.pop(ip, None)
+        if host is not None:
+            ips = self.host_ports.get((host.dpid, host.port))
+            if ips is not None:
+                ips.discard(ip)
+                if not ips:
+                    del self.host_ports[(host.dpid, host.port)]
+        return host
+
+    def edge_switches(self):
+        return sorted(set(host.dpid for host in self.hosts.values()))
+
+    def edge_ports(self, dpid):
+        # physical ports of the switch that do not lead to another switch
+        return sorted(port for port in self.ports.get(dpid, ()) if (dpid, port) not in self.links)
+
+    # ---------------------------------------------------------------- shortest paths
+    def next_hops(self, dst):
+        """ Output port of every switch towards switch dst on a cheapest path (a tree, so hop-by-hop forwarding
+        along it cannot loop). """
+        dist = self.distances(dst)  # links go both ways with the same cost
+        hops = {}
+        for dpid in dist:
+            best = None
+            for port, peer in sorted(self.out_links.get(dpid, {}).items()):
+                if peer in dist:
+                    cost = 1 + self.link_delay(dpid, port) + dist[peer]
+                    if cost == dist[dpid] and best is None:
+                        best = port
+            if best is not None:
+                hops[dpid] = best
+        return hops
+
+    def distances(self, src):
+        """ Cost of the cheapest path from src to every reachable switch. """
+        dist = {src: 0}
+        heap = [(0, src)]
+        while heap:
+            cost, dpid = heapq.heappop(heap)
+            if cost > dist.get(dpid, cost):
+                continue
+            for port, peer in self.out_links.get(dpid, {}).items():
+                new_cost = cost + 1 + self.link_delay(dpid, port)
+                if new_cost < dist.get(peer, new_cost + 1):
+                    dist[peer] = new_cost
+                    heapq.heappush(heap, (new_cost, peer))
+        return dist
+
+    def _shortest(self, src, dst, banned_nodes=(), banned_links=()):
+        # Dijkstra returning the list of directed links of the cheapest src->dst path (or None)
+        dist = {src: 0}
+        previous = {}
+        heap = [(0, src)]
+        while heap:
+            cost, dpid = heapq.heappop(heap)
+            if dpid == dst:
+                links = []
+                while dpid != src:
+                    link = previous[dpid]
+                    links.append(link)
+                    dpid = link[0]
+                links.reverse()
+                return cost, links
+            if cost > dist.get(dpid, cost):
+                continue
+            for port, peer in sorted(self.out_links.get(dpid, {}).items()):
+                if peer in banned_nodes or (dpid, port) in banned_links:
+                    continue
+                new_cost = cost + 1 + self.link_delay(dpid, port)
+                if new_cost < dist.get(peer, new_cost + 1):
+                    dist[peer] = new_cost
+                    previous[peer] = (dpid, port)
+                    heapq.heappush(heap, (new_cost, peer))
+        return None
+
+    def _links_cost(self, links):
+        return sum(1 + self.link_delay(dpid, port) for dpid, port in links)
+
+    def k_shortest(self, src, dst, k):
+        """ Yen's algorithm: up to k loop-free src->dst paths as lists of links, cheapest first. """
+        first = self._shortest(src, dst)
+        if first is None or src == dst:
+            return []
+        found = [first[1]]
+        candidates = []
+        seen = set([tuple(first[1])])
+        while len(found) < k:
+            previous = found[-1]
+            nodes = [src] + [self.links[link][0] for link in previous]
+            for i in range(len(previous)):
+                spur = nodes[i]
+                root = previous[:i]
+                banned_links = set(path[i] for path in found if len(path) > i and path[:i] == root)
+                spur_path = self._shortest(spur, dst, set(nodes[:i]), banned_links)
+                if spur_path is None:
+                    continue
+                links = root + spur_path[1]
+                if tuple(links) not in seen:
+                    seen.add(tuple(links))
+                    heapq.heappush(candidates, (self._links_cost(links), [link[1] for link in links], links))
+            if not candidates:
+                break
+            found.append(heapq.heappop(candidates)[2])
+        return found
+
+
+def load_manifest(path):
+    """
+    Read a network manifest written by routing_net.py. Returns a dict with:
+        link_bw:       {(name, name): bit/s} of the links between switches,
+        link_delay:    {(name, name): ms},
+        dynamic_edges: names of the switches placing their flows,
+        k_paths:       number of candidate paths worth keeping per pair of edge switches.
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+    link_bw = {}
+    link_delay = {}
+    for link in manifest.get("links", ()):
+        key = (link["src"], link["dst"])
+        link_bw[key] = int(float(link.get("bw", 1)) * 1000000)
+        link_delay[key] = float(link.get("delay", 0))
+    return {"link_bw": link_bw, "link_delay": link_delay, "dynamic_edges": tuple(manifest.get("dynamic_edges", ())),
+            "k_paths": manifest.get("k_paths")}
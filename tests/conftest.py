@@ -0,0 +1,34 @@
+"""
+ The modules of the controller sit at the root of the repository, next to routing_controller.py; the tests import
+ them from there. The tests cover the modules that do not depend on POX; test_routing_harness.py runs the
+ controller itself, with the stand-in for POX of routing_harness.py.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from routing_topology import Topology  # noqa: E402
+
+
+@pytest.fixture
+def diamond():
+    """
+    The diamond of routing_net.py: s1 (hosts on ports 1-3) and s5 (hosts on ports 4-6) joined by s2, s3 and s4
+    (10, 20 and 30 ms per link); s1 reaches them on ports 4, 5 and 6 and s5 on ports 1, 2 and 3, they reach s1 on
+    port 1 and s5 on port 2.
+    """
+    delays = {}
+    topology = Topology(k=3, delays=delays)
+    topology.add_switch(1, "s1", [1, 2, 3, 4, 5, 6])
+    topology.add_switch(5, "s5", [1, 2, 3, 4, 5, 6])
+    for i, dpid in enumerate((2, 3, 4)):
+        topology.add_switch(dpid, "s%d" % dpid, [1, 2])
+        delays[("s1", "s%d" % dpid)] = delays[("s%d" % dpid, "s5")] = 10 * (i + 1)
+        for edge, edge_port, port in ((1, 4 + i, 1), (5, 1 + i, 2)):
+            topology.add_link(edge, edge_port, dpid, port)
+            topology.add_link(dpid, port, edge, edge_port)
+    return topology
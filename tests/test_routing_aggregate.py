@@ -0,0 +1,82 @@
+import socket
+import struct
+
+import pytest
+
+from routing_aggregate import Aggregator, LEVELS
+from routing_intents import Intent
+
+PROBE = "10.255.255.254"
+
+
+def ip(text):
+    return struct.unpack("!I", socket.inet_aton(text))[0]
+
+
+def _aggregator(level="prefix", intents=(), **kw):
+    aggregator = Aggregator(level, **kw)
+    hosts = dict((ip("10.0.0.%d" % i), 1) for i in (1, 2, 3))
+    hosts.update((ip("10.0.0.%d" % i), 5) for i in (4, 5, 6))
+    aggregator.compile(hosts, (ip(PROBE),), intents)
+    return aggregator
+
+
+def test_unknown_level():
+    with pytest.raises(ValueError):
+        Aggregator("host")
+
+
+def test_prefixes_hold_the_hosts_of_one_switch():
+    aggregator = _aggregator()
+    # 10.0.0.0/30 holds .1-.3 (behind s1), 10.0.0.4/30 holds .4-.6 (behind s5); /29 would hold both
+    assert aggregator.prefixes[ip("10.0.0.1")] == (ip("10.0.0.0"), 30)
+    assert aggregator.prefixes[ip("10.0.0.6")] == (ip("10.0.0.4"), 30)
+
+
+def test_reserved_address_is_not_covered():
+    aggregator = Aggregator("prefix", min_prefix=8)
+    aggregator.compile({ip("10.0.0.1"): 1, ip("10.255.255.1"): 5}, (ip(PROBE),))
+    prefix, length = aggregator.prefixes[ip("10.255.255.1")]
+    mask = (0xffffffff << (32 - length)) & 0xffffffff
+    assert ip(PROBE) & mask != prefix
+
+
+def test_scope_per_level():
+    aggregator = _aggregator()
+    src, dst = ip("10.0.0.1"), ip("10.0.0.5")
+    assert aggregator.scope(LEVELS.index("flow"), src, dst, 6, 1234, 80) is None
+    pair = aggregator.scope(LEVELS.index("pair"), src, dst, 6, 1234, 80)
+    assert (pair.src, pair.src_len, pair.dst, pair.dst_len, pair.proto) == (src, 32, dst, 32, None)
+    prefix = aggregator.scope(LEVELS.index("prefix"), src, dst, 6, 1234, 80)
+    assert (prefix.src_len, prefix.dst, prefix.dst_len) == (0, ip("10.0.0.4"), 30)
+    assert prefix.key() != pair.key()
+    assert aggregator.decisions == [1, 1, 1]
+
+
+def test_scope_overlapping_another_intent_is_refined():
+    intent = Intent("h1-h4", src="10.0.0.1", dst="10.0.0.4", proto="udp", dport=5000)
+    aggregator = _aggregator(intents=[intent])
+    # best-effort traffic from h2 to h4: the /30 towards h4 does not cover the intent (other source), h1 to h4 does
+    scope = aggregator.scope(LEVELS.index("prefix"), ip("10.0.0.2"), ip("10.0.0.4"), 6, 1234, 80)
+    assert scope is not None and scope.level == LEVELS.index("pair")
+    assert aggregator.scope(LEVELS.index("prefix"), ip("10.0.0.1"), ip("10.0.0.4"), 6, 1234, 80) is None
+    assert aggregator.refined == 3
+
+
+def test_intent_scope_is_narrowed_to_the_intent():
+    intent = Intent("video", src="10.0.0.0/24", dst="10.0.0.4", proto="udp", dport=[5000, 5100])
+    aggregator = _aggregator(intents=[intent])
+    scope = aggregator.scope(LEVELS.index("prefix"), ip("10.0.0.1"), ip("10.0.0.4"), 17, 40000, 5004, intent)
+    assert (scope.src, scope.src_len) == (ip("10.0.0.0"), 24)
+    assert (scope.dst, scope.dst_len) == (ip("10.0.0.4"), 32)
+    assert (scope.proto, scope.sport, scope.dport) == (17, None, 5004)  # a port range: the port of the packet
+
+
+def test_table_budget():
+    aggregator = _aggregator("flow", budget=100, high=0.8)
+    assert aggregator.level_at(79) == 0
+    assert aggregator.level_at(80) == 1
+    assert aggregator.coarsened == 1
+    assert not aggregator.over_budget(99) and aggregator.over_budget(100)
+    assert _aggregator("prefix", budget=100).level_at(90) == 2  # no coarser level
+    assert not _aggregator("flow").near_budget(10 ** 6)
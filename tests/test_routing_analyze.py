@@ -0,0 +1,78 @@
+import struct
+
+from routing_analyze import analyze, read_capture, read_pcap, read_text
+
+MAC = "00:00:00:00:00:01 > 00:00:00:00:00:04, ethertype IPv4 (0x0800)"
+
+
+def icmp(t, seq, src="10.0.0.1", dst="10.0.0.4"):
+    return "%s %s, length 98: %s > %s: ICMP echo request, id 42, seq %d, length 64\n" % (t, MAC, src, dst, seq)
+
+
+def tcp(t, seq):
+    return "%s %s, length 1514: 10.0.0.2.40000 > 10.0.0.5.5001: Flags [.], seq %d:%d, ack 1, length 1448\n" % (
+        t, MAC, seq, seq + 1448)
+
+
+def test_read_text(tmp_path):
+    path = tmp_path / "s2-eth2-dump-test_1.txt"
+    path.write_text("tcpdump: listening on s2-eth2\n" + icmp("10:00:00.500000", 1) + tcp("10:00:01.000000", 1) +
+                    "10:00:02.000000 " + MAC.replace("IPv4 (0x0800)", "ARP (0x0806)") + ", length 42: Request\n")
+    columns = read_text(str(path))
+    assert list(columns["time"]) == [36000.5, 36001.0]
+    assert list(columns["proto"]) == [1, 6]
+    assert list(columns["sport"]) == [42, 40000] and list(columns["dport"]) == [0, 5001]
+    assert list(columns["seq"]) == [1, 1]
+    capture = read_capture(str(path))
+    assert (capture.path, capture.test, len(capture)) == ("s2", "1", 2)
+
+
+def test_capture_past_midnight(tmp_path):
+    path = tmp_path / "s3-eth2-dump-test_2.txt"
+    path.write_text(icmp("23:59:59.500000", 1) + icmp("00:00:00.500000", 2))
+    assert list(read_text(str(path))["time"]) == [86399.5, 86400.5]
+
+
+def test_summary_per_path_and_flow(tmp_path):
+    (tmp_path / "s2-eth2-dump-test_1.txt").write_text(icmp("10:00:00.000000", 1) + icmp("10:00:00.200000", 3))
+    (tmp_path / "s3-eth2-dump-test_1.txt").write_text(icmp("10:00:00.300000", 2) + icmp("10:00:01.500000", 4))
+    (tmp_path / "s2-eth2-dump-test_2.txt").write_text("")
+    results = analyze([str(path) for path in tmp_path.iterdir()])
+    assert list(results) == ["1", "2"]
+    summary = results["1"]
+    assert summary["packets"] == 4 and summary["bytes"] == 4 * 98
+    assert summary["paths"]["s2"]["share"] == 0.5
+    assert summary["paths"]["s3"]["timeline_bps"] == [98 * 8, 98 * 8]
+    flow, = summary["flows"]
+    assert flow["flow"] == "10.0.0.1>10.0.0.4 icmp id 42"
+    assert flow["paths"] == {"s2": 2, "s3": 2}
+    # s2, s2, s3, s3 in time order: one path change; seq 2 after seq 3 is reordered
+    assert flow["path_changes"] == 1 and flow["reordered"] == 1
+    assert results["2"]["packets"] == 0
+
+
+def test_flows_do_not_share_their_sequence_numbers(tmp_path):
+    (tmp_path / "s4-eth2-dump-test_1.txt").write_text(
+        icmp("10:00:00.000000", 100) + icmp("10:00:00.100000", 1, src="10.0.0.2") + icmp("10:00:00.200000", 101))
+    summary = analyze([str(tmp_path / "s4-eth2-dump-test_1.txt")])["1"]
+    assert summary["reordered"] == 0 and len(summary["flows"]) == 2
+
+
+def frame(src, dst, sport, dport, seq):
+    ip = struct.pack("!BBHHHBBH4s4s", 0x45, 0, 40, 0, 0, 64, 6, 0, bytes(src), bytes(dst))
+    return b"\x00" * 12 + b"\x08\x00" + ip + struct.pack("!HHI", sport, dport, seq) + b"\x00" * 12
+
+
+def test_read_pcap(tmp_path):
+    packets = [(1.5, frame([10, 0, 0, 1], [10, 0, 0, 4], 40000, 80, 7)),
+               (2.25, b"\x00" * 12 + b"\x08\x06" + b"\x00" * 28)]
+    data = struct.pack("<IHHiIII", 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1)
+    for t, packet in packets:
+        data += struct.pack("<IIII", int(t), int(round((t % 1) * 1e6)), len(packet), len(packet)) + packet
+    path = tmp_path / "s2-dump-test_3.pcap"
+    path.write_bytes(data)
+    columns = read_pcap(str(path))
+    assert list(columns["time"]) == [1.5]
+    assert list(columns["src"]) == [0x0a000001] and list(columns["dport"]) == [80]
+    assert list(columns["seq"]) == [7] and list(columns["length"]) == [54]
+    assert read_capture(str(path)).test == "3"
@@ -0,0 +1,39 @@
+import socket
+
+from routing_arp import ARP_REPLY, ARP_REQUEST, ArpResponder, arp_reply, parse_arp
+
+H1_MAC, H4_MAC = b"\x00\x00\x00\x00\x00\x01", b"\x00\x00\x00\x00\x00\x04"
+H1_IP, H4_IP = socket.inet_aton("10.0.0.1"), socket.inet_aton("10.0.0.4")
+
+
+def test_reply_round_trip():
+    frame = arp_reply(H4_MAC, H4_IP, H1_MAC, H1_IP)
+    assert frame[:6] == H1_MAC and frame[6:12] == H4_MAC and frame[12:14] == b"\x08\x06"
+    assert parse_arp(frame) == (ARP_REPLY, H4_MAC, H4_IP, H1_MAC, H1_IP)
+
+
+def test_parse_rejects_other_frames():
+    frame = arp_reply(H4_MAC, H4_IP, H1_MAC, H1_IP)
+    assert parse_arp(frame[:30]) is None
+    assert parse_arp(frame[:14] + b"\x00\x06" + frame[16:]) is None  # not Ethernet
+    request = frame[:20] + bytes([0, ARP_REQUEST]) + frame[22:]
+    assert parse_arp(request)[0] == ARP_REQUEST
+
+
+def test_floods_are_held_off_per_target():
+    responder = ArpResponder(flood_holdoff=1.0)
+    assert responder.may_flood(H4_IP, 0.0)
+    assert not responder.may_flood(H4_IP, 0.5)
+    assert responder.may_flood(H1_IP, 0.5)
+    assert responder.may_flood(H4_IP, 1.0)
+    assert not responder.may_flood(H4_IP, 1.5)
+    responder.resolved(H4_IP)
+    assert responder.may_flood(H4_IP, 1.6)
+    assert responder.counters() == {"answered": 0, "relayed": 0, "flooded": 4, "suppressed": 2}
+
+
+def test_flood_table_is_bounded():
+    responder = ArpResponder(flood_holdoff=1.0)
+    for i in range(5000):
+        responder.may_flood(i.to_bytes(4, "big"), float(i))
+    assert len(responder._flooded) <= 4097
@@ -0,0 +1,80 @@
+import struct
+
+from routing_balancer import FlowBalancer, flow_hash, path_seed, rendezvous
+
+
+def flow(i):
+    return struct.pack("!IIBHH", 0x0a000001, 0x0a000004, 6, 10000 + i, 80)
+
+
+def test_hash_is_deterministic():
+    assert flow_hash(flow(1)) == flow_hash(flow(1)) != flow_hash(flow(2))
+    assert path_seed(("s1", "s2")) == path_seed(("s1", "s2"))
+
+
+def test_shares_follow_the_weights():
+    seeds = [path_seed(i) for i in range(3)]
+    counts = [0, 0, 0]
+    for i in range(6000):
+        counts[rendezvous(flow_hash(flow(i)), seeds, [1.0, 2.0, 3.0])] += 1
+    for count, share in zip(counts, (1 / 6.0, 2 / 6.0, 3 / 6.0)):
+        assert abs(count / 6000.0 - share) < 0.03
+    assert rendezvous(flow_hash(flow(0)), seeds, [0.0, 0.0, 1.0]) == 2
+    assert rendezvous(flow_hash(flow(0)), seeds, [0.0, 0.0, 0.0]) is None
+
+
+def test_only_the_flows_of_the_changed_path_move():
+    seeds = [path_seed(i) for i in range(3)]
+    hashes = [flow_hash(flow(i)) for i in range(2000)]
+    before = [rendezvous(h, seeds, [1.0, 1.0, 1.0]) for h in hashes]
+    after = [rendezvous(h, seeds, [1.0, 1.0, 0.5]) for h in hashes]
+    # lowering the weight of path 2 only moves flows away from it
+    assert all(old == new or old == 2 for old, new in zip(before, after))
+    assert sum(old != new for old, new in zip(before, after)) > 0
+
+
+def test_flows_keep_their_path_while_active():
+    balancer = FlowBalancer(pin_ttl=60.0)
+    paths = ["a", "b"]
+    first = balancer.pick(flow(1), paths, [1.0, 1.0], 0.0)
+    weights = [0.0, 0.0]
+    weights[1 - first] = 1.0
+    assert balancer.pick(flow(1), paths, weights, 30.0) == first
+    # once forgotten the flow follows the weights
+    assert balancer.pick(flow(1), paths, weights, 100.0) == 1 - first
+    assert balancer.counters()["new"] == 1 and balancer.kept == 1 and balancer.moved == 1
+
+
+def test_flowlets_move_only_after_a_gap():
+    balancer = FlowBalancer(flowlet_gap=0.5)
+    paths = ["a", "b"]
+    first = balancer.pick(flow(1), paths, [1.0, 1.0], 0.0)
+    weights = [1.0, 1.0]
+    weights[first] = 0.0
+    for t in (0.3, 0.6, 0.9):
+        assert balancer.pick(flow(1), paths, weights, t) == first
+    assert balancer.pick(flow(1), paths, weights, 1.5) == 1 - first
+
+
+def test_removed_path_is_not_kept():
+    balancer = FlowBalancer()
+    first = balancer.pick(flow(1), ["a", "b"], [1.0, 1.0], 0.0)
+    remaining = ["b"] if first == 0 else ["a"]
+    assert balancer.pick(flow(1), remaining, [1.0], 1.0) == 0
+    assert balancer.moved == 1
+
+
+def test_capacity_and_full_paths():
+    balancer = FlowBalancer(capacity=10)
+    for i in range(20):
+        assert balancer.pick(flow(i), ["a", "b"], [0.0, 0.0], 0.0) in (0, 1)
+    assert len(balancer.flows) == 10
+    shares = balancer.distribution()[("a", "b")]
+    assert abs(sum(shares["shares"].values()) - 1.0) < 1e-9
+
+
+def test_path_chosen_by_the_caller_is_remembered():
+    balancer = FlowBalancer()
+    assert balancer.pick(flow(1), ["a", "b", "c"], [1.0, 1.0, 1.0], 0.0, choose=lambda: 2) == 2
+    assert balancer.pick(flow(1), ["a", "b", "c"], [1.0, 1.0, 1.0], 1.0, choose=lambda: 0) == 2
+    assert balancer.kept == 1
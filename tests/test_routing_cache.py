@@ -0,0 +1,40 @@
+from routing_cache import DecisionCache
+
+
+def test_hit_and_miss():
+    cache = DecisionCache()
+    assert cache.get("a", 0.0) is None
+    cache.put("a", 1, 0.0)
+    assert cache.get("a", 1.0) == 1
+    assert cache.counters() == {"size": 1, "hits": 1, "misses": 1, "expired": 0, "evicted": 0}
+
+
+def test_entries_expire_after_ttl():
+    cache = DecisionCache(ttl=5.0)
+    cache.put("a", 1, 0.0)
+    assert cache.get("a", 5.0) == 1
+    assert cache.get("a", 5.1) is None
+    assert cache.expired == 1 and len(cache) == 0
+
+
+def test_least_recently_used_is_evicted():
+    cache = DecisionCache(capacity=2)
+    cache.put("a", 1, 0.0)
+    cache.put("b", 2, 0.0)
+    cache.get("a", 0.0)
+    cache.put("c", 3, 0.0)
+    assert cache.get("b", 0.0) is None
+    assert cache.get("a", 0.0) == 1 and cache.get("c", 0.0) == 3
+    assert cache.evicted == 1
+
+
+def test_put_refreshes_the_entry():
+    cache = DecisionCache(capacity=2, ttl=5.0)
+    cache.put("a", 1, 0.0)
+    cache.put("b", 2, 0.0)
+    cache.put("a", 3, 4.0)
+    cache.put("c", 4, 4.0)
+    assert cache.get("b", 4.0) is None
+    assert cache.get("a", 8.0) == 3
+    cache.clear()
+    assert len(cache) == 0
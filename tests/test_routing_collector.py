@@ -0,0 +1,94 @@
+import pytest
+
+from routing_collector import StatsCollector
+
+
+class Sender(object):
+
+    def __init__(self):
+        self.sent = []
+        self.down = set()
+
+    def __call__(self, dpid):
+        if dpid in self.down:
+            return None
+        self.sent.append(dpid)
+        return len(self.sent)
+
+
+def run(collector, start, end, step=0.1):
+    t = start
+    while t < end - 1e-9:
+        collector.tick(t)
+        t += step
+    return t
+
+
+def test_every_switch_is_polled_once_per_interval():
+    send = Sender()
+    collector = StatsCollector(send, base_interval=1.0, max_interval=1.0)
+    for dpid in range(1, 6):
+        collector.add_switch(dpid, 0.0)
+    t = 0.0
+    for _ in range(100):
+        # the requests are spread over the ticks instead of being sent in a burst
+        assert collector.tick(t) <= 1
+        for poll in collector.switches.values():
+            for xid in list(poll.in_flight):
+                collector.reply(poll.dpid, xid, t + 0.01)
+        t += 0.1
+    assert all(send.sent.count(dpid) in (9, 10, 11) for dpid in range(1, 6))
+    assert collector.counters()[1]["replies"] == send.sent.count(1)
+
+
+def test_at_most_max_in_flight_requests_and_timeout():
+    send = Sender()
+    collector = StatsCollector(send, base_interval=1.0, timeout=2.0)
+    collector.add_switch(1, 0.0)
+    run(collector, 0.0, 2.0)
+    assert len(send.sent) == 1  # never answered
+    run(collector, 2.0, 4.0)
+    assert collector.switches[1].missed >= 1
+    assert len(send.sent) == 2
+
+
+def test_unsent_requests_are_not_in_flight():
+    send = Sender()
+    send.down.add(1)
+    collector = StatsCollector(send)
+    collector.add_switch(1, 0.0)
+    run(collector, 0.0, 3.0)
+    assert collector.switches[1].in_flight == {} and collector.switches[1].requests == 0
+
+
+def test_late_replies():
+    collector = StatsCollector(Sender())
+    collector.add_switch(1, 0.0)
+    assert collector.reply(1, 42, 1.0) is None
+    assert collector.reply(7, 1, 1.0) is None
+    assert collector.late_replies == 2
+    run(collector, 0.0, 1.0)
+    xid = next(iter(collector.switches[1].in_flight))
+    sent = collector.switches[1].in_flight[xid]
+    assert collector.reply(1, xid, sent + 0.05) == sent
+    assert collector.switches[1].latency == pytest.approx(0.05)
+
+
+def test_hot_switches_are_polled_faster_within_the_budget():
+    collector = StatsCollector(Sender(), base_interval=1.0, min_interval=0.25, max_interval=2.0, hot=0.6)
+    for dpid in range(1, 6):
+        collector.add_switch(dpid, 0.0)
+    collector.set_load(1, 0.9)
+    intervals = dict((dpid, poll.interval) for dpid, poll in collector.switches.items())
+    assert intervals[1] == pytest.approx(0.25)
+    assert all(intervals[dpid] > 2.0 for dpid in range(2, 6))
+    assert sum(1.0 / interval for interval in intervals.values()) == pytest.approx(5.0)
+
+
+def test_idle_switches_relax_to_max_interval():
+    collector = StatsCollector(Sender(), base_interval=1.0, max_interval=2.0)
+    collector.add_switch(1, 0.0)
+    collector.add_switch(2, 0.0)
+    assert collector.switches[1].interval == pytest.approx(2.0)
+    collector.remove_switch(2)
+    assert list(collector.switches) == [1]
@@ -0,0 +1,77 @@
+from types import SimpleNamespace
+
+from routing_failover import Failover
+
+
+def test_backup_shares_the_fewest_links_then_has_the_lowest_delay(diamond):
+    failover = Failover()
+    paths = diamond.paths.get(1, 5)
+    assert failover.backup(paths[0], paths) is paths[1]
+    assert failover.backup(paths[1], paths) is paths[0]
+    assert Failover().backup(paths[0], paths[:1]) is None
+
+
+def test_backup_meets_the_latency_budget(diamond):
+    failover = Failover()
+    paths = diamond.paths.get(1, 5)
+    # measured delays: the second path is slow now, the third one is within the budget
+    delays = {paths[0].links: 20, paths[1].links: 80, paths[2].links: 45}
+    assert failover.backup(paths[0], paths, 50, lambda path: delays[path.links]) is paths[2]
+    # cached per primary path and budget
+    assert failover.backup(paths[0], paths, 50, lambda path: 0) is paths[2]
+    failover.clear()
+    assert failover.backup(paths[0], paths, 50, lambda path: 0) is paths[1]
+
+
+def test_budget_comes_before_sharing():
+    # a disjoint path over the budget loses to one sharing a link with the primary path but meeting it, e.g. when
+    # the round-trip budget of the pair leaves less than the max_delay of the intent
+    primary = SimpleNamespace(links=((1, 2), (2, 5)), delay=10)
+    shared = SimpleNamespace(links=((1, 2), (2, 3), (3, 5)), delay=25)
+    disjoint = SimpleNamespace(links=((1, 4), (4, 5)), delay=40)
+    paths = [primary, shared, disjoint]
+    failover = Failover()
+    assert failover.backup(primary, paths) is disjoint
+    assert failover.backup(primary, paths, 50) is disjoint
+    assert failover.backup(primary, paths, 30) is shared
+    # over the budget everywhere: back to the fewest shared links
+    assert failover.backup(primary, paths, 20) is disjoint
+
+
+def test_flows_go_back_once_the_links_have_been_up_for_hold(diamond):
+    failover = Failover(hold=5.0)
+    primary = diamond.paths.get(1, 5)[0].links
+    link = primary[0]
+    failover.link_down(link)
+    failover.failed("flow", primary, [link])
+    assert failover.failovers == 1 and len(failover) == 1
+    assert failover.due(100.0) == []
+    failover.link_up(link, 10.0)
+    assert failover.due(14.0) == []
+    # the link flaps: its wait starts again
+    failover.link_down(link)
+    failover.link_up(link, 15.0)
+    assert failover.due(19.0) == []
+    assert failover.due(20.0) == [("flow", primary)]
+    failover.forget("flow")
+    assert len(failover) == 0
+
+
+def test_second_failure_keeps_the_first_primary(diamond):
+    failover = Failover()
+    paths = diamond.paths.get(1, 5)
+    failover.failed("flow", paths[0].links, [paths[0].links[0]])
+    failover.failed("flow", paths[1].links, [paths[1].links[0]])
+    primary, links = failover.primaries["flow"]
+    assert primary == paths[0].links
+    assert links == frozenset([paths[0].links[0], paths[1].links[0]])
+
+
+def test_prune(diamond):
+    failover = Failover()
+    primary = diamond.paths.get(1, 5)[0].links
+    failover.failed("gone", primary, [primary[0]])
+    failover.link_up(primary[0], 1.0)
+    failover.link_up((9, 9), 1.0)
+    failover.prune({})
+    assert len(failover) == 0 and failover.up_since == {}
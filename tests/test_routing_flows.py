@@ -0,0 +1,83 @@
+from routing_flows import FlowRegistry
+from routing_intents import Intent
+
+
+def _registry(diamond, rates, **kw):
+    registry = FlowRegistry(**kw)
+    path = diamond.paths.get(1, 5)[0]
+    for key, rate in rates.items():
+        registry.add(key, 1, path, None, None, key.encode(), None, 0.0).rate = rate
+    return registry, path
+
+
+def _choose(diamond):
+    backup = diamond.paths.get(1, 5)[1]
+    return lambda record, extra: backup
+
+
+def test_one_flow_carrying_the_excess_alone(diamond):
+    registry, path = _registry(diamond, {"a": 100.0, "b": 400.0, "c": 600.0, "d": 1000.0})
+    moves = registry.plan(path.links[0], 350.0, _choose(diamond), 10.0)
+    assert [record.key for record, new in moves] == ["b"]  # the smallest one that covers it
+
+
+def test_elephants_first_otherwise(diamond):
+    registry, path = _registry(diamond, {"a": 100.0, "b": 400.0, "c": 600.0})
+    moves = registry.plan(path.links[0], 900.0, _choose(diamond), 10.0)
+    assert [record.key for record, new in moves] == ["c", "b"]
+
+
+def test_budget_and_hold(diamond):
+    registry, path = _registry(diamond, dict(("f%d" % i, 100.0) for i in range(10)), budget=3, interval=1.0,
+                               hold=5.0)
+    link = path.links[0]
+    moves = registry.plan(link, 1000.0, _choose(diamond), 10.0)
+    assert len(moves) == 3
+    for record, new in moves:
+        registry.move(record, new, 10.0)
+    assert registry.plan(link, 1000.0, _choose(diamond), 10.5) == []  # budget spent for this interval
+    assert registry.migrations == 3
+    assert all(record.path is not path for record, new in moves)
+    # the flows moved are on the other path now, and held there
+    other = moves[0][1].links[0]
+    assert registry.plan(other, 1000.0, _choose(diamond), 12.0) == []
+    assert len(registry.plan(other, 1000.0, _choose(diamond), 15.0)) == 3
+
+
+def test_no_destination_no_move(diamond):
+    registry, path = _registry(diamond, {"a": 500.0})
+    assert registry.plan(path.links[0], 100.0, lambda record, extra: None, 10.0) == []
+    assert registry.plan(path.links[0], 0.0, _choose(diamond), 10.0) == []
+
+
+def test_rates_and_expiry(diamond):
+    registry, path = _registry(diamond, {"a": 0.0, "b": 0.0}, alpha=0.5)
+    registry.update(1, 0.5, 1.0, [("a", 1000), ("b", 0)])
+    registry.update(1, 1.5, 2.0, [("a", 2000)])  # b was not listed: it expired
+    assert registry.flows["a"].rate == 0.5 * 8000.0
+    assert "b" not in registry.flows and registry.expired == 1
+    assert registry.on_link(path.links[0]) == [registry.flows["a"]]
+
+
+def test_reservations_and_opposite(diamond):
+    intent = Intent("video", src="10.0.0.1", dst="10.0.0.4", min_bw=200000)
+    reply = intent.mirror()
+    registry = FlowRegistry()
+    forward, back = diamond.paths.get(1, 5)[0], diamond.paths.get(5, 1)[0]
+    registry.add("f", 1, forward, None, intent, b"f", None, 0.0, reserve=200000.0, ends=(1, 4),
+                 switches=(1, 2))
+    registry.add("r", 5, back, None, reply, b"r", None, 0.0, reserve=200000.0, ends=(4, 1))
+    assert registry.reserved[forward.links[0]] == 200000.0
+    registry.flows["f"].rate = 150000.0
+    assert registry.reserved_rate(forward.links[0]) == 150000.0
+    assert registry.rules == {1: 1, 2: 1, 5: 1}
+    assert registry.opposite(intent, 1, 4).key == "r"
+    assert registry.opposite(reply, 4, 1).key == "f"
+    registry.remove("f")
+    assert forward.links[0] not in registry.reserved
+    assert registry.opposite(reply, 4, 1) is None
+
+
+def test_coldest(diamond):
+    registry, path = _registry(diamond, {"a": 300.0, "b": 100.0, "c": 200.0})
+    assert [record.key for record in registry.coldest(1, 2)] == ["b", "c"]
@@ -0,0 +1,68 @@
+import pytest
+
+from routing_forecast import LinkForecaster
+
+LINK = (1, 4)
+
+
+def test_bad_parameters():
+    with pytest.raises(ValueError):
+        LinkForecaster("arima")
+    with pytest.raises(ValueError):
+        LinkForecaster(enter=0.6, exit=0.8)
+
+
+def test_hysteresis_bands():
+    # with a tiny time constant the EWMA follows the samples: the forecast is the last utilization
+    forecaster = LinkForecaster("ewma", tau=1e-9, enter=0.8, exit=0.6)
+    states = []
+    for t, utilization in enumerate((0.5, 0.79, 0.85, 0.7, 0.61, 0.55, 0.7, 0.8)):
+        forecaster.update(LINK, float(t), utilization)
+        states.append(forecaster.congested(LINK))
+    assert states == [False, False, True, True, True, False, False, True]
+    assert forecaster.onsets == 2
+    assert not forecaster.congested((9, 9))
+
+
+def test_holt_follows_a_ramp():
+    forecaster = LinkForecaster("holt", horizon=2.0)
+    for t in range(20):
+        forecaster.update(LINK, float(t), 0.02 * t)
+    # the trend is picked up: the forecast is ahead of the last sample
+    assert forecaster.forecast(LINK) > 0.02 * 19
+    assert forecaster.links[LINK].trend > 0
+
+
+def test_linear_fits_the_window():
+    forecaster = LinkForecaster("linear", horizon=2.0, window=5.0)
+    for t in range(10):
+        forecaster.update(LINK, float(t), 0.1 + 0.05 * t)
+    assert forecaster.forecast(LINK) == pytest.approx(0.1 + 0.05 * 11)
+    assert forecaster.forecast(LINK, now=10.0) == pytest.approx(0.1 + 0.05 * 12)
+
+
+def test_forecast_is_never_negative():
+    forecaster = LinkForecaster("linear", horizon=10.0)
+    for t in range(5):
+        forecaster.update(LINK, float(t), 0.4 - 0.1 * t)
+    assert forecaster.forecast(LINK) == 0.0
+
+
+def test_forecast_errors_are_measured_at_the_horizon():
+    forecaster = LinkForecaster("ewma", horizon=2.0, tau=1e-9)
+    assert forecaster.update(LINK, 0.0, 0.5) == []
+    assert forecaster.update(LINK, 1.0, 0.5) == []
+    assert forecaster.update(LINK, 2.0, 0.7) == [(0.5, 0.7)]
+    assert forecaster.update(LINK, 1.5, 0.9) == []  # an older sample is ignored
+    report = forecaster.report()
+    assert report["errors"] == 1
+    assert report["mae"] == pytest.approx(0.2) and report["bias"] == pytest.approx(0.2)
+
+
+def test_forget():
+    forecaster = LinkForecaster()
+    forecaster.update((1, 4), 0.0, 0.5)
+    forecaster.update((2, 1), 0.0, 0.5)
+    forecaster.forget(lambda link: link[0] == 1)
+    assert list(forecaster.links) == [(2, 1)]
+    assert forecaster.forecast((1, 4)) == 0.0
@@ -0,0 +1,37 @@
+import json
+import os
+import subprocess
+import sys
+
+HARNESS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "routing_harness.py")
+
+
+def run(tmp_path, *args):
+    """ Report of a short run of the harness (the controller with the stand-in for POX). """
+    command = [sys.executable, HARNESS, "--quiet", "--events", "3000", "--flows", "100", "--rate", "500"]
+    result = subprocess.run(command + [str(arg) for arg in args], cwd=str(tmp_path), stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, universal_newlines=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout)
+
+
+def test_every_packet_is_delivered(tmp_path):
+    report = run(tmp_path)
+    assert report["delivered"] == report["packets"] == 3000
+    assert report["looped"] == 0
+    assert report["packet_in"] < report["packets"]
+
+
+def test_no_packet_is_lost_when_a_link_goes_down(tmp_path):
+    report = run(tmp_path, "--link-down", "s1-s3@2-4")
+    assert report["delivered"] == report["packets"]
+    assert report["lost_link_down"] == 0 and report["looped"] == 0
+    assert report["failover"]["failovers"] > 0
+
+
+def test_restart_with_state_reconciles_the_tables(tmp_path):
+    report = run(tmp_path, "--restart", "3", "--state", tmp_path / "state.jsonl")
+    assert report["delivered"] == report["packets"]
+    assert report["looped"] == 0 and report["lost_link_down"] == 0
+    assert report["restart"]["lost"] == 0
+    assert report["restart"]["reconciled"]["adopted"] > 0
@@ -0,0 +1,93 @@
+import json
+import socket
+import struct
+
+import pytest
+
+from routing_intents import Intent, IntentTable, choose_path, parse_prefix
+
+
+def ip(text):
+    return struct.unpack("!I", socket.inet_aton(text))[0]
+
+
+def test_parse_prefix():
+    assert parse_prefix("10.0.0.7") == (ip("10.0.0.7"), 32)
+    assert parse_prefix("10.0.0.7/24") == (ip("10.0.0.0"), 24)
+    with pytest.raises(ValueError):
+        parse_prefix("10.0.0.0/33")
+
+
+def test_unknown_fields_and_protocols_are_rejected():
+    with pytest.raises(ValueError):
+        Intent.from_dict({"name": "x", "dst": "10.0.0.4", "delay": 10})
+    with pytest.raises(ValueError):
+        Intent("x", proto="sctp")
+    with pytest.raises(ValueError):
+        Intent("x", dport=[5100, 5000])
+
+
+def test_most_specific_intent_wins():
+    table = IntentTable.from_dicts([
+        {"name": "subnet", "src": "10.0.0.0/24", "dst": "10.0.0.0/24"},
+        {"name": "to-h4", "dst": "10.0.0.4"},
+        {"name": "h1-h4", "src": "10.0.0.1", "dst": "10.0.0.4"},
+        {"name": "video", "src": "10.0.0.1", "dst": "10.0.0.4", "proto": "udp", "dport": [5000, 5100]},
+        {"name": "rtp", "src": "10.0.0.1", "dst": "10.0.0.4", "proto": "udp", "dport": 5004},
+    ])
+    h1, h2, h4, h5 = ip("10.0.0.1"), ip("10.0.0.2"), ip("10.0.0.4"), ip("10.0.0.5")
+    assert table.match(h1, h4, 17, 1234, 5004).name == "rtp"
+    assert table.match(h1, h4, 17, 1234, 5050).name == "video"
+    assert table.match(h1, h4, 17, 1234, 6000).name == "h1-h4"
+    assert table.match(h1, h4, 6, 1234, 5004).name == "h1-h4"
+    assert table.match(h2, h4, 6, 1234, 80).name == "to-h4"  # the longer destination prefix first
+    assert table.match(h2, h5, 6, 1234, 80).name == "subnet"
+    assert table.match(h2, ip("192.168.0.1"), 6, 1234, 80) is None
+
+
+def test_order_in_the_file_breaks_ties():
+    table = IntentTable.from_dicts([{"name": "first", "dst": "10.0.0.4"}, {"name": "second", "dst": "10.0.0.4"}])
+    assert table.match(ip("10.0.0.1"), ip("10.0.0.4")).name == "first"
+
+
+def test_mirror_matches_the_replies():
+    table = IntentTable.from_dicts([{"name": "video", "src": "10.0.0.1", "dst": "10.0.0.4", "proto": "udp",
+                                     "dport": 5000, "max_delay": 30}])
+    forward = table.match(ip("10.0.0.1"), ip("10.0.0.4"), 17, 40000, 5000)
+    reply = table.match(ip("10.0.0.4"), ip("10.0.0.1"), 17, 5000, 40000)
+    assert forward.name == reply.name == "video"
+    assert not forward.reverse and reply.reverse
+    assert forward.pair is reply and reply.pair is forward
+    assert reply.max_delay == 30 and reply.rtt_budget() == 60
+    assert len(table) == 1 and len(table.directions()) == 2
+    # the reply direction does not match the forward ports
+    assert table.match(ip("10.0.0.4"), ip("10.0.0.1"), 17, 40000, 5000) is None
+
+
+def test_symmetric_intent_has_no_mirror():
+    table = IntentTable.from_dicts([{"name": "lan", "src": "10.0.0.0/24", "dst": "10.0.0.0/24", "max_rtt": 50}])
+    intent = table.match(ip("10.0.0.4"), ip("10.0.0.1"))
+    assert intent.pair is intent
+    assert table.mirrors == []
+    assert intent.rtt_budget() == 50
+
+
+def test_load(tmp_path):
+    path = tmp_path / "intents.json"
+    path.write_text(json.dumps({"intents": [{"name": "h1-h4", "src": "10.0.0.1", "dst": "10.0.0.4",
+                                             "max_delay": 60}]}))
+    table = IntentTable.load(str(path))
+    assert [intent.name for intent in table] == ["h1-h4"]
+    assert table.match(ip("10.0.0.1"), ip("10.0.0.4")).max_delay == 60
+
+
+def test_choose_path():
+    intent = Intent("x", max_delay=30, min_bw=100)
+    delays, loads, headroom = [10, 20, 50], [0.9, 0.2, 0.0], [50, 500, 1000]
+    # the least loaded path within the budget with enough headroom
+    assert choose_path(intent, "abc", delays, loads, headroom) == 1
+    # no path within the budget has the headroom: the least loaded within the budget
+    assert choose_path(intent, "abc", delays, loads, [50, 50, 1000]) == 1
+    # none meets the budget: the fastest
+    assert choose_path(intent, "abc", [40, 35, 50], loads, headroom) == 1
+    assert choose_path(intent, "abc", delays, loads, headroom, budget=15) == 0
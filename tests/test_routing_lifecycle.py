@@ -0,0 +1,61 @@
+from routing_lifecycle import FlowLifecycle
+
+
+def test_new_rule_gets_the_base_timeout():
+    lifecycle = FlowLifecycle(base_idle=2)
+    assert lifecycle.timeouts("a", 0.0) == (2, 0)
+    assert lifecycle.rules["a"].cls == "new"
+
+
+def test_recurring_rule_doubles_its_idle_timeout():
+    lifecycle = FlowLifecycle(base_idle=2, max_idle=16, max_hard=120, recur_window=10.0)
+    lifecycle.timeouts("a", 0.0)
+    t = 0.0
+    for idle in (4, 8, 16, 16):
+        lifecycle.removed_rule("a", "idle", 3.0, 10, 15000, t + 3.0)
+        t += 5.0
+        assert lifecycle.timeouts("a", t) == (idle, 120)
+    assert lifecycle.rules["a"].cls == "recurring" and lifecycle.rules["a"].recurrences == 4
+    assert lifecycle.reinstalls == 4 and lifecycle.churn(t) == 0.3  # the re-install at 5 s is out of the window
+
+
+def test_pressure_keeps_the_base_timeout():
+    lifecycle = FlowLifecycle(base_idle=2)
+    lifecycle.timeouts("a", 0.0)
+    lifecycle.removed_rule("a", "idle", 2.0, 10, 1000, 2.0)
+    assert lifecycle.timeouts("a", 3.0, pressure=True) == (2, 0)
+
+
+def test_one_shot_and_late_returns():
+    lifecycle = FlowLifecycle(base_idle=2, min_idle=1, recur_window=10.0)
+    lifecycle.timeouts("dns", 0.0)
+    lifecycle.removed_rule("dns", "idle", 2.0, 1, 80, 2.0)
+    assert lifecycle.timeouts("dns", 20.0) == (1, 0)
+    assert lifecycle.rules["dns"].cls == "one-shot"
+    lifecycle.timeouts("bulk", 0.0)
+    lifecycle.removed_rule("bulk", "idle", 2.0, 50, 70000, 2.0)
+    assert lifecycle.timeouts("bulk", 20.0) == (2, 0)
+    assert lifecycle.rules["bulk"].cls == "new"
+
+
+def test_only_idle_expiries_recur():
+    lifecycle = FlowLifecycle(base_idle=2)
+    lifecycle.timeouts("a", 0.0)
+    lifecycle.removed_rule("a", "delete", 1.0, 10, 1000, 1.0)
+    assert lifecycle.timeouts("a", 2.0) == (2, 0)
+    assert lifecycle.reinstalls == 0
+    # installed again before its removal was reported: it keeps its class
+    assert lifecycle.timeouts("a", 3.0) == (2, 0)
+    assert lifecycle.rules["a"].installs == 3
+
+
+def test_history_is_bounded_and_reported():
+    lifecycle = FlowLifecycle(capacity=2)
+    for key in "abc":
+        lifecycle.timeouts(key, 0.0)
+    assert list(lifecycle.rules) == ["b", "c"]
+    assert lifecycle.removed_rule("a", "hard", 5.0, 3, 300, 5.0) is None
+    report = lifecycle.report(5.0)
+    assert report["classes"] == {"new": 2, "recurring": 0, "one-shot": 0}
+    assert report["removed"]["hard"] == 1 and report["mean_packets"] == 3.0
+    assert lifecycle.counters()["installs"] == 3
@@ -0,0 +1,63 @@
+from urllib.request import urlopen
+
+from routing_metrics import BUCKETS, Histogram, Metrics
+
+
+def test_histogram_buckets():
+    histogram = Histogram()
+    for value in (1e-6, 5e-6, 2e-3, 10.0):
+        histogram.observe(value)
+    assert histogram.counts[0] == 2  # the bounds are inclusive
+    assert histogram.counts[BUCKETS.index(2.5e-3)] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.count == 4
+
+
+def test_timed_handler_records_even_on_error():
+    metrics = Metrics()
+
+    def handler(event):
+        if event is None:
+            raise ValueError(event)
+        return event
+
+    timed = metrics.timed("PacketIn", handler)
+    assert timed(1) == 1 and timed.__name__ == "handler"
+    try:
+        timed(None)
+    except ValueError:
+        pass
+    assert metrics.handlers["PacketIn"].count == 2
+
+
+def test_render():
+    metrics = Metrics(switch_name=lambda dpid: "s%d" % dpid)
+    metrics.timed("PacketIn", lambda: None)()
+    metrics.sent(1, "flow_mod", 3)
+    metrics.received(1, "packet_in")
+    metrics.decision(1, 4, "balance")
+    metrics.decision(1, 4, "balance")
+    metrics.gauge("queue_depth", "telemetry", lambda: 7)
+    metrics.gauge("queue_depth", "broken", lambda: 1 / 0)
+    text = metrics.render()
+    assert 'routing_handler_seconds_bucket{handler="PacketIn",le="+Inf"} 1' in text
+    assert 'routing_handler_seconds_count{handler="PacketIn"} 1' in text
+    assert 'routing_messages_total{switch="s1",direction="out",type="flow_mod"} 3' in text
+    assert 'routing_messages_total{switch="s1",direction="in",type="packet_in"} 1' in text
+    assert 'routing_decisions_total{switch="s1",out_port="4",kind="balance"} 2' in text
+    assert 'routing_queue_depth{name="telemetry"} 7' in text
+    # a gauge that cannot be read is left out
+    assert "broken" not in text
+
+
+def test_server():
+    metrics = Metrics()
+    metrics.sent(1, "flow_mod")
+    server = metrics.start_server(0)
+    try:
+        port = server.server_address[1]
+        body = urlopen("http://127.0.0.1:%d/metrics" % port, timeout=5).read().decode()
+        assert 'type="flow_mod"} 1' in body
+    finally:
+        server.shutdown()
+        server.server_close()
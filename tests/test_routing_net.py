@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from routing_net import clos, distribution, fat_tree, parallel_paths, random_graph
+from routing_topology import load_manifest
+
+
+def ports_are_unique(manifest):
+    used = [(host["switch"], host["port"]) for host in manifest["hosts"]]
+    for link in manifest["links"]:
+        used += [(link["src"], link["src_port"]), (link["dst"], link["dst_port"])]
+    return len(used) == len(set(used))
+
+
+def connected(manifest):
+    neighbours = dict((switch["name"], set()) for switch in manifest["switches"])
+    for link in manifest["links"]:
+        neighbours[link["src"]].add(link["dst"])
+        neighbours[link["dst"]].add(link["src"])
+    seen, todo = set(), [manifest["switches"][0]["name"]]
+    while todo:
+        name = todo.pop()
+        if name not in seen:
+            seen.add(name)
+            todo += neighbours[name]
+    return len(seen) == len(neighbours)
+
+
+def test_distributions():
+    import random
+    rnd = random.Random(1)
+    assert [distribution("200,50,10")(rnd, i) for i in range(4)] == [200.0, 50.0, 10.0, 200.0]
+    assert distribution(5)(rnd, 0) == 5.0
+    assert all(1 <= distribution("uniform:1:10")(rnd, i) <= 10 for i in range(50))
+    assert all(distribution("normal:1:10")(rnd, i) >= 0 for i in range(50))
+    assert distribution("choice:10,50")(rnd, 0) in (10.0, 50.0)
+
+
+def test_diamond():
+    manifest = parallel_paths()
+    assert [switch["name"] for switch in manifest["switches"]] == ["s1", "s2", "s3", "s4", "s5"]
+    assert [host["ip"] for host in manifest["hosts"]] == ["10.0.0.%d" % i for i in range(1, 7)]
+    assert manifest["hosts"][3]["switch"] == "s5" and manifest["hosts"][3]["port"] == 4
+    # the links of s1 are on ports 4-6 with the delays of MyTopo, those of s5 on ports 1-3
+    assert [(link["src_port"], link["dst"], link["dst_port"], link["delay"]) for link in manifest["links"][:3]] == \
+        [(4, "s2", 1, 200), (5, "s3", 1, 50), (6, "s4", 1, 10)]
+    assert [(link["src"], link["src_port"], link["dst_port"]) for link in manifest["links"][3:]] == \
+        [("s2", 2, 1), ("s3", 2, 2), ("s4", 2, 3)]
+    assert manifest["dynamic_edges"] == ["s1", "s5"] and manifest["k_paths"] == 3
+
+
+@pytest.mark.parametrize("manifest", [clos(4, 8, 2), fat_tree(4), random_graph(12, 3, 4, 2, seed=7)])
+def test_generated_topologies(manifest):
+    assert ports_are_unique(manifest)
+    assert connected(manifest)
+    assert set(manifest["dynamic_edges"]) == set(host["switch"] for host in manifest["hosts"])
+
+
+def test_fat_tree_size():
+    manifest = fat_tree(4)
+    assert len(manifest["switches"]) == 20 and len(manifest["hosts"]) == 16 and len(manifest["links"]) == 32
+    with pytest.raises(ValueError):
+        fat_tree(3)
+
+
+def test_random_graph_depends_only_on_the_seed():
+    assert random_graph(seed=3) == random_graph(seed=3)
+    assert random_graph(seed=3)["links"] != random_graph(seed=4)["links"]
+
+
+def test_load_manifest(tmp_path):
+    path = tmp_path / "diamond.json"
+    path.write_text(json.dumps(parallel_paths(bw="2")))
+    loaded = load_manifest(str(path))
+    assert loaded["link_bw"][("s1", "s2")] == 2000000
+    assert loaded["link_delay"][("s1", "s4")] == 10.0
+    assert loaded["link_delay"][("s2", "s5")] == 0.0
+    assert loaded["dynamic_edges"] == ("s1", "s5") and loaded["k_paths"] == 3
@@ -0,0 +1,54 @@
+from routing_outbox import Outbox
+
+
+class _Connection(object):
+    def __init__(self, dpid, writes):
+        self.dpid = dpid
+        self.writes = writes
+
+    def send(self, data):
+        self.writes.append((self.dpid, data))
+
+
+def _outbox(writes, connected=(1, 2, 3)):
+    scheduled = []
+    connections = dict((dpid, _Connection(dpid, writes)) for dpid in connected)
+    return Outbox(connections.get, scheduled.append), scheduled
+
+
+def test_one_write_per_switch_in_order():
+    writes = []
+    outbox, scheduled = _outbox(writes)
+    outbox.send(1, b"a")
+    outbox.send(2, b"b")
+    outbox.send(1, b"c")
+    assert len(scheduled) == 1 and len(outbox) == 3
+    scheduled[0]()
+    assert writes == [(1, b"ac"), (2, b"b")]
+    assert outbox.counters() == {"messages": 3, "writes": 2, "flushes": 1, "dropped": 0}
+
+
+def test_last_switches_are_written_after_the_others():
+    writes = []
+    outbox, scheduled = _outbox(writes)
+    outbox.send(1, b"ingress", last=True)
+    outbox.send(2, b"transit")
+    outbox.send(3, b"egress")
+    outbox.flush()
+    assert [dpid for dpid, data in writes] == [2, 3, 1]
+    outbox.send(1, b"next")
+    outbox.send(2, b"next")
+    outbox.flush()
+    assert [dpid for dpid, data in writes[3:]] == [1, 2]  # only for the flush it was queued in
+
+
+def test_disconnected_switches_drop_their_messages():
+    writes = []
+    outbox, scheduled = _outbox(writes, connected=(1,))
+    outbox.send(1, b"a")
+    outbox.send(2, b"b")
+    outbox.send(3, b"c", last=True)
+    outbox.discard(3)
+    outbox.flush()
+    assert writes == [(1, b"a")]
+    assert outbox.dropped == 2 and outbox.last == set()
@@ -0,0 +1,75 @@
+import math
+
+import pytest
+
+from routing_placement import PlacementEngine
+
+MBIT = 1e6
+
+
+def _engine(**kw):
+    return PlacementEngine(lambda link: 10 * MBIT, **kw)
+
+
+def test_place_picks_the_lowest_utilization_once_charged():
+    engine = _engine()
+    a, b = ((1, 4), (2, 2)), ((1, 5), (3, 2))
+    engine.measure((1, 4), 5 * MBIT)
+    engine.measure((3, 2), 2 * MBIT)
+    assert engine.place([a, b], 1 * MBIT, {}, 0.0) == 1
+    loads, headroom = engine.state([a, b], {}, 0.0, 1 * MBIT)
+    assert loads == [pytest.approx(0.6), pytest.approx(0.3)]
+    assert headroom == [pytest.approx(5 * MBIT), pytest.approx(8 * MBIT)]
+
+
+def test_congested_paths_rank_last():
+    engine = _engine()
+    a, b = ((1, 4),), ((1, 5),)
+    engine.measure((1, 4), 1 * MBIT, congested=True)
+    engine.measure((1, 5), 6 * MBIT)
+    assert engine.place([a, b], 0.0, {}, 0.0) == 1
+    loads, headroom = engine.state([a, b], {}, 0.0)
+    assert loads[0] > 1.0 and headroom[0] == 0.0
+    # all congested: compared by their load alone
+    engine.measure((1, 5), 6 * MBIT, congested=True)
+    assert engine.place([a, b], 0.0, {}, 0.0) == 0
+
+
+def test_unused_reservations_count_as_load():
+    engine = _engine()
+    link = (1, 4)
+    engine.measure(link, 3 * MBIT, used=1 * MBIT)
+    assert engine.load(link, {link: 4 * MBIT}, 0.0) == pytest.approx(6 * MBIT)
+    assert engine.load(link, {link: 0.5 * MBIT}, 0.0) == pytest.approx(3 * MBIT)
+
+
+def test_pending_demand_decays():
+    engine = _engine(tau=2.0)
+    link = (1, 4)
+    engine.placed([link], 1 * MBIT, 0.0)
+    engine.placed([link], 1 * MBIT, 0.0)
+    assert engine.load(link, {}, 0.0) == pytest.approx(2 * MBIT)
+    assert engine.load(link, {}, 2.0) == pytest.approx(2 * MBIT * math.exp(-1.0))
+    assert engine.placements == 2
+
+
+def test_demand_per_class_and_per_flow():
+    engine = _engine(default_demand=50000.0, alpha=0.5, capacity=2)
+    assert engine.demand("udp") == 50000.0
+    assert engine.demand("udp", minimum=200000.0) == 200000.0
+    engine.learn("udp", 100000.0, flow=b"a")
+    engine.learn("udp", 300000.0, flow=b"b")
+    assert engine.demand("udp") == pytest.approx(200000.0)
+    assert engine.demand("udp", flow=b"b") == 300000.0  # its own last rate
+    engine.learn("tcp", 1000.0, flow=b"c")
+    assert b"a" not in engine.rates  # the least recently used flow went out of the table
+    assert engine.demand("udp", flow=b"a") == pytest.approx(200000.0)
+
+
+def test_forget():
+    engine = _engine()
+    engine.measure((1, 4), 1.0, congested=True)
+    engine.placed([(1, 4), (2, 2)], 1.0, 0.0)
+    engine.forget(lambda link: link[0] == 1)
+    assert (1, 4) not in engine.measured and (1, 4) not in engine.pending and not engine.congested
+    assert (2, 2) in engine.pending
@@ -0,0 +1,77 @@
+import pytest
+
+from routing_probes import PathProber, parse_probe, probe_frame
+
+
+def run(prober, start, end, step=0.1):
+    probes = []
+    t = start
+    while t < end - 1e-9:
+        probes += [(t,) + probe for probe in prober.tick(t)]
+        t += step
+    return probes
+
+
+def test_frame_round_trip():
+    frame = probe_frame(7, 42, 123.5)
+    assert len(frame) == 62
+    assert parse_probe(frame) == (7, 42, 123.5)
+    assert parse_probe(frame[:40]) is None
+    assert parse_probe(frame[:-20] + b"XXXX" + frame[-16:]) is None
+
+
+def test_delay_estimate(diamond):
+    prober = PathProber(interval=0.5, min_samples=3)
+    path = diamond.paths.get(1, 5)[0]
+    prober.set_paths([path], 0.0)
+    assert prober.delay(path.links, 20.0) == 20.0
+    for t, estimate, probe_id, seq in run(prober, 0.0, 2.0):
+        assert prober.received(probe_id, seq, t, 5, t + 0.012, correction=0.002) is estimate
+    assert prober.delay(path.links, 20.0) == pytest.approx(10.0)
+    assert prober.paths[1].jitter == pytest.approx(0.0)
+
+
+def test_rate_and_outstanding_limits(diamond):
+    prober = PathProber(interval=0.0, rate=10.0, max_outstanding=2, timeout=100.0)
+    prober.set_paths(diamond.paths.get(1, 5), 0.0)
+    probes = run(prober, 0.0, 1.0)
+    # 2 outstanding probes per path, 3 paths
+    assert len(probes) == 6
+    prober = PathProber(interval=0.0, rate=10.0, max_outstanding=100, timeout=100.0)
+    prober.set_paths(diamond.paths.get(1, 5), 0.0)
+    assert len(run(prober, 0.0, 2.0)) <= 21
+
+
+def test_losses_count_as_slow_samples(diamond):
+    prober = PathProber(interval=0.5, timeout=1.0, min_samples=1)
+    path = diamond.paths.get(1, 5)[0]
+    prober.set_paths([path], 0.0)
+    (t, estimate, probe_id, seq), = run(prober, 0.0, 0.1)
+    prober.received(probe_id, seq, t, 5, t + 0.01)
+    run(prober, 0.1, 1.7)
+    assert estimate.lost == 1 and estimate.delay == pytest.approx(10.0)  # a single loss does not count
+    run(prober, 1.7, 2.2)
+    assert estimate.lost == 2 and estimate.delay > 10.0
+
+
+def test_unknown_late_and_misrouted(diamond):
+    prober = PathProber()
+    path = diamond.paths.get(1, 5)[0]
+    prober.set_paths([path], 0.0)
+    (t, estimate, probe_id, seq), = run(prober, 0.0, 0.1)
+    assert prober.received(99, seq, t, 5, t) is None
+    assert prober.received(probe_id, seq, t, 3, t) is None and prober.misrouted == 1
+    assert prober.received(probe_id, seq + 1, t, 5, t) is None and prober.late == 1
+    prober.cancel(estimate, seq)
+    assert estimate.sent == 0 and estimate.in_flight == {}
+
+
+def test_set_paths_keeps_the_estimates(diamond):
+    prober = PathProber()
+    first, second, third = diamond.paths.get(1, 5)
+    prober.set_paths([first, second], 0.0)
+    ids = dict(prober.ids)
+    prober.set_paths([second, third], 1.0)
+    assert first.links not in prober.ids
+    assert prober.ids[second.links] == ids[second.links]
+    assert len(prober.paths) == 2
@@ -0,0 +1,38 @@
+import math
+
+import pytest
+
+from routing_queues import BEST_EFFORT, INTENT, QueueStats, htb_commands
+
+
+def test_htb_commands():
+    commands = htb_commands("s1-eth4", 1, delay=10, loss=1)
+    assert commands[:3] == ["tc qdisc del dev s1-eth4 root",
+                            "tc qdisc add dev s1-eth4 root handle 1: htb default 1",
+                            "tc class add dev s1-eth4 parent 1: classid 1:100 htb rate 1mbit ceil 1mbit"]
+    assert "tc class add dev s1-eth4 parent 1:100 classid 1:2 htb rate 0.7mbit ceil 1mbit prio 0" in commands
+    assert "tc qdisc add dev s1-eth4 parent 1:1 handle a: netem limit 1000 delay 10ms loss 1%" in commands
+    assert htb_commands("s2-eth2", 1)[-1] == "tc qdisc add dev s2-eth2 parent 1:2 handle b: netem limit 1000"
+
+
+def test_rates_and_drops():
+    stats = QueueStats(tau=2.0)
+    assert stats.update(1, 0.0, [(4, BEST_EFFORT, 0, 0, 0), (4, INTENT, 0, 0, 0)]) == []
+    samples = stats.update(1, 2.0, [(4, BEST_EFFORT, 2000, 20, 3), (4, INTENT, 500, 5, 0)])
+    assert samples == [(4, BEST_EFFORT, 8000.0, 3), (4, INTENT, 2000.0, 0)]
+    assert stats.queues[(1, 4, BEST_EFFORT)].bitrate == pytest.approx((1 - math.exp(-1.0)) * 8000.0)
+    classes = stats.classes()
+    assert classes["best-effort"]["drops"] == 3 and classes["best-effort"]["packets"] == 20
+    assert classes["intent"]["queues"] == 1
+
+
+def test_old_replies_and_counter_resets():
+    stats = QueueStats()
+    stats.update(1, 1.0, [(4, INTENT, 1000, 1, 0)])
+    assert stats.update(1, 0.5, [(4, INTENT, 5000, 5, 0)]) == []
+    assert stats.queues[(1, 4, INTENT)].tx_bytes == 1000
+    # a counter that went down restarts from the new value
+    assert stats.update(1, 2.0, [(4, INTENT, 10, 1, 0)]) == []
+    assert stats.update(1, 3.0, [(4, INTENT, 110, 2, 0)]) == [(4, INTENT, 800.0, 0)]
+    stats.forget_switch(1)
+    assert len(stats) == 0
@@ -0,0 +1,97 @@
+import json
+
+from routing_state import StateJournal, link_key, parse_link_key
+
+
+def _journal(tmp_path, **kw):
+    journal = StateJournal(str(tmp_path / "state.jsonl"), **kw)
+    assert journal.load() == {}
+    return journal
+
+
+def _lines(journal):
+    with open(journal.path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_link_key_round_trip():
+    assert link_key(3, 2) == "3:2"
+    assert parse_link_key(link_key(3, 2)) == (3, 2)
+
+
+def test_flush_appends_only_the_changes(tmp_path):
+    journal = _journal(tmp_path)
+    journal.save({"hosts": {"10.0.0.1": ["01", 1, 1], "10.0.0.2": ["02", 1, 2]}}, 1.0)
+    journal.flush()
+    journal.save({"hosts": {"10.0.0.1": ["01", 1, 1], "10.0.0.3": ["03", 5, 1]}, "loads": {"1:4": 100.0}}, 3.0)
+    journal.flush()
+    journal.save({"hosts": {"10.0.0.1": ["01", 1, 1], "10.0.0.3": ["03", 5, 1]}, "loads": {"1:4": 100.0}}, 5.0)
+    journal.flush()  # nothing changed: nothing written
+    first, second = _lines(journal)
+    assert second["set"] == {"hosts": {"10.0.0.3": ["03", 5, 1]}, "loads": {"1:4": 100.0}}
+    assert second["del"] == {"hosts": ["10.0.0.2"]}
+    assert journal.counters()["appended"] == 2
+    assert StateJournal(journal.path).load() == {"hosts": {"10.0.0.1": ["01", 1, 1], "10.0.0.3": ["03", 5, 1]},
+                                                 "loads": {"1:4": 100.0}}
+
+
+def test_due_after_interval(tmp_path):
+    journal = _journal(tmp_path, interval=2.0)
+    assert journal.due(0.0)
+    journal.save({}, 0.0)
+    assert not journal.due(1.5)
+    assert journal.due(2.0)
+
+
+def test_compact_replaces_the_file_with_one_reset_line(tmp_path):
+    journal = _journal(tmp_path, max_bytes=300)
+    for i in range(20):
+        journal.save({"rates": {"flow%d" % i: float(i)}}, float(i))
+        journal.flush()
+    assert journal.compactions > 0
+    lines = _lines(journal)
+    assert any(line.get("reset") for line in lines)
+    assert journal.size <= 300
+    assert StateJournal(journal.path).load() == {"rates": {"flow19": 19.0}}
+
+
+def test_truncated_last_line_is_cut_off(tmp_path):
+    journal = _journal(tmp_path)
+    for i in range(3):
+        journal.save({"hosts": {"h%d" % i: [i]}}, float(i))
+        journal.flush()
+    with open(journal.path, "rb") as f:
+        data = f.read()
+    with open(journal.path, "wb") as f:
+        f.write(data[:-7])  # the writer crashed in the middle of the third line
+
+    journal = StateJournal(journal.path)
+    assert journal.load() == {"hosts": {"h1": [1]}}
+    with open(journal.path, "rb") as f:
+        assert f.read() == data[:data.rindex(b"\n", 0, len(data) - 1) + 1]
+    assert journal.size == len(data[:data.rindex(b"\n", 0, len(data) - 1) + 1])
+
+    # the next lines go after the last complete one and the file stays readable
+    journal.save({"hosts": {"h1": [1], "c": [9]}}, 3.0)
+    journal.flush()
+    journal.save({"hosts": {"c": [9]}}, 4.0)
+    journal.flush()
+    assert len(_lines(journal)) == 4
+    assert StateJournal(journal.path).load() == {"hosts": {"c": [9]}}
+
+
+def test_line_without_newline_is_cut_off(tmp_path):
+    # a complete JSON object whose newline was not written yet is not trusted either
+    path = tmp_path / "state.jsonl"
+    path.write_bytes(b'{"t":0,"set":{"hosts":{"a":[1]}},"del":{}}\n{"t":1,"set":{"hosts":{"b":[2]}},"del":{}}')
+    journal = StateJournal(str(path))
+    assert journal.load() == {"hosts": {"a": [1]}}
+    assert path.read_bytes().endswith(b"}\n")
+
+
+def test_stop_flushes_the_last_snapshot(tmp_path):
+    journal = _journal(tmp_path, interval=60.0)
+    journal.start()
+    journal.save({"links": {"1:2": [2, 1]}}, 1.0)
+    journal.stop()
+    assert StateJournal(journal.path).load() == {"links": {"1:2": [2, 1]}}
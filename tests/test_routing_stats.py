@@ -0,0 +1,88 @@
+import math
+
+import pytest
+
+from routing_stats import FIELDS, TX_BYTES, TX_PACKETS, PortStatsStore
+
+
+def counters(tx_bytes, tx_packets=0):
+    values = [0] * len(FIELDS)
+    values[TX_BYTES], values[TX_PACKETS] = tx_bytes, tx_packets
+    return values
+
+
+def test_rates_from_the_time_between_samples():
+    store = PortStatsStore(tau=2.0)
+    store.update(1, 0.0, [(4, counters(0)), (5, counters(0))])
+    store.update(1, 2.0, [(4, counters(2000, 10)), (5, counters(500))])
+    # the first rate is taken as it is
+    assert store.bitrate(1, 4) == pytest.approx(8000.0)
+    assert list(store.ewma_rates([(1, 4), (1, 5), (9, 9)])) == [pytest.approx(1000.0), pytest.approx(250.0), 0.0]
+    assert store.last_delta(1, 4, TX_PACKETS) == 10
+    # the next ones are smoothed with a weight growing with the time since the previous sample
+    store.update(1, 4.0, [(4, counters(6000, 10))])
+    assert store.ewma_rates([(1, 4)])[0] == pytest.approx(1000.0 + (1 - math.exp(-1.0)) * 1000.0)
+
+
+def test_window_rates():
+    store = PortStatsStore(window=5.0)
+    for t in range(10):
+        store.update(1, float(t), [(4, counters(1000 * t * t))])
+    # samples 4 .. 9 are within 5 s of the newest one
+    assert store.window_rates([(1, 4)])[0] == pytest.approx((81000 - 16000) / 5.0)
+    assert store.window_rates([(1, 4)], window=1.0)[0] == pytest.approx(17000.0)
+    assert store.rates([(1, 5)], kind="window")[0] == 0.0
+
+
+def test_utilization():
+    store = PortStatsStore()
+    store.update(1, 0.0, [(4, counters(0))])
+    store.update(1, 1.0, [(4, counters(125000))])
+    assert list(store.utilization([(1, 4)], [2000000])) == [pytest.approx(0.5)]
+
+
+def test_counter_decrease_restarts_the_history():
+    store = PortStatsStore()
+    store.update(1, 0.0, [(4, counters(0))])
+    store.update(1, 1.0, [(4, counters(1000))])
+    store.update(1, 2.0, [(4, counters(10))])
+    assert store.resets == 1
+    assert store.bitrate(1, 4) == 0.0
+    store.update(1, 3.0, [(4, counters(110))])
+    assert store.bitrate(1, 4) == pytest.approx(800.0)
+
+
+def test_late_samples_are_ignored():
+    store = PortStatsStore()
+    store.update(1, 0.0, [(4, counters(0))])
+    store.update(1, 2.0, [(4, counters(2000))])
+    store.update(1, 1.0, [(4, counters(99999))])
+    assert store.stale == 1
+    assert store.bitrate(1, 4) == pytest.approx(8000.0)
+
+
+def test_rows_grow_and_ring_wraps():
+    store = PortStatsStore(capacity=4, rows=2)
+    for t in range(10):
+        store.update(1, float(t), [(port, counters(100 * t)) for port in range(1, 6)])
+    assert len(store.keys) == 5 and len(store.counters) >= 5
+    assert all(rate == pytest.approx(800.0) for rate in store.bitrates([(1, port) for port in range(1, 6)]))
+    assert store.window_rates([(1, 1)], window=100.0)[0] == pytest.approx(100.0)  # only 4 samples are kept
+
+
+def test_forget_switch():
+    store = PortStatsStore()
+    store.update(1, 0.0, [(4, counters(0))])
+    store.update(1, 1.0, [(4, counters(1000))])
+    store.forget_switch(1)
+    assert store.bitrate(1, 4) == 0.0
+    store.update(1, 0.5, [(4, counters(0))])  # the switch came back with its clock and counters reset
+    assert store.stale == 0
+
+
+def test_last_rates():
+    store = PortStatsStore()
+    for t, tx_bytes in enumerate((0, 1000, 4000)):
+        store.update(1, float(t), [(4, counters(tx_bytes))])
+    assert list(store.last_rates([(1, 4), (2, 4)])) == [3000.0, 0.0]
+    assert store.rates([(1, 4)], kind="last")[0] == 3000.0
@@ -0,0 +1,98 @@
+from routing_topology import OFPP_MAX, Topology
+
+
+def test_candidate_paths_by_cost(diamond):
+    paths = diamond.paths.get(1, 5)
+    assert [path.links for path in paths] == [((1, 4), (2, 2)), ((1, 5), (3, 2)), ((1, 6), (4, 2))]
+    assert [path.delay for path in paths] == [20, 40, 60]
+    assert [path.cost for path in paths] == [22, 42, 62]
+    assert paths[0].hops == ((1, None, 4), (2, 1, 2))
+    assert paths[0].first_port == 4 and paths[0].nodes() == [1, 2, 5]
+    assert diamond.paths.get(1, 5) is paths  # kept in the table
+
+
+def test_k_limits_the_candidates(diamond):
+    diamond.paths.k = 2
+    diamond.paths.table.clear()
+    assert len(diamond.paths.get(1, 5)) == 2
+
+
+def test_a_link_change_drops_only_the_entries_using_it(diamond):
+    diamond.paths.precompute([1, 5])
+    forward, backward = diamond.paths.get(1, 5), diamond.paths.get(5, 1)
+    assert diamond.remove_link(1, 5) == [(1, 5)]
+    assert (1, 5) not in diamond.paths.table
+    assert diamond.paths.get(5, 1) is backward  # s5 -> s3 -> s1 does not use s1 -> s3
+    assert [path.links[0] for path in diamond.paths.get(1, 5)] == [(1, 4), (1, 6)]
+    diamond.add_link(1, 5, 3, 1)
+    assert [path.links for path in diamond.paths.get(1, 5)] == [path.links for path in forward]
+
+
+def test_remove_port_drops_both_directions_and_its_hosts(diamond):
+    assert diamond.learn_host("10.0.0.1", "00:00:00:00:00:01", 1, 1)
+    changed = diamond.remove_port(2, 1)
+    assert sorted(changed) == [(1, 4), (2, 1)]
+    assert diamond.remove_port(1, 1) == []
+    assert "10.0.0.1" not in diamond.hosts
+
+
+def test_hosts(diamond):
+    assert not diamond.learn_host("10.0.0.9", "m", 1, 4)  # a link port
+    assert not diamond.learn_host("10.0.0.9", "m", 1, OFPP_MAX + 1)  # a reserved port
+    assert diamond.learn_host("10.0.0.1", "m1", 1, 1)
+    assert not diamond.learn_host("10.0.0.1", "m1", 5, 4)  # the first location wins
+    assert diamond.hosts["10.0.0.1"].dpid == 1
+    assert diamond.learn_host("10.0.0.4", "m4", 5, 4)
+    assert diamond.edge_switches() == [1, 5]
+    assert diamond.edge_ports(1) == [1, 2, 3] and diamond.edge_ports(5) == [4, 5, 6]
+    # a port that turns out to be a link port forgets its hosts
+    diamond.add_link(5, 4, 3, 3)
+    assert "10.0.0.4" not in diamond.hosts
+    assert diamond.forget_host("10.0.0.1").port == 1
+    assert diamond.host_ports == {}
+
+
+def test_transit_pairs(diamond):
+    assert diamond.is_transit_pair(2)
+    assert not diamond.is_transit_pair(1)
+    diamond.remove_link(2, 2)
+    assert not diamond.is_transit_pair(2)
+
+
+def test_remove_switch(diamond):
+    diamond.learn_host("10.0.0.1", "m1", 1, 1)
+    changed = diamond.remove_switch(2)
+    assert sorted(changed) == [(1, 4), (2, 1), (2, 2), (5, 1)]
+    assert 2 not in diamond.switches and "10.0.0.1" in diamond.hosts
+    assert len(diamond.paths.get(1, 5)) == 2
+    assert diamond.name(2) == "2" and diamond.dpid_of("s3") == 3
+
+
+def test_unreachable():
+    topology = Topology()
+    topology.add_switch(1, "s1", [1])
+    topology.add_switch(2, "s2", [1])
+    assert topology.paths.get(1, 2) == ()
+    assert topology.distances(1) == {1: 0}
+
+
+def test_next_hops(diamond):
+    # towards s5 every switch forwards along the cheapest path, through s2
+    assert diamond.next_hops(5) == {1: 4, 2: 2, 3: 2, 4: 2}
+    assert diamond.next_hops(1) == {5: 1, 2: 1, 3: 1, 4: 1}
+    diamond.remove_link(1, 4)
+    diamond.remove_link(2, 1)
+    assert diamond.next_hops(5)[1] == 5
+
+
+def test_refresh_recomputes_only_the_dropped_entries(diamond):
+    diamond.paths.precompute([1, 5])
+    kept = diamond.paths.get(1, 5)
+    diamond.paths.get(2, 3)
+    assert not diamond.add_port(2, 1) and diamond.add_port(2, 3)
+    assert diamond.remove_port(4, 2) == [(4, 2), (5, 3)]
+    # the third paths of (1, 5), (5, 1) and (2, 3) crossed s4; only the entries between edge switches come back
+    assert diamond.paths.refresh([1, 5]) == [(1, 5), (5, 1)]
+    assert (2, 3) not in diamond.paths.table
+    assert diamond.paths.get(1, 5) is not kept and len(diamond.paths.get(1, 5)) == 2
+    assert diamond.paths.refresh([1, 5]) == []